@@ -15,11 +15,12 @@ class Canvas(qtg.QWidget):
         self._env  = env
         self._img  = None
         self._cmap = [qtg.qRgb(i, i, i) for i in range(0, 256)]
+        self._buf  = np.empty(env.outSize, dtype = np.uint8)
 
     ## The drawScreen methods order the Canvas object to update the image to
     #  display with the current screen from the game environment
     def drawScreen(self):
-        self._img = qtg.QImage(self._env.getScreen().astype(np.uint8),
+        self._img = qtg.QImage(self._env.getScreen(out = self._buf),
                                self._env.outSize[1],
                                self._env.outSize[0],
                                qtg.QImage.Format_Indexed8)
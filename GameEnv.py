@@ -16,9 +16,14 @@ class GameEnv:
     #   @param outSize : An array of two elements [h, w] where h is the height
     #                    of the image to output with the method getScreen and w
     #                    its width
-    def __init__(self, rom, outSize):
+    #   @param seed    : The seed of the emulator random generator. If None
+    #                    (default), the current time is used
+    def __init__(self, rom, outSize, seed = None):
+        if seed is None:
+            seed = int(time.time())
+
         self._ale = ALE.ALEInterface()
-        self._ale.setInt  ("random_seed".encode(), int(time.time()))
+        self._ale.setInt  ("random_seed".encode(), seed)
         self._ale.setFloat("repeat_action_probability".encode(), 0)
         self._ale.setBool ("color_averaging".encode(), True)
         self._ale.loadROM (rom.encode())
@@ -30,7 +35,9 @@ class GameEnv:
         ## The size of the images returned by getScreen  the form
         #  [height, width]
         self.outSize    = outSize
+        self._rom       = rom
         self._RAWScreen = np.empty([d[0] * d[1]]  , dtype = np.uint8)
+        self._RAWPrev   = np.empty([d[0] * d[1]]  , dtype = np.uint8)
         self._RAWScaled = np.empty(self.outSize   , dtype = np.uint8)
         self._RGBScreen = np.empty([d[1], d[0], 3], dtype = np.uint8)
         
@@ -41,6 +48,14 @@ class GameEnv:
                                            "." + str(t.tm_min)  + \
                                            "." + str(t.tm_sec)
     
+    ## The spec method returns what is needed to create a new environment like
+    #  this one, e.g. in another process
+    #
+    #   @return A tuple (class, args, kwargs) such that
+    #           'class(*args, seed = seed, **kwargs)' creates the environment
+    def spec(self):
+        return (GameEnv, (self._rom, self.outSize), {})
+
     ## The minActions method retuns an array containing the minimal action set
     #  for the loaded game
     #
@@ -58,16 +73,38 @@ class GameEnv:
     ## The getScreen method converts the game screen to a grayscale array
     #  shrink it to the configured size and returns it
     #
-    #   @return A numpy array of numpy.float32 between 0 and 255 and of shape
-    #           GameEnv.outSize
-    def getScreen(self):
+    #   When 'out' is given, no memory is allocated. A C-contiguous
+    #   numpy.uint8 array receives the resized screen directly, any other
+    #   array receives a converted copy of it
+    #
+    #   @param out : An array of shape GameEnv.outSize where to write the
+    #                screen. If None (default), a new array is returned
+    #
+    #   @return A numpy array of values between 0 and 255 and of shape
+    #           GameEnv.outSize. It is 'out' if given, a new array of
+    #           numpy.float32 otherwise
+    def getScreen(self, out = None):
         self._ale.getScreen(self._RAWScreen)
+        return self._scale(out)
 
+    ## The _scale method shrinks the raw screen held by _RAWScreen to the
+    #  configured size
+    #
+    #   @param out : See getScreen
+    #
+    #   @return See getScreen
+    def _scale(self, out):
+        direct = (not (out is None)) and out.dtype == np.uint8 and \
+                 out.flags.c_contiguous
         cv2.resize(src   = self._RAWScreen.reshape(self.screenSize),
-                   dst   = self._RAWScaled,
+                   dst   = out if direct else self._RAWScaled,
                    dsize = (self.outSize[1], self.outSize[0]))
 
-        return self._RAWScaled.astype(dtype = np.float32, copy = True)
+        if out is None:
+            return self._RAWScaled.astype(dtype = np.float32, copy = True)
+        if not direct:
+            np.copyto(out, self._RAWScaled)
+        return out
 
     ## The getScreenRGB method returns an array containing the RBG screen
     #
@@ -84,6 +121,58 @@ class GameEnv:
     def act(self, action):
         return self._ale.act(action)
 
+    ## The step method performs the given action 'repeat' times, or until the
+    #  game ends, and returns the reward gained and the resulting screen
+    #
+    #   @param action  : The action to perform
+    #   @param repeat  : The number of times the action is performed. Default 1
+    #   @param maxPool : If True, the screen returned is the element-wise
+    #                    maximum of the last two raw screens, which removes the
+    #                    sprites flickering from one frame to the other. It has
+    #                    no effect when the game ends before the last two
+    #                    frames. Default False
+    #   @param out     : See getScreen
+    #
+    #   @return A tuple (reward, screen) where reward is the sum of the rewards
+    #           and screen is as returned by getScreen
+    def step(self, action, repeat = 1, maxPool = False, out = None):
+        r    = 0
+        pool = False
+        for i in range(repeat):
+            r = r + self._ale.act(action)
+            if self._ale.game_over(): break
+            if maxPool and i == repeat - 2:
+                self._ale.getScreen(self._RAWPrev)
+                pool = True
+
+        self._ale.getScreen(self._RAWScreen)
+        if pool:
+            np.maximum(self._RAWScreen, self._RAWPrev, out = self._RAWScreen)
+
+        return (r, self._scale(out))
+
+    ## The cloneState method returns a copy of the emulator state which can be
+    #  given back to restoreState. The copy doesn't include the emulator
+    #  pseudo-random generator
+    #
+    #   @return The emulator state
+    def cloneState(self):
+        return self._ale.cloneState()
+
+    ## The restoreState method sets the emulator back to the given state
+    #
+    #   @param state : A state returned by cloneState
+    def restoreState(self, state):
+        self._ale.restoreState(state)
+
+    ## The deleteState method releases a state returned by cloneState. It does
+    #  nothing with the ALE versions managing the states' memory themselves
+    #
+    #   @param state : A state returned by cloneState
+    def deleteState(self, state):
+        if hasattr(self._ale, "deleteState"):
+            self._ale.deleteState(state)
+
     ## The resetGame method reset the game
     def resetGame(self):
         self._ale.reset_game()
@@ -1,6 +1,35 @@
+import io
+import os
 import json
 import pickle
 import sqlite3 as db
+import numpy   as np
+
+## The _networkArrays function returns the arrays of a network saved by an
+#  older version of the Saver, as a pickled object
+#
+#  The object is either a whole network, where the Theano shared variables are
+#  found along with their names, or a dictionary holding the values of the
+#  weights ("w") and biases ("b") of every layer
+#
+#   @param network : The unpickled network
+#
+#   @return A dictionary of numpy arrays keyed by name
+def _networkArrays(network):
+    arrays = {}
+    todo   = [(None, network)]
+    while len(todo) > 0:
+        key, o = todo.pop()
+        if hasattr(o, "get_value") and not (o.name is None):
+            arrays[o.name] = np.asarray(o.get_value())
+        elif isinstance(o, np.ndarray) and not (key is None):
+            arrays[key] = o
+        elif isinstance(o, dict):
+            for k, v in o.items():
+                todo.append(((k if key is None else key + "_" + k.upper()), v))
+        elif isinstance(o, (list, tuple)):
+            todo.extend((None, v) for v in o)
+    return arrays
 
 ################################################################################
 ## The Saver class provides an easy way to save or load, an agent, its network
@@ -20,6 +49,7 @@ class Saver:
     #   @param dbPath : The path to the database to connect to or to create
     def __init__(self, dbPath):
         self._conn = db.connect(dbPath, check_same_thread = False)
+        self._rDir = os.path.splitext(dbPath)[0] + "_replays"
 
         c = self._conn.cursor()
 
@@ -50,6 +80,24 @@ class Saver:
                             name       TEXT,
                             epoch      INTEGER,
                             value      REAL)""")
+
+        c.execute("""CREATE TABLE IF NOT EXISTS
+                     replays (id       INTEGER PRIMARY KEY AUTOINCREMENT,
+                              id_agent INTEGER,
+                              info     TEXT,
+                              ts       DATETIME DEFAULT CURRENT_TIMESTAMP,
+                              path     TEXT)""")
+
+        c.execute("""CREATE TABLE IF NOT EXISTS
+                     profiles (id       INTEGER PRIMARY KEY AUTOINCREMENT,
+                               id_agent INTEGER,
+                               info     TEXT,
+                               ts       DATETIME DEFAULT CURRENT_TIMESTAMP,
+                               function TEXT,
+                               kind     TEXT,
+                               name     TEXT,
+                               time     REAL,
+                               calls    INTEGER)""")
         
         self._conn.commit()
 
@@ -128,21 +176,64 @@ class Saver:
     ## The saveNetwork method adds the given network to the list of the networks
     # available for the given agent
     #
-    #   @param agentId : The id of the agent the network to save belongs to
-    #   @param info    : Some information associated to network to save
-    #   @param network : The network to save
+    #   The network is saved in the numpy NPZ format, the arrays being keyed
+    #   by their name
+    #
+    #   @param agentId  : The id of the agent the network to save belongs to
+    #   @param info     : Some information associated to network to save
+    #   @param network  : A dictionary of the numpy arrays to save, such as the
+    #                     network's parameters and the optimizer's
+    #                     accumulators, keyed by name
+    #   @param compress : Whether the arrays are compressed. Default True
     #
     #   @return The id of the newly saved network
-    def saveNetwork(self, agentId, info, network):
+    def saveNetwork(self, agentId, info, network, compress = True):
         c = self._conn.cursor()
         c.execute("""INSERT INTO networks (id_agent, info, network)
-                     VALUES (?,?,?)""", (agentId, info, pickle.dumps(network)))
+                     VALUES (?,?,?)""",
+                  (agentId, info, Saver._npz(network, compress)))
         
         networkId = c.execute("SELECT id FROM networks WHERE ROWID = ?",
                               (c.lastrowid,)).fetchone()[0]
         self._conn.commit()
         return networkId
         
+    ## The saveReplay method writes the given replay memory to a file stored
+    #  next to the database and records it for the given agent. The replay
+    #  memories previously saved for this agent are deleted
+    #
+    #   @param agentId : The id of the agent the replay memory belongs to
+    #   @param info    : Some information associated to the replay memory
+    #   @param replay  : The replay memory to save. It must provide a method
+    #                    save(path)
+    #
+    #   @return The id of the newly saved replay memory
+    def saveReplay(self, agentId, info, replay):
+        os.makedirs(self._rDir, exist_ok = True)
+        path = os.path.join(self._rDir,
+                            "agent_{}_{}.rpl".format(agentId, info))
+        tmp  = path + ".tmp"
+        replay.save(tmp)
+        os.replace(tmp, path)
+
+        c   = self._conn.cursor()
+        old = c.execute("""SELECT path
+                           FROM   replays
+                           WHERE  id_agent = ? AND path != ?""",
+                        (agentId, path)).fetchall()
+        c.execute("DELETE FROM replays WHERE id_agent = ?", (agentId,))
+        c.execute("""INSERT INTO replays (id_agent, info, path)
+                     VALUES (?,?,?)""", (agentId, info, path))
+        replayId = c.execute("SELECT id FROM replays WHERE ROWID = ?",
+                             (c.lastrowid,)).fetchone()[0]
+        self._conn.commit()
+
+        for o in old:
+            if os.path.exists(o[0]):
+                os.remove(o[0])
+
+        return replayId
+        
     ## The saveStat method saves the given statistics into the database
     #
     #   @param agentId   : The id of the agent assiciated to the statistics to
@@ -160,6 +251,23 @@ class Saver:
                      (agentId, networkId, name, epoch, value))
         self._conn.commit()
 
+    ## The saveProfile method saves the time spent in the operations of the
+    #  compiled functions of an agent
+    #
+    #   @param agentId : The id of the agent
+    #   @param info    : Some information associated to the profile, such as
+    #                    the architecture and the batch size
+    #   @param rows    : A list of tuples (function, kind, name, time, calls),
+    #                    kind being "layer" or "op" and the time in seconds
+    def saveProfile(self, agentId, info, rows):
+        c = self._conn.cursor()
+        c.executemany("""INSERT INTO
+                         profiles (id_agent, info, function, kind, name,
+                                   time, calls)
+                         VALUES   (?,?,?,?,?,?,?)""",
+                      [(agentId, info) + tuple(r) for r in rows])
+        self._conn.commit()
+
     ## The newDataset method save a new dataset into the database
     #
     #   @param length : The number of elemnts in the dataset
@@ -194,7 +302,9 @@ class Saver:
     #   @param networkId : The id of the network to load. If None (default), the
     #                      last saved network is returned
     #
-    #   @return The previously saved network
+    #   @return A dictionary of the saved numpy arrays keyed by name. The
+    #           networks pickled by older versions are converted on the fly,
+    #           which requires Theano
     def loadNetwork(self, agentId, networkId = None):
         c = self._conn.cursor()
         if networkId is None :
@@ -209,7 +319,71 @@ class Saver:
                              WHERE  networks.id_agent = ? AND
                                     networks.id       = ?""",
                           (agentId, networkId)).fetchone()[0]
-        return pickle.loads(n)
+        return Saver._arrays(n)
+
+    ## The convertNetworks method rewrites the networks pickled by older
+    #  versions of the saver in the NPZ format. Unpickling them requires Theano
+    #
+    #   @param agentId  : The id of the agent which networks are converted. If
+    #                     None (default), the networks of all the agents are
+    #   @param compress : Whether the arrays are compressed. Default True
+    #
+    #   @return The number of networks converted
+    def convertNetworks(self, agentId = None, compress = True):
+        c   = self._conn.cursor()
+        if agentId is None:
+            ids = c.execute("SELECT id FROM networks").fetchall()
+        else:
+            ids = c.execute("SELECT id FROM networks WHERE id_agent = ?",
+                            (agentId,)).fetchall()
+
+        cnt = 0
+        for (i,) in ids:
+            n = c.execute("SELECT network FROM networks WHERE id = ?",
+                          (i,)).fetchone()[0]
+            if Saver._isNpz(n):
+                continue
+            c.execute("UPDATE networks SET network = ? WHERE id = ?",
+                      (Saver._npz(Saver._arrays(n), compress), i))
+            self._conn.commit()
+            cnt = cnt + 1
+
+        if cnt > 0:
+            c.execute("VACUUM")
+        return cnt
+
+    ## The _npz static method returns the NPZ archive of the given arrays
+    #
+    #   @param arrays   : A dictionary of numpy arrays keyed by name
+    #   @param compress : Whether the arrays are compressed
+    #
+    #   @return The bytes of the archive
+    def _npz(arrays, compress):
+        f = io.BytesIO()
+        if compress:
+            np.savez_compressed(f, **arrays)
+        else:
+            np.savez(f, **arrays)
+        return f.getvalue()
+
+    ## The _isNpz static method returns whether the given saved network is an
+    #  NPZ archive, which is a zip file, or a pickled object
+    #
+    #   @param blob : The saved network
+    def _isNpz(blob):
+        return bytes(blob[:4]) == b"PK\x03\x04"
+
+    ## The _arrays static method returns the arrays of the given saved network
+    #
+    #   @param blob : The saved network
+    #
+    #   @return A dictionary of numpy arrays keyed by name
+    def _arrays(blob):
+        if not Saver._isNpz(blob):
+            return _networkArrays(pickle.loads(blob))
+
+        with np.load(io.BytesIO(blob)) as f:
+            return {k : f[k] for k in f.files}
       
     ## The loadNetworkEpoch returns the id of the network linked to the stat
     #  recorded for the given agent at the given epoch
@@ -228,6 +402,28 @@ class Saver:
 
       return netId
 
+    ## The loadReplay method fills the given replay memory with the last one
+    #  saved for the given agent
+    #
+    #   @param agentId : The id of the agent the replay memory belongs to
+    #   @param replay  : The replay memory to fill. It must provide a method
+    #                    load(path) returning whether the file has been loaded
+    #
+    #   @return True if a replay memory has been loaded, False if none is
+    #           available or if it has been skipped
+    def loadReplay(self, agentId, replay):
+        c   = self._conn.cursor()
+        res = c.execute("""SELECT   path
+                           FROM     replays
+                           WHERE    replays.id_agent = ?
+                           ORDER BY replays.id DESC
+                           LIMIT    1""", (agentId,)).fetchone()
+
+        if (res is None) or (not os.path.exists(res[0])):
+            return False
+
+        return replay.load(res[0])
+
     ## The loadDataset method return the desired dataset
     #
     #   @param setId : The id of the dataset to return
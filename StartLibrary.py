@@ -0,0 +1,87 @@
+import random
+import numpy  as np
+
+################################################################################
+## The StartLibrary class keeps a library of game start states so new games
+#  don't have to replay the random actions performed after a reset
+#
+# Every entry holds an emulator state, as returned by the cloneState method of
+# the game environment, and the frames seen just before it. Once the library
+# holds 'size' entries, new games are started from one of them picked at
+# random. An entry is dropped after being used 'uses' times; the next game is
+# then played from a reset and its start state replaces the dropped entry, so
+# one game out of 'uses' refreshes the library.
+#
+################################################################################
+class StartLibrary:
+
+    ## The StartLibrary constructor
+    #
+    #   @param env  : The game environment. It must provide the methods
+    #                 cloneState, restoreState and deleteState
+    #   @param size : The number of start states kept
+    #   @param uses : The number of games started from a state before it is
+    #                 replaced
+    def __init__(self, env, size, uses):
+        assert size > 0, "The library size must be positive"
+        assert uses > 0, "A start state must be used at least once"
+
+        self._env    = env
+        self._size   = size
+        self._uses   = uses
+        self._lib    = [] # List of [state, frames, number of uses]
+        self._hits   = 0  # Number of games started from the library
+        self._misses = 0  # Number of games which had to be played
+
+    ## The __len__ method returns the number of start states in the library
+    def __len__(self):
+        return len(self._lib)
+
+    ## The draw method restores a random start state of the library
+    #
+    #   @return The frames saved with the restored state or None if the library
+    #           isn't full, in which case nothing is restored and the game has
+    #           to be started normally then saved with the add method
+    def draw(self):
+        if len(self._lib) < self._size:
+            self._misses = self._misses + 1
+            return None
+
+        i    = random.randrange(len(self._lib))
+        e    = self._lib[i]
+        self._env.restoreState(e[0])
+        e[2] = e[2] + 1
+
+        if e[2] >= self._uses:
+            self._lib[i] = self._lib[-1]
+            self._lib.pop()
+            self._env.deleteState(e[0])
+
+        self._hits = self._hits + 1
+        return e[1]
+
+    ## The add method saves the current state of the game environment in the
+    #  library, if it isn't full
+    #
+    #   @param frames : An array of shape [c, h, w] holding the last frames
+    #                   seen. It is copied
+    def add(self, frames):
+        if len(self._lib) >= self._size:
+            return
+        self._lib.append([self._env.cloneState(), np.array(frames), 0])
+
+    ## The clear method removes all the start states of the library
+    def clear(self):
+        for e in self._lib:
+            self._env.deleteState(e[0])
+        self._lib = []
+
+    ## The stats method returns statistics about the library
+    #
+    #   @return A dictionary with the number of start states ("size"), the
+    #           number of games started from the library ("hits") and the
+    #           number of games which had to be played ("misses")
+    def stats(self):
+        return {"size"   : len(self._lib),
+                "hits"   : self._hits,
+                "misses" : self._misses}
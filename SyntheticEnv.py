@@ -0,0 +1,205 @@
+import time
+import numpy as np
+
+################################################################################
+## The SyntheticEnv class is a stand-in for GameEnv which doesn't need the
+#  Arcade Learning Environment nor a rom
+#
+# The game is a simple catch game drawn directly at the output size: a ball
+# falls from the top of the screen and the agent moves a paddle at the bottom
+# to catch it. Catching the ball gives a reward of 1, missing it a reward of
+# -1, then a new ball falls from a random column. A game lasts a random number
+# of frames drawn between the two configured lengths.
+#
+# Everything is driven by a np.random.RandomState seeded at construction, so
+# two environments created with the same seed and given the same actions
+# produce the same frames and rewards. The 'cost' parameter makes every frame
+# spin the CPU for the given time to mimic the emulator.
+#
+################################################################################
+class SyntheticEnv:
+
+    ## The SyntheticEnv constructor
+    #
+    #   @param rom     : Ignored, kept for compatibility with GameEnv
+    #   @param outSize : An array of two elements [h, w] where h is the height
+    #                    of the image to output with the method getScreen and w
+    #                    its width
+    #   @param seed    : The seed of the random generator. If None (default),
+    #                    the current time is used
+    #   @param length  : An array of two elements [min, max], the bounds of the
+    #                    number of frames per game. If None (default),
+    #                    [1000, 5000]
+    #   @param cost    : The time in seconds spent computing every frame.
+    #                    Default 0
+    #   @param speed   : The number of pixels the ball falls per frame.
+    #                    Default 1
+    def __init__(self, rom, outSize, seed = None, length = None,
+                 cost = 0, speed = 1):
+        if seed is None:
+            seed = int(time.time())
+        if length is None:
+            length = [1000, 5000]
+
+        ## The size of the screen in the form [height, width]
+        self.screenSize = outSize
+        ## The size of the images returned by getScreen  the form
+        #  [height, width]
+        self.outSize    = outSize
+        self._rng       = np.random.RandomState(seed)
+        self._rom       = rom
+        self._length    = length
+        self._cost      = cost
+        self._speed     = speed
+        self._size      = max(1, outSize[1] // 12) # Ball and paddle size
+        self._prev      = None # State at the previous to last step frame
+        self._state     = None
+        self.resetGame()
+
+    ## The spec method returns what is needed to create a new environment like
+    #  this one, e.g. in another process. See GameEnv.spec
+    #
+    #   @return A tuple (class, args, kwargs)
+    def spec(self):
+        return (SyntheticEnv, (self._rom, self.outSize),
+                {"length" : self._length,
+                 "cost"   : self._cost,
+                 "speed"  : self._speed})
+
+    ## The minActions method retuns an array containing the minimal action set:
+    #  no-op, left and right
+    #
+    #   @return  An array containing the minimum set of legal actions
+    def minActions(self):
+        return np.array([0, 3, 4], dtype = np.int32)
+
+    ## The legActions method returns an array containing the set of legal
+    #  actions, the ALE ones
+    #
+    #   @return An array containing the set of legal actions
+    def legActions(self):
+        return np.arange(18, dtype = np.int32)
+
+    ## The getScreen method draws the game screen and returns it
+    #
+    #   @param out : An array of shape SyntheticEnv.outSize where to write the
+    #                screen. If None (default), a new array is returned
+    #
+    #   @return A numpy array of values between 0 and 255 and of shape
+    #           SyntheticEnv.outSize. It is 'out' if given, a new array of
+    #           numpy.float32 otherwise
+    def getScreen(self, out = None):
+        if out is None:
+            out = np.empty(self.outSize, dtype = np.float32)
+
+        out.fill(0)
+        self._draw(out, self._state)
+        if not (self._prev is None):
+            self._draw(out, self._prev)
+        return out
+
+    ## The _draw method draws the ball and the paddle of the given state
+    #
+    #   @param out   : The array where to draw
+    #   @param state : The state to draw
+    def _draw(self, out, state):
+        s      = self._size
+        y, x   = state["ball"]
+        p      = state["paddle"]
+        out[max(0, y):y + s, x:x + s] = 255
+        out[-s:, p:p + 2 * s]         = 128
+
+    ## The getScreenRGB method returns an array containing the RBG screen
+    #
+    #   @return A numpy array of numpy.uint8 of shape
+    #           [SyntheticEnv.screenSize[0], SyntheticEnv.screenSize[1], 3]
+    def getScreenRGB(self):
+        return np.repeat(self.getScreen(np.empty(self.outSize,
+                                                 dtype = np.uint8))[:, :, None],
+                         3, axis = 2)
+
+    ## The act method performs the given action and returns the reward gained
+    #  from that action
+    #
+    #   @return The reward issued from the action taken
+    def act(self, action):
+        if self._cost > 0:
+            t = time.perf_counter() + self._cost
+            while time.perf_counter() < t:
+                pass
+
+        st = self._state
+        if st["t"] >= st["end"]:
+            return 0
+
+        s    = self._size
+        w    = self.outSize[1]
+        move = {3 : -1, 4 : 1}.get(action, 0) * (s // 2)
+        st["paddle"]  = min(max(st["paddle"] + move, 0), w - 2 * s)
+        st["ball"][0] = st["ball"][0] + self._speed
+        st["t"]       = st["t"] + 1
+
+        r = 0
+        if st["ball"][0] >= self.outSize[0] - s:
+            x  = st["ball"][1]
+            p  = st["paddle"]
+            r  = 1 if p - s < x < p + 2 * s else -1
+            st["ball"] = [-s, self._rng.randint(w - s + 1)]
+        return r
+
+    ## The step method performs the given action 'repeat' times, or until the
+    #  game ends, and returns the reward gained and the resulting screen. See
+    #  GameEnv.step
+    #
+    #   @return A tuple (reward, screen)
+    def step(self, action, repeat = 1, maxPool = False, out = None):
+        r = 0
+        for i in range(repeat):
+            if maxPool and i == repeat - 1:
+                self._prev = self.cloneState()
+            r = r + self.act(action)
+            if self.gameOver(): break
+
+        screen     = self.getScreen(out)
+        self._prev = None
+        return (r, screen)
+
+    ## The resetGame method reset the game
+    def resetGame(self):
+        s           = self._size
+        w           = self.outSize[1]
+        self._state = {"t"      : 0,
+                       "end"    : self._rng.randint(self._length[0],
+                                                    self._length[1] + 1),
+                       "ball"   : [-s, self._rng.randint(w - s + 1)],
+                       "paddle" : (w - 2 * s) // 2}
+
+    ## The gameOver methods return whether or not the game ended
+    #
+    #   @return True if the game is in an terminal state, False otherwise
+    def gameOver(self):
+        return self._state["t"] >= self._state["end"]
+
+    ## The cloneState method returns a copy of the game state. As with
+    #  GameEnv, the random generator isn't part of it
+    #
+    #   @return The game state
+    def cloneState(self):
+        st = self._state
+        return {"t"      : st["t"],
+                "end"    : st["end"],
+                "ball"   : list(st["ball"]),
+                "paddle" : st["paddle"]}
+
+    ## The restoreState method sets the game back to the given state
+    #
+    #   @param state : A state returned by cloneState
+    def restoreState(self, state):
+        self._state         = dict(state)
+        self._state["ball"] = list(state["ball"])
+
+    ## The deleteState method does nothing, states are plain Python objects
+    #
+    #   @param state : A state returned by cloneState
+    def deleteState(self, state):
+        pass
@@ -0,0 +1,229 @@
+import time
+import ctypes
+import traceback
+import numpy           as np
+import multiprocessing as MP
+
+################################################################################
+## The _worker function runs a game environment in a child process and executes
+#  the commands received from the VecGameEnv through the given pipe
+#
+# After every command changing the state of the game, the worker writes the
+# current screen and the game over flag of its environment in the shared
+# buffers, so the parent process reads them without any exchange.
+#
+#   @param pipe     : The child end of the pipe connected to the VecGameEnv
+#   @param idx      : The index of the environment in the VecGameEnv
+#   @param envClass : The class of the environment to create
+#   @param args     : The arguments passed to the constructor of envClass
+#   @param frames   : The shared array of the screens
+#   @param over     : The shared array of the game over flags
+#   @param shape    : The shape [n, h, w] of the screens buffer
+################################################################################
+def _worker(pipe, idx, envClass, args, frames, over, shape):
+    env    = None
+    frame  = np.frombuffer(frames, dtype = np.uint8).reshape(shape)[idx]
+    over   = np.frombuffer(over  , dtype = np.uint8)
+
+    try:
+        env = envClass(*args)
+        pipe.send(("ok", env.minActions()))
+    except Exception:
+        pipe.send(("error", traceback.format_exc()))
+        pipe.close()
+        return
+
+    while True:
+        cmd, arg = pipe.recv()
+        try:
+            if cmd == "act":
+                ret = env.act(arg)
+                env.getScreen(out = frame)
+            elif cmd == "step":
+                ret = env.step(*arg, out = frame)[0]
+            elif cmd == "reset":
+                env.resetGame()
+                env.getScreen(out = frame)
+                ret = None
+            elif cmd == "close":
+                pipe.send(("ok", None))
+                break
+            else:
+                raise ValueError("Unknown command '{}'".format(cmd))
+
+            over[idx] = env.gameOver()
+            pipe.send(("ok", ret))
+        except Exception:
+            pipe.send(("error", traceback.format_exc()))
+
+    pipe.close()
+
+################################################################################
+## The VecGameEnv class runs several game environments in worker processes and
+#  steps them all at the same time
+#
+# Every method takes and returns arrays with one element per environment. The
+# screens of all the environments are kept in a shared memory buffer of shape
+# [n, h, w] updated by the workers after every action or reset, so getScreen
+# and gameOver don't communicate with the workers.
+#
+################################################################################
+class VecGameEnv:
+
+    ## The VecGameEnv constructor
+    #
+    #   @param rom      : The path to the rom to load
+    #   @param outSize  : An array of two elements [h, w] where h is the height
+    #                     of the screens returned by the method getScreen and w
+    #                     their width
+    #   @param n        : The number of environments
+    #   @param seed     : The seed of the first environment, the i-th one
+    #                     using 'seed + i'. If None (default), the current time
+    #                     is used
+    #   @param envClass : The class of the environments. Its constructor takes
+    #                     the parameters (rom, outSize, seed). If None
+    #                     (default), GameEnv.GameEnv is used. It's only
+    #                     imported then, so other environments don't need the
+    #                     Arcade Learning Environment
+    def __init__(self, rom, outSize, n, seed = None, envClass = None):
+        assert n > 0, "At least one environment is needed"
+
+        if envClass is None:
+            import GameEnv as GE
+            envClass = GE.GameEnv
+
+        if seed is None:
+            seed = int(time.time())
+
+        shape         = [n, outSize[0], outSize[1]]
+        frames        = MP.RawArray(ctypes.c_uint8, n * outSize[0] * outSize[1])
+        over          = MP.RawArray(ctypes.c_uint8, n)
+
+        ## The number of environments
+        self.n        = n
+        ## The size of the images returned by getScreen in the form
+        #  [height, width]
+        self.outSize  = outSize
+        self._frames  = np.frombuffer(frames, dtype = np.uint8).reshape(shape)
+        self._over    = np.frombuffer(over  , dtype = np.uint8)
+        self._pipes   = []
+        self._procs   = []
+        self._actions = None
+
+        for i in range(n):
+            parent, child = MP.Pipe()
+            p             = MP.Process(target = _worker,
+                                       args   = (child, i, envClass,
+                                                 (rom, outSize, seed + i),
+                                                 frames, over, shape))
+            p.daemon      = True
+            p.start()
+            child.close()
+            self._pipes.append(parent)
+            self._procs.append(p)
+
+        acts          = self._receive(range(n))
+        self._actions = np.array(acts[0])
+
+        self.resetGame()
+
+    ## The _receive method returns the answers of the given workers. If one of
+    #  them failed, the environments are closed and a RuntimeError is raised
+    #
+    #   @param idx : The indexes of the workers to wait for
+    #
+    #   @return A list of the values returned by the workers
+    def _receive(self, idx):
+        ret = []
+        err = None
+        for i in idx:
+            status, val = self._pipes[i].recv()
+            if status == "error" and err is None:
+                err = "Environment {} failed:\n{}".format(i, val)
+            ret.append(val)
+
+        if not (err is None):
+            self.close()
+            raise RuntimeError(err)
+        return ret
+
+    ## The minActions method retuns an array containing the minimal action set
+    #  for the loaded game
+    #
+    #   @return  An array containing the minimum set of legal actions
+    def minActions(self):
+        return self._actions
+
+    ## The act method performs one action in every environment and returns the
+    #  rewards gained from them
+    #
+    #   @param actions : An array of n actions
+    #
+    #   @return A numpy array of n numpy.int32 rewards
+    def act(self, actions):
+        assert len(actions) == self.n, \
+               "{} actions expected, got {}".format(self.n, len(actions))
+
+        for p, a in zip(self._pipes, actions):
+            p.send(("act", int(a)))
+        return np.array(self._receive(range(self.n)), dtype = np.int32)
+
+    ## The step method performs one action 'repeat' times in every environment
+    #  and returns the rewards gained from them. See GameEnv.step
+    #
+    #   @param actions : An array of n actions
+    #   @param repeat  : The number of times the actions are performed.
+    #                    Default 1
+    #   @param maxPool : Whether the screens are the maximum of the last two
+    #                    frames. Default False
+    #
+    #   @return A numpy array of n numpy.int32 rewards
+    def step(self, actions, repeat = 1, maxPool = False):
+        assert len(actions) == self.n, \
+               "{} actions expected, got {}".format(self.n, len(actions))
+
+        for p, a in zip(self._pipes, actions):
+            p.send(("step", (int(a), repeat, maxPool)))
+        return np.array(self._receive(range(self.n)), dtype = np.int32)
+
+    ## The resetGame method resets the games of the given environments
+    #
+    #   @param mask : An array of n booleans, True for the environments to
+    #                 reset. If None (default), all of them are reset
+    def resetGame(self, mask = None):
+        idx = range(self.n) if mask is None else np.flatnonzero(mask)
+        for i in idx:
+            self._pipes[i].send(("reset", None))
+        self._receive(idx)
+
+    ## The gameOver methods return whether or not the games ended
+    #
+    #   @return A numpy array of n booleans, True for the environments in a
+    #           terminal state
+    def gameOver(self):
+        return self._over.astype(np.bool_)
+
+    ## The getScreen method returns the screens of all the environments
+    #
+    #   The returned array is the shared buffer itself. It is overwritten by
+    #   the next call to act or resetGame and must be copied to be kept
+    #
+    #   @return A numpy array of numpy.uint8 of shape
+    #           [n, VecGameEnv.outSize[0], VecGameEnv.outSize[1]]
+    def getScreen(self):
+        return self._frames
+
+    ## The close method stops the worker processes
+    def close(self):
+        for p, proc in zip(self._pipes, self._procs):
+            if proc.is_alive():
+                try:
+                    p.send(("close", None))
+                    p.recv()
+                except (EOFError, OSError):
+                    pass
+            p.close()
+            proc.join()
+
+        self._pipes = []
+        self._procs = []
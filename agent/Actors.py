@@ -0,0 +1,300 @@
+import time
+import ctypes
+import numpy           as np
+import multiprocessing as MP
+
+## The _shared function returns a numpy array of the given type and shape
+#  backed by shared memory, so it's seen by the processes forked after its
+#  creation
+#
+#   @param dtype : The type of the array
+#   @param shape : The shape of the array
+def _shared(dtype, shape):
+    dtype = np.dtype(dtype)
+    size  = int(np.prod(shape))
+    raw   = MP.RawArray(ctypes.c_byte, max(1, size * dtype.itemsize))
+    return np.frombuffer(raw, dtype = dtype, count = size).reshape(shape)
+
+################################################################################
+## The TransitionQueue class is a single-producer single-consumer ring of
+#  transitions in shared memory, written by an actor process and read by the
+#  learner
+#
+# Every record has a kind, a frame, an action, a reward and a terminal flag. A
+# game is sent as 'c' FRAME records holding its first frames, then one STEP
+# record per experience and finally one END record which reward is the score
+# of the game. The producer only writes the 'written' counter and the consumer
+# only the 'read' one, so no lock is needed.
+#
+################################################################################
+class TransitionQueue:
+
+    FRAME = 0 # A frame starting a game
+    STEP  = 1 # An experience
+    END   = 2 # The end of a game, the reward holding its score
+
+    ## The TransitionQueue constructor
+    #
+    #   @param capacity : The number of records the queue can hold
+    #   @param h        : The frames' height
+    #   @param w        : The frames' width
+    def __init__(self, capacity, h, w):
+        self._cap    = capacity
+        self._frames = _shared(np.uint8  , [capacity, h, w])
+        self._kind   = _shared(np.uint8  , [capacity])
+        self._a      = _shared(np.int32  , [capacity])
+        self._r      = _shared(np.float32, [capacity])
+        self._t      = _shared(np.uint8  , [capacity])
+        self._cnt    = _shared(np.int64  , [2]) # Records written and read
+
+    ## The put method adds a record to the queue. It waits while the queue is
+    #  full
+    #
+    #   @param kind  : The kind of the record
+    #   @param frame : The frame of the record, or None for END records
+    #   @param a     : The id of the action taken. Default 0
+    #   @param r     : The reward perceived or the score. Default 0
+    #   @param t     : Whether the reached state is terminal. Default False
+    #   @param quit  : A multiprocessing.Event which stops the wait when set.
+    #                  Default None
+    #
+    #   @return False if the record was dropped because 'quit' is set, True
+    #           otherwise
+    def put(self, kind, frame, a = 0, r = 0, t = False, quit = None):
+        while self._cnt[0] - self._cnt[1] >= self._cap:
+            if not (quit is None) and quit.is_set():
+                return False
+            time.sleep(0.001)
+
+        i             = self._cnt[0] % self._cap
+        self._kind[i] = kind
+        self._a   [i] = a
+        self._r   [i] = r
+        self._t   [i] = t
+        if not (frame is None):
+            self._frames[i] = frame
+        self._cnt[0]  = self._cnt[0] + 1
+        return True
+
+    ## The pending method returns the range of the records written and not
+    #  read yet
+    #
+    #   @return A tuple (first, end) of absolute record indexes
+    def pending(self):
+        return (int(self._cnt[1]), int(self._cnt[0]))
+
+    ## The record method returns the record at the given absolute index. The
+    #  frame is a view, valid until the record is released
+    #
+    #   @param i : The absolute index of the record
+    #
+    #   @return A tuple (kind, frame, a, r, t)
+    def record(self, i):
+        i = i % self._cap
+        return (self._kind[i], self._frames[i], self._a[i], self._r[i],
+                bool(self._t[i]))
+
+    ## The release method gives the records before the given absolute index
+    #  back to the producer
+    #
+    #   @param end : The absolute index of the first record still in use
+    def release(self, end):
+        self._cnt[1] = end
+
+################################################################################
+## The WeightBoard class publishes the weights of the learner to the actors
+#
+# The weights are concatenated in a shared buffer along with a version number
+# incremented at every publication. Actors compare the version with the one
+# they loaded, so checking for new weights costs nothing.
+#
+################################################################################
+class WeightBoard:
+
+    ## The WeightBoard constructor
+    #
+    #   @param params : The list of Theano shared variables to publish
+    def __init__(self, params):
+        self._layout = []
+        o            = 0
+        for p in params:
+            v = p.get_value(borrow = True)
+            self._layout.append((o, v.size, v.shape, v.dtype, p.name))
+            o = o + v.size
+
+        self._buf    = _shared(np.float32, [o])
+        self._ver    = _shared(np.int64  , [1])
+        self._lock   = MP.Lock()
+
+    ## The publish method copies the given weights in the board
+    #
+    #   @param params : The list of Theano shared variables to publish
+    def publish(self, params):
+        with self._lock:
+            for p, (o, n, shape, dtype, name) in zip(params, self._layout):
+                self._buf[o:o + n] = p.get_value(borrow = True).ravel()
+            self._ver[0] = self._ver[0] + 1
+
+    ## The fetch method loads the published weights into the given variables
+    #  if they are newer than the given version
+    #
+    #   @param params  : The list of Theano shared variables to update
+    #   @param version : The version of the weights held by 'params'
+    #
+    #   @return The version of the weights held by 'params'
+    def fetch(self, params, version):
+        if self._ver[0] == version:
+            return version
+
+        with self._lock:
+            for p, (o, n, shape, dtype, name) in zip(params, self._layout):
+                p.set_value(self._buf[o:o + n].reshape(shape).astype(dtype))
+            return int(self._ver[0])
+
+    ## The version method returns the version of the published weights
+    def version(self):
+        return int(self._ver[0])
+
+    ## The arrays method returns a copy of the published weights, for the
+    #  actors which don't act with the Theano variables
+    #
+    #   @return A tuple (arrays, version) where arrays is a dictionary of the
+    #           weights keyed by the names of the variables
+    def arrays(self):
+        with self._lock:
+            return ({name : self._buf[o:o + n].reshape(shape).astype(dtype)
+                     for o, n, shape, dtype, name in self._layout},
+                    int(self._ver[0]))
+
+################################################################################
+## The ActorPool class runs actor processes which play the game and send their
+#  transitions to the learner
+#
+# The actors are forked from the learner process, so they start with a copy of
+# its network and compiled functions. Every actor writes into its own
+# TransitionQueue. The learner drains the queues into its replay memory.
+#
+# The replay memory expects the frames of a game to be contiguous in its frame
+# store. When the learner switches from one actor to another, the last 'c'
+# frames of the new actor are added again before its next record. To keep this
+# overhead low, a queue is only drained once it holds 'chunk' records.
+#
+################################################################################
+class ActorPool:
+
+    ## The ActorPool constructor. It starts the actor processes
+    #
+    #   @param n        : The number of actors
+    #   @param c        : The number of frames of a state
+    #   @param h        : The frames' height
+    #   @param w        : The frames' width
+    #   @param capacity : The number of records of every queue
+    #   @param params   : The list of Theano shared variables to publish
+    #   @param target   : The function run by every actor. It's called with
+    #                     the parameters (k, queue, board, eps, quit, seed)
+    #                     where k is the actor index, queue its
+    #                     TransitionQueue, board the WeightBoard, eps an array
+    #                     whose first element is the epsilon to use, quit a
+    #                     multiprocessing.Event set when it must stop and seed
+    #                     the seed of its random generators
+    #   @param seed     : The seed of the first actor, the k-th using
+    #                     'seed + k'
+    #   @param chunk    : The minimum number of records drained at once from a
+    #                     queue. Default 64
+    def __init__(self, n, c, h, w, capacity, params, target, seed,
+                 chunk = 64):
+        assert capacity > chunk, "The queues must be larger than a chunk"
+
+        ctx           = MP.get_context("fork")
+        self._c       = c
+        self._chunk   = chunk
+        self._queues  = [TransitionQueue(capacity, h, w) for k in range(n)]
+        self._board   = WeightBoard(params)
+        self._eps     = _shared(np.float64, [1])
+        self._quit    = ctx.Event()
+        self._frames  = np.zeros([n, c, h, w], dtype = np.uint8)
+        self._pos     = [0] * n   # Next position in _frames for every actor
+        self._last    = None      # The actor which last added frames
+        self._steps   = 0         # Number of experiences received
+        self._copies  = 0         # Number of frames added again
+        self._procs   = []
+
+        self._board.publish(params)
+        for k in range(n):
+            p        = ctx.Process(target = target,
+                                   args   = (k, self._queues[k], self._board,
+                                             self._eps, self._quit, seed + k))
+            p.daemon = True
+            p.start()
+            self._procs.append(p)
+
+    ## The setEpsilon method sets the epsilon the actors use
+    #
+    #   @param eps : The new epsilon
+    def setEpsilon(self, eps):
+        self._eps[0] = eps
+
+    ## The publish method sends the given weights to the actors
+    #
+    #   @param params : The list of Theano shared variables to publish
+    def publish(self, params):
+        self._board.publish(params)
+
+    ## The drain method adds the transitions of the queues holding at least
+    #  'chunk' records to the given replay memory
+    #
+    #   @param replay : The replay memory
+    #   @param force  : If True, all the queues are drained whatever the
+    #                   number of records they hold. Default False
+    #
+    #   @return The list of the scores of the games which ended
+    def drain(self, replay, force = False):
+        scores = []
+        for k, q in enumerate(self._queues):
+            first, end = q.pending()
+            if end - first < (1 if force else self._chunk):
+                continue
+
+            if self._last != k:
+                p = self._pos[k]
+                replay.addImages(np.concatenate([self._frames[k, p:],
+                                                 self._frames[k, :p]]))
+                self._copies = self._copies + self._c
+                self._last   = k
+
+            for i in range(first, end):
+                kind, frame, a, r, t = q.record(i)
+                if kind == TransitionQueue.END:
+                    scores.append(float(r))
+                    continue
+
+                if kind == TransitionQueue.STEP:
+                    replay.addExperience(frame, a, r, t)
+                    self._steps = self._steps + 1
+                else:
+                    replay.addImages([frame])
+
+                self._frames[k, self._pos[k]] = frame
+                self._pos[k]                  = (self._pos[k] + 1) % self._c
+
+            q.release(end)
+        return scores
+
+    ## The stop method stops the actors and waits for them to terminate
+    def stop(self):
+        self._quit.set()
+        for p in self._procs:
+            p.join(5)
+            if p.is_alive():
+                p.terminate()
+                p.join()
+        self._procs = []
+
+    ## The stats method returns statistics about the pool
+    #
+    #   @return A dictionary with the number of experiences received ("steps")
+    #           and the number of frames added again when switching from one
+    #           actor to another ("copies")
+    def stats(self):
+        return {"steps"  : self._steps,
+                "copies" : self._copies}
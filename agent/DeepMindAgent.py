@@ -1,9 +1,11 @@
 import gc
+import os
+import json
 import math
 import random
 import time
 import datetime
-import collections       as C
+import threading         as Thr
 import matplotlib.pyplot as plt
 import numpy             as np
 import theano            as Th
@@ -11,210 +13,22 @@ import theano.tensor     as T
 
 import Plotter           as P
 import Saver             as S
+import StartLibrary      as SL
 import agent.Agent       as A
+import agent.ReplayMemory as RM
+import agent.Prefetcher  as Pf
+import agent.Actors      as Act
+import agent.Evaluator   as Ev
 import dqn.ConvNet       as Net
+import dqn.Architecture  as Arch
+import dqn.NumpyNet      as NN
 import dqn.Optimizers    as Opt
+import dqn.Profile       as Prof
 
 import matplotlib        as mpl
 mpl.rcParams["backend"]     = "qt4agg"
 mpl.rcParams["interactive"] = True
 
-################################################################################
-## The ImageSet class implement an image container
-#
-# The ImageSet class expects that the images to store are numpy arrays of
-# np.float32 of shape [h, w] where h is the height of the image and w its width.
-#
-# If the set if full, this class pre-allocate an array of N images before
-# storing new images.
-#
-# The images stored in the set are actually copied
-#
-################################################################################
-class ImagesSet:
-    
-    ## The ImageSet constructor
-    #
-    #   @param chunkSize : The size by witch the set well be increased every
-    #                      time it's full and images are inserted
-    #   @param h         : The images' height
-    #   @param w         : The images' width
-    def __init__(self, chunkSize, h, w):
-        self._cs           = chunkSize
-        self._h            = h
-        self._w            = w
-        self._chunks       = [] # List of arrays that contains the images
-        self._freeSlots    = [] # List of arrays indicating the free slots
-        self._fsCnt        = 0  # Total number of free slots
-        self._freeTemplate = np.arange(chunkSize)
-        
-    ## The addImages method adds the given images to the set
-    #
-    #   @param imgList : An iterable structure containing the images to copy
-    #                    to the set
-    #
-    #   @return A list if slots where the images where stored
-    def addImages(self, imgList):
-        l   = len(imgList)
-        k   = 0
-        ret = []
-        
-        while self._fsCnt < l:
-            self._addChunk()
-            
-        for i,fsl in enumerate(self._freeSlots):
-            while len(fsl) > 0:
-                j                    = fsl.popleft()
-                self._chunks[i][j,:] = imgList[k]
-                self._fsCnt          = self._fsCnt - 1
-                k                    = k + 1
-                ret.append((i,j))
-                if k >= l: return ret
-            
-    ## The image method returns the image stored at the given slot
-    #
-    #   @param slot : The identifier of the slot where the image is stored
-    #
-    #   @return The requested image
-    def image(self, slot):
-        return self._chunks[slot[0]][slot[1]]
-    
-    ## The free method free the given slots
-    #
-    #   @param slots : An iterable structure containing the slots to free
-    def free(self, slots):
-        self._fsCnt = self._fsCnt + len(slots)
-        
-        for s in slots:
-            self._freeSlots[s[0]].append(s[1])
-            
-    ## The _addChunk method allocate memory to the ImageSet
-    def _addChunk(self):
-        self._fsCnt  = self._fsCnt + self._cs
-        self._chunks.append(np.empty([self._cs, self._h, self._w],
-                            dtype = np.float32))
-        self._freeSlots.append(C.deque(self._freeTemplate))
-
-###############################################################################
-## The ReplayMemory class is a list of past experiences as defined in the paper
-#  <a href="https://www.cs.toronto.edu/~vmnih/docs/dqn.pdf"> Playing Atari with
-#  Deep Reinforcement Learning</a>
-#
-#   The replay memory is made of an ImageSet that will keep given images in
-#   memory. If 'c' is the number of images a state is made of, the replay memory
-#   keeps the ids of the 'c' last inserted images. Then when a new experience
-#   is inserted into the replay memory, only one image has to be given. The
-#   replay memory assumes that the initial state related to this experience is
-#   made of the 'c' last images and that the terminal state of this experience
-#   is made of the 'c-1' last inserted images plus the new given image.
-#
-###############################################################################
-class ReplayMemory:
-    ## The ReplayMemory constructor initializes a ReplayMemory of the given
-    #  capacity
-    #
-    #   @param capacity : The number of elements the replay memory is able to
-    #                     store before erasing its oldest inserted element to
-    #                     insert new ones
-    #   @param c        : The number of channels (i.e. images) per sequence
-    #   @param h        : The heights of an images
-    #   @param w        : The width of an image
-    #   @param actCnt   : The number of possible actions
-    def __init__(self, capacity, actCnt, c, h, w):
-        self._actCnt = actCnt
-        self._c      = c
-        self._h      = h
-        self._w      = w
-        self._i      = ImagesSet(50000, h, w)
-        self._sart   = C.deque(maxlen = capacity)
-        self._last   = C.deque(maxlen = c + 1)
-       
-    ## The __len__ method returns the number of experiences stored in the replay
-    #  memory
-    def __len__(self):
-        return len(self._sart)
-        
-    ## The addImages method adds the given images to the image set
-    #
-    #   @param imgs : A list of the images to add to the set
-    def addImages(self, imgs):
-        slots = self._i.addImages(imgs)
-        for s in slots:
-            self._last.append(s)
-        
-    ## Adds the given experience to the replay memory
-    #
-    #   @param img : The new image to add to the image set
-    #   @param a   : The id of the last action taken
-    #   @param r   : The last reward perceived
-    #   @param t   : Wheter the reached state is a terminal state or not
-    def addExperience(self, img, a, r, t):
-        slots = self._i.addImages([img])
-        self._last.append(slots[0])
-        
-        if len(self._sart) == self._sart.maxlen:
-            oldest = self._sart.popleft()
-            
-            toFree = None
-            if oldest[3] : # if terminal free all images
-                toFree = oldest[0]
-            else:
-                toFree = [oldest[0][0]]
-            self._i.free(toFree)
-            
-        s    = []
-        s[:] = self._last
-        self._sart.append((s,a,r,t))
-        
-    ## The minibatch method returns a random minibatch which size is the minimum
-    #  between the given size and the size of the replay memory. If the replay
-    #  memory is empty, the method returns None
-    #
-    #   @param size : The size of the minibatch to return
-    #
-    #   @return This method returns None if the replay memory is empty.
-    #           Otherwise it returns a minibatch made of n sample drawn from the
-    #           set of stored experiences, where 'n' is the minimum between
-    #           the length of the replay memory and the given size.
-    #           The returned minibatch is a tuple which elements are the
-    #           following:
-    #               - s_t  : an array of shape [n, c, h, w] which contains the n
-    #                        initial states of the minibatch
-    #               - s_t1 : an array of the shape [n, c, h, w] which contains
-    #                        the n states reached from respectively the n states
-    #                        stored in s_t
-    #               - a_t  : an array of shape [n, actCnt] where every row is
-    #                        full of 0 except for the value at the id
-    #                        corresponding to the action take in the respective
-    #                        n states s_t, which is then 1
-    #               - r_t  : an array of shape [n] which entries are the rewards
-    #                        perceived while going from the n respective states
-    #                        s_t to the n respective states s_t1
-    #               - t    : an array of shape [n] which entries indicate if
-    #                        the n respective states s_t1 are terminals or not
-    def minibatch(self, size):
-        if len(self) <= 0:
-            return None
-        
-        size   = min(len(self), size)
-        sample = random.sample(self._sart, size)
-        
-        s_t  = np.empty([size, self._c, self._h, self._w], dtype = np.float32)
-        s_t1 = np.empty([size, self._c, self._h, self._w], dtype = np.float32)
-        a_t  = np.zeros([size, self._actCnt]             , dtype = np.float32)
-        r_t  = np.empty([size]                           , dtype = np.float32)
-        term = np.empty([size]                           , dtype = np.float32)
-        
-        for i, sart in enumerate(sample):
-            imgs           = [self._i.image(s) for s in sart[0]]
-            s_t [i,:]      = imgs[:self._c]
-            s_t1[i,:]      = imgs[1:]
-            a_t[i,sart[1]] = 1
-            r_t[i]         = sart[2]
-            term[i]        = sart[3]
-            
-        return s_t, s_t1, a_t, r_t, term
-
 ################################################################################
 ## The DeepMindAgent class implements the agent described by Deepmind in their
 #  article of 2013 "Playing Atari with Deep Reinforcement Learning".
@@ -249,13 +63,15 @@ class DeepMindAgent(A.Agent):
     #   @param env     : The gameEnvironement the agent will use as input
     #   @param agentId : The id of the agent to copy
     #   @param loadNet : The id network to load. If negative (default), the last
-    #                    network is loaded. If None, no network is loaded
+    #                    network is loaded. If None, no network is loaded and
+    #                    the network is initialized randomly
     #
     #   @return A new agent initilized with the datas previously stored in the
     #           saver object
     def loadAgent(message, saver, plotter, env, agentId, loadNet = -1):
         a = DeepMindAgent(message, saver, plotter, env, agentId)
         a.loadParams()
+        a._buildNetwork()
         
         if not (loadNet is None):
           if loadNet < 0: loadNet = None
@@ -283,8 +99,18 @@ class DeepMindAgent(A.Agent):
         self._plotter   = plotter
         self._networkId = -1
         self._replay    = None
+        self._prefetch  = None
+        self._batch     = None
+        self._lock      = None
         self._testSet   = None
         self._input     = None
+        self._screens   = None
+        self._starts    = None
+        self._evaluator = None
+        self._engine    = None # NumpyNetwork used to act, if any
+        self._buildTime = 0    # Time spent building the network
+        self._startTime = None # Time _train started, None once reported
+        self._profileIt = 0    # Training steps left before the profile report
 
         self._params  = {}
         self._network = {}
@@ -304,13 +130,18 @@ class DeepMindAgent(A.Agent):
         self._params["N"]["inW"]     = self._env.outSize[1] # Input width
         self._params["N"]["act"]     = act                  # List of actions
         self._params["N"]["actCnt"]  = len(act)             # Number of actions
+        self._params["N"]["layers"]  = Arch.deepmindLayers(len(act))
+        self._params["N"]["profile"] = 0        # Steps profiled (0 : off)
 
         # Optimizer parameters
         self._params["O"] = {}
-        self._params["O"]["name"]    = "RMSProp" # Optimizer name
-        self._params["O"]["eps"]     = 1e-6      # RMSProp epsilon
+        self._params["O"]["name"]    = "RMSProp" # "RMSProp", "CenteredRMSProp"
+                                                 # or "Adam"
+        self._params["O"]["eps"]     = 1e-6      # Epsilon
         self._params["O"]["mom"]     = 0         # RMSProp momentum
         self._params["O"]["dec"]     = 0.99      # RMSProp decay
+        self._params["O"]["beta1"]   = 0.9       # Adam gradient decay
+        self._params["O"]["beta2"]   = 0.999     # Adam squared gradient decay
         self._params["O"]["lr"]      = 0.00025   # The optimiser learning rate
 
         # Playing parameters
@@ -318,6 +149,15 @@ class DeepMindAgent(A.Agent):
         self._params["P"]["rep"]     = 4        # Number of actions repeated
         self._params["P"]["wait"]    = 30       # Max. number of frame to wait
         self._params["P"]["obs"]     = 5000     # Observation bef. training
+        self._params["P"]["maxPool"] = False    # Max of the last two frames
+        self._params["P"]["starts"]  = 100      # Start states kept (0 : off)
+        self._params["P"]["stUses"]  = 10       # Games per start state
+        self._params["P"]["actors"]  = 0        # Actor processes (0 : off)
+        self._params["P"]["actQueue"] = 4096    # Transitions queued per actor
+        self._params["P"]["actChunk"] = 64      # Transitions drained at once
+        self._params["P"]["pubFreq"]  = 1000    # Steps between weight updates
+        self._params["P"]["numpy"]    = True    # Act with numpy when testing
+                                                # (False, True or "int8")
 
         # Learning parameters
         self._params["L"] = {}
@@ -325,10 +165,20 @@ class DeepMindAgent(A.Agent):
         self._params["L"]["maxR"]    = 1        # Maximum reward perceived
         self._params["L"]["minR"]    = -1       # Minimum reward perceived
         self._params["L"]["disc"]    = 0.95     # Discount factor
+        self._params["L"]["nStep"]   = 1        # Rewards summed per return
         self._params["L"]["epsMax"]  = 1        # Maximum value for epsilon
         self._params["L"]["epsMin"]  = 0.1      # Minimum value for epsilon
         self._params["L"]["epsTS"]   = 1000000  # Step when eps reaches its min
         self._params["L"]["batch"]   = 32       # Size of the mini batch
+        self._params["L"]["alpha"]   = 0        # Priority exp. (0 : uniform)
+        self._params["L"]["beta"]    = 0.4      # Initial imp. sampling exp.
+        self._params["L"]["betaTS"]  = 1000000  # Step when beta reaches 1
+        self._params["L"]["prioEps"] = 1e-6     # Added to the priorities
+        self._params["L"]["repSlack"]   = 0.05       # Start frames per exp.
+        self._params["L"]["repBackend"] = "memory"   # "memory" or "mmap"
+        self._params["L"]["repPath"]    = "./replay" # Dir. of "mmap" memories
+        self._params["L"]["repSave"]    = False      # Snapshot every epoch
+        self._params["L"]["prefetch"]   = 2          # Minibatches built ahead
 
         # Testing parameters
         self._params["T"] = {}
@@ -338,6 +188,7 @@ class DeepMindAgent(A.Agent):
         self._params["T"]["setMin"]   = 5000     # Minimum size of the test set
         self._params["T"]["setMax"]   = 5000     # Maximum size of the test set
         self._params["T"]["setId"]    = -1       # Test set id
+        self._params["T"]["workers"]  = 0        # Test processes (0 : inline)
         self._params["T"]["setShape"] = [None,   # Shape of the test set
                                          self._params["N"]["inC"],
                                          self._params["N"]["inH"],
@@ -350,96 +201,141 @@ class DeepMindAgent(A.Agent):
         self._params["S"]["cost"]  = 0 # The average cost over iterations
         self._params["S"]["score"] = 0 # The average score over games
 
-        # Network
+        self._buildNetwork()
+
+        self.id = self._saver.newAgent(name, S.Saver.DEEP_MIND_AGENT, 
+                                       self._params)
+        self._saveNetwork()
+    
+    ## The _buildNetwork method builds the network described by the agent's
+    #  parameters and compiles its functions
+    #
+    #   The agents saved before the layers were part of their parameters get
+    #   the network of deepmind. Only two functions are compiled: "fwd", which
+    #   returns the output of the network, its maximum and argmax for every
+    #   state, and "step", which trains the network on a minibatch. See
+    #   _hiddenOutputs for the output of the hidden layers. When the parameter "profile" of the
+    #   network is set, both functions are compiled with profiling on and a
+    #   report is saved after this number of training steps
+    def _buildNetwork(self):
+        t0 = time.time()
+        nP = self._params["N"]
+        nP.setdefault("layers", Arch.deepmindLayers(nP["actCnt"]))
+
+        self._network = {}
         self._network["IN"] = {}
-        self._network["IN"]["x"] = T.tensor4("Input" , dtype = "float32")
-        self._network["IN"]["m"] = T.matrix ("Mask"  , dtype = "float32")
-        self._network["IN"]["t"] = T.vector ("Target", dtype = "float32")
-        self._network["IN"]["s"] = [None, self._params["N"]["inC"],
-                                          self._params["N"]["inH"],
-                                          self._params["N"]["inW"]]
-        self._network["L1"] = {}
-        self._network["L1"]["w"],\
-        self._network["L1"]["b"],\
-        self._network["L1"]["y"],\
-        self._network["L1"]["s"] = Net.ConvLayer(self._network["IN"]["x"],
-                                                 self._network["IN"]["s"],
-                                                 16, 8, 8, 4, 4,
-                                                 Net.Paddings.full,
-                                                 Net.ActivationFunctions.relu,
-                                                 "L1")
-        self._network["L2"] = {}
-        self._network["L2"]["w"],\
-        self._network["L2"]["b"],\
-        self._network["L2"]["y"],\
-        self._network["L2"]["s"] = Net.ConvLayer(self._network["L1"]["y"], 
-                                                 self._network["L1"]["s"],
-                                                 32, 4, 4, 2, 2,
-                                                 Net.Paddings.full,
-                                                 Net.ActivationFunctions.relu,
-                                                 "L2")
-        self._network["L3"] = {}
-        self._network["L3"]["w"],\
-        self._network["L3"]["b"],\
-        self._network["L3"]["y"],\
-        self._network["L3"]["s"] = Net.FCLayer  (self._network["L2"]["y"],
-                                                 self._network["L2"]["s"],
-                                                 256,
-                                                 Net.ActivationFunctions.relu,
-                                                 "L3")
-        self._network["L4"] = {}
-        self._network["L4"]["w"],\
-        self._network["L4"]["b"],\
-        self._network["L4"]["y"],\
-        self._network["L4"]["s"] = Net.FCLayer  (self._network["L3"]["y"],
-                                                 self._network["L3"]["s"],
-                                                 self._params["N"]["actCnt"],
-                                                 Net.ActivationFunctions.NONE,
-                                                 "L4")
+        self._network["IN"]["x"]  = T.tensor4("Input"     , dtype = "float32")
+        self._network["IN"]["m"]  = T.matrix ("Mask"      , dtype = "float32")
+        self._network["IN"]["t"]  = T.vector ("Target"    , dtype = "float32")
+        self._network["IN"]["w"]  = T.vector ("Weight"    , dtype = "float32")
+        self._network["IN"]["x1"] = T.tensor4("Next input", dtype = "float32")
+        self._network["IN"]["r"]  = T.vector ("Reward"    , dtype = "float32")
+        self._network["IN"]["e"]  = T.vector ("Terminal"  , dtype = "float32")
+        self._network["IN"]["g"]  = T.vector ("Discount"  , dtype = "float32")
+        self._network["IN"]["s"]  = [None, nP["inC"], nP["inH"], nP["inW"]]
+
+        for name, w, b, y, shape in Net.Network(self._network["IN"]["x"],
+                                                self._network["IN"]["s"],
+                                                nP["layers"]):
+            self._network[name] = {"w" : w, "b" : b, "y" : y, "s" : shape}
 
         x    = self._network["IN"]["x"]
+        x1   = self._network["IN"]["x1"]
         m    = self._network["IN"]["m"]
         t    = self._network["IN"]["t"]
-        y    = self._network["L4"]["y"]
-        p    = [self._network["L1"]["w"], self._network["L1"]["b"],
-                self._network["L2"]["w"], self._network["L2"]["b"],
-                self._network["L3"]["w"], self._network["L3"]["b"],
-                self._network["L4"]["w"], self._network["L4"]["b"]]
-        cost = ((t - (y * m).sum(axis = 1)) ** 2).mean()
+        w    = self._network["IN"]["w"]
+        r    = self._network["IN"]["r"]
+        e    = self._network["IN"]["e"]
+        g    = self._network["IN"]["g"]
+        l    = ["L" + str(i + 1) for i in range(len(nP["layers"]))]
+        y    = self._network[l[-1]]["y"]
+        p    = self._networkParams()
+        td   = t - (y * m).sum(axis = 1)
+        cost = (w * (td ** 2)).mean()
         grad = Opt.clipByNorm(Th.grad(cost = cost, wrt = p), 1)
-        rms  = Opt.RMSProp(grads         = grad, 
-                           params        = p, 
-                           learning_rate = self._params["O"]["lr"],
-                           momentum      = self._params["O"]["mom"],
-                           decay         = self._params["O"]["dec"],
-                           epsilon       = self._params["O"]["eps"])
-        
+        upd  = self._optimizer(grad, p)
+
+        # The target is computed from the next states by a copy of the network
+        # graph and substituted to the target input, so no gradient flows
+        # through it
+        y1   = Th.clone(y, replace = {x : x1})
+        tgt  = r + (1 - e) * g * y1.max(axis = 1)
+
+        self._profileIt = nP.get("profile", 0)
+        prof            = lambda n: Th.compile.ProfileStats(
+                                                    atexit_print = False,
+                                                    message      = n) \
+                                    if self._profileIt > 0 else False
+
         self._network["OUT"] = {}
-        self._network["OUT"]["y"]     = Th.function(
-                                         inputs  = [x],
-                                         outputs = [y,
-                                                    self._network["L1"]["y"],
-                                                    self._network["L2"]["y"],
-                                                    self._network["L3"]["y"]])
-        self._network["OUT"]["max"]   = Th.function(
+        self._network["OUT"]["fwd"]   = Th.function(
                                            inputs  = [x],
-                                           outputs = [y.max(axis = 1),
-                                                      y.argmax(axis = 1)])
-        self._network["OUT"]["avg"]   = Th.function(inputs  = [x],
-                                                    outputs = [y.mean(),
-                                                               y.max(axis = 1)\
-                                                                .mean()])
-        self._network["OUT"]["cost"]  = Th.function(
-                                           inputs  = [x, m, t],
-                                           outputs = cost,
-                                           updates = rms)
+                                           outputs = [y,
+                                                      y.max(axis = 1),
+                                                      y.argmax(axis = 1)],
+                                           profile = prof("fwd"))
+        self._network["OUT"]["step"]  = Th.function(
+                                           inputs  = [x, x1, m, r, e, g, w],
+                                           outputs = [cost, td],
+                                           updates = upd,
+                                           givens  = [(t, tgt)],
+                                           profile = prof("step"))
         self._network["OUT"]["grad"]  = grad
-        self._network["OUT"]["rms"]   = rms
+        self._network["OUT"]["upd"]   = upd
+        self._buildTime = time.time() - t0
+
+    ## The _hiddenOutputs method returns the output of the hidden layers for
+    #  the given states. It's only used to debug the network, so its function
+    #  is compiled on the first call rather than with the others
+    #
+    #   @param x : An array of shape [batch, c, h, w] holding the states
+    #
+    #   @return A list of arrays, the output of every hidden layer
+    def _hiddenOutputs(self, x):
+        if not ("hidden" in self._network["OUT"]):
+            l = ["L" + str(i + 1)
+                 for i in range(len(self._params["N"]["layers"]) - 1)]
+            self._network["OUT"]["hidden"] = Th.function(
+                                      inputs  = [self._network["IN"]["x"]],
+                                      outputs = [self._network[k]["y"]
+                                                 for k in l])
+        return self._network["OUT"]["hidden"](x)
+
+    ## The _optimizer method returns the updates of the optimizer named in the
+    #  agent's parameters
+    #
+    #   @param grads  : The gradient of the cost
+    #   @param params : The parameters to update
+    #
+    #   @return A list of updates to pass to a Theano function
+    def _optimizer(self, grads, params):
+        o    = self._params["O"]
+        name = o.get("name", "RMSProp")
+
+        if name == "RMSProp":
+            return Opt.RMSProp(grads         = grads,
+                               params        = params,
+                               learning_rate = o["lr"],
+                               momentum      = o["mom"],
+                               decay         = o["dec"],
+                               epsilon       = o["eps"])
+        elif name == "CenteredRMSProp":
+            return Opt.CenteredRMSProp(grads         = grads,
+                                       params        = params,
+                                       learning_rate = o["lr"],
+                                       momentum      = o["mom"],
+                                       decay         = o["dec"],
+                                       epsilon       = o["eps"])
+        elif name == "Adam":
+            return Opt.Adam(grads         = grads,
+                            params        = params,
+                            learning_rate = o["lr"],
+                            beta1         = o.get("beta1", 0.9),
+                            beta2         = o.get("beta2", 0.999),
+                            epsilon       = o["eps"])
+
+        assert False, "Unknown optimizer '{}'".format(name)
 
-        self.id = self._saver.newAgent(name, S.Saver.DEEP_MIND_AGENT, 
-                                       self._params)
-        self._saveNetwork()
-    
     ## The _saveAgent updates the saver with the current agent's parameters
     def _saveAgent(self):
         self._saver.saveAgent(self.id, self._params)
@@ -448,7 +344,35 @@ class DeepMindAgent(A.Agent):
     def _saveNetwork(self):
         self._networkId = self._saver.saveNetwork(self.id,
                                                   self._params["S"]["it"], 
-                                                  self._network)
+                                                  self._networkValues())
+
+    ## The _networkVariables method returns the Theano shared variables
+    #  holding the state of the network: the weights and biases of every layer
+    #  and the accumulators of the optimizer
+    #
+    #   @return A dictionary of the shared variables keyed by name
+    def _networkVariables(self):
+        v = {p.name : p for p in self._networkParams()}
+        for u, e in self._network["OUT"]["upd"]:
+            v[u.name] = u
+        return v
+
+    ## The _networkValues method returns the values of the network's shared
+    #  variables. See _networkVariables
+    #
+    #   @return A dictionary of numpy arrays keyed by name
+    def _networkValues(self):
+        return {k : u.get_value() for k, u in self._networkVariables().items()}
+
+    ## The _saveReplay method persists the replay memory. The "mmap" replay
+    #  memory is flushed to its files while the in-memory one is saved in the
+    #  saver object if snapshots are enabled
+    def _saveReplay(self):
+        self._replay.flush()
+        if self._params["L"].get("repBackend", "memory") == "memory" and \
+           self._params["L"].get("repSave"   , False):
+            self._saver.saveReplay(self.id, self._params["S"]["it"],
+                                   self._replay)
 
     ## The loadParams object load the parameters of the current agent saved
     #  in the saver object
@@ -460,19 +384,41 @@ class DeepMindAgent(A.Agent):
     #   @param networkId : The id of the network to load
     def loadNetwork(self, networkId):
         self._networkId = networkId
-        self._network   = self._saver.loadNetwork(self.id, networkId)
+        values          = self._saver.loadNetwork(self.id, networkId)
+
+        # The optimizer's accumulators aren't saved with the oldest networks,
+        # they are reset instead
+        params = [p.name for p in self._networkParams()]
+        for k, u in self._networkVariables().items():
+            if k in values:
+                u.set_value(np.asarray(values[k], dtype = np.float32))
+            else:
+                assert not (k in params), \
+                       "The parameter '{}' isn't saved".format(k)
+                u.set_value(np.zeros_like(u.get_value()))
     
     ## The _train method train the agent and periodically test it
     #
     #   This method start by initializing the replay memory and the test set and
     #   then train until it's asked to stop
     def _train(self):
+        self._startTime = time.time()
+
         if self._replay is None :
             self._initializeReplay()
         
         if self._testSet is None :
             self._initializeTest()
 
+        self._startEvaluator()
+
+        if self._params["P"].get("actors", 0) > 0:
+            self._trainActors()
+            self._stopEvaluator()
+            return
+
+        self._startPrefetch()
+
         act        = self._params["N"]["act"]
         actCnt     = self._params["N"]["actCnt"]
         start_time = time.time()
@@ -480,17 +426,16 @@ class DeepMindAgent(A.Agent):
         ## Loop until it's asked to stop
         while super().continueProcessing():
             self._newGame()
-            self._replay.addImages(self._input)
+            with self._lock:
+                self._replay.addImages(self._screens.view())
             score = 0
             ## Loop until the current game ends
             while super().continueProcessing() and \
                   not self._env.gameOver():
                       
-                s_t  = np.array(self._input, dtype = np.float32) # Input state
+                s_t  = self._input.view()                        # Input state
                 a_id = self._getNextAction(s_t, self._epsilon()) # Chosen action
-                r_t  = self._performAction(act[a_id])            # Reward
-                self._updateInput()
-                s_t1 = np.array(self._input, dtype = np.float32) # Reached state
+                r_t  = self._step(act[a_id])                     # Reward
 
                 # Clip the reward
                 score = score + r_t
@@ -498,41 +443,18 @@ class DeepMindAgent(A.Agent):
                 if r_t < 0 : r_t = self._params["L"]["minR"]
 
                 # The the current experience to the replay memory
-                self._replay.addExperience(self._input[-1], a_id, r_t,
-                                           self._env.gameOver())
+                with self._lock:
+                    self._replay.addExperience(self._screens.newest(), a_id,
+                                               r_t, self._env.gameOver())
                 
-                # Get a new training batch from the memory
-                s_j ,\
-                s_j1,\
-                a_mj,\
-                r_j ,\
-                t_j  = self._replay.minibatch(self._params["L"]["batch"])
-                q_j1 = self._network["OUT"]["max"](s_j1)[0]
-                y_j  = r_j + (1 - t_j) * self._params["L"]["disc"] * q_j1
-
-                it   = self._params["S"]["it"]
-                it_1 = it + 1
-
-                # Compute the cost for the given minibatch and train the
-                # network
-                cost_t = float(self._network["OUT"]["cost"](s_j, a_mj, y_j))
-                self._params["S"]["cost"] = \
-                     self._params["S"]["cost"] * (it / it_1) + (cost_t / it_1)
-               
-                # Display a line of information in the terminal
-                if it % 100 == 0:
-                    delta = datetime.timedelta(\
-                                seconds = int(round(time.time() - start_time)))
-                    print(("{0} - {1:06d} - Sc: {2:5.1f} - e: {3:>6.4f} - " +
-                           "Lm: {4:>6.4f} - L: {5:>6.4f} - {6:07}") \
-                          .format(delta, it, self._params["S"]["score"],
-                                  self._epsilon(),
-                                  self._params["S"]["cost"], cost_t,
-                                  self._params["S"]["game"]))
-                    gc.collect()
+                it     = self._params["S"]["it"]
+                it_1   = it + 1
+                cost_t = self._learn()
+                self._printProgress(it, cost_t, start_time)
                     
                 # Test the agent
                 if it % self._params["T"]["epoch"] == 0:
+                    self._saveReplay()
                     self._saveAgent()
                     self._saveNetwork()
                     self._test()
@@ -540,13 +462,344 @@ class DeepMindAgent(A.Agent):
                     self._params["S"]["it"] = it_1
                     break
 
+                self._pollTest()
                 self._params["S"]["it"] = it_1
                 
-            g   = self._params["S"]["game"]
-            g_1 = g + 1
-            self._params["S"]["score"] = \
-                        self._params["S"]["score"] * (g / g_1) + (score / g_1)
-            self._params["S"]["game"]  = g_1
+            self._endGame(score)
+
+        self._stopPrefetch()
+        self._replay.flush()
+        self._stopEvaluator()
+
+        if not (self._starts is None):
+            st = self._starts.stats()
+            print("Start library: {} states - {} hits - {} misses" \
+                  .format(st["size"], st["hits"], st["misses"]))
+
+    ## The _trainActors method trains the agent while actor processes play the
+    #  game. The agent only drains the transitions of the actors into the
+    #  replay memory, trains the network and periodically publishes its
+    #  weights to the actors
+    #
+    #   The actors are forked from the current process and need the network
+    #   functions to work in the child processes, which isn't the case when
+    #   Theano runs on a GPU
+    def _trainActors(self):
+        pool       = Act.ActorPool(self._params["P"]["actors"],
+                                   self._params["N"]["inC"],
+                                   self._params["N"]["inH"],
+                                   self._params["N"]["inW"],
+                                   self._params["P"]["actQueue"],
+                                   self._networkParams(),
+                                   self._actorLoop,
+                                   int(time.time()),
+                                   self._params["P"]["actChunk"])
+        self._startPrefetch()
+        start_time = time.time()
+
+        while super().continueProcessing():
+            pool.setEpsilon(self._epsilon())
+            with self._lock:
+                scores = pool.drain(self._replay)
+            for score in scores:
+                self._endGame(score)
+
+            it     = self._params["S"]["it"]
+            it_1   = it + 1
+            cost_t = self._learn()
+            self._printProgress(it, cost_t, start_time)
+
+            if it % self._params["P"]["pubFreq"] == 0:
+                pool.publish(self._networkParams())
+
+            if it % self._params["T"]["epoch"] == 0:
+                self._saveReplay()
+                self._saveAgent()
+                self._saveNetwork()
+                self._test()
+
+            self._pollTest()
+            self._params["S"]["it"] = it_1
+
+        pool.stop()
+        self._stopPrefetch()
+        self._replay.flush()
+
+        st = pool.stats()
+        print("Actors: {} experiences - {} frames copied" \
+              .format(st["steps"], st["copies"]))
+
+    ## The _forkSetup method prepares a process forked from the agent to play
+    #  on its own: it reseeds the random generators, builds a new game
+    #  environment and drops the replay memory, the prefetcher, the input
+    #  frames and the start library inherited from the agent
+    #
+    #   @param seed : The seed of the random generators and of the environment
+    def _forkSetup(self, seed):
+        random.seed(seed)
+        np.random.seed(seed % 2 ** 32)
+
+        cls, args, kwargs = self._env.spec()
+        self._env         = cls(*args, seed = seed, **kwargs)
+        self._replay      = None
+        self._prefetch    = None
+        self._input       = None
+        self._starts      = None
+
+    ## The _actorLoop method is the main loop of an actor process. It plays
+    #  games with its own game environment and sends the transitions to the
+    #  learner until it's asked to stop
+    #
+    #   @param k     : The index of the actor
+    #   @param queue : The Actors.TransitionQueue where to send the transitions
+    #   @param board : The Actors.WeightBoard where the weights are published
+    #   @param eps   : An array which first element is the epsilon to use
+    #   @param quit  : A multiprocessing.Event set when the actor must stop
+    #   @param seed  : The seed of the random generators
+    def _actorLoop(self, k, queue, board, eps, quit, seed):
+        self._forkSetup(seed)
+
+        params  = self._networkParams()
+        version = -1
+        act     = self._params["N"]["act"]
+
+        while not quit.is_set():
+            version = self._fetchWeights(board, params, version)
+            self._newGame()
+            for f in self._screens.view():
+                queue.put(queue.FRAME, f, quit = quit)
+
+            score = 0
+            while not (quit.is_set() or self._env.gameOver()):
+                version = self._fetchWeights(board, params, version)
+                a_id    = self._getNextAction(self._input.view(), eps[0])
+                r_t     = self._step(act[a_id])
+
+                score = score + r_t
+                if r_t > 0 : r_t = self._params["L"]["maxR"]
+                if r_t < 0 : r_t = self._params["L"]["minR"]
+
+                queue.put(queue.STEP, self._screens.newest(), a_id, r_t,
+                          self._env.gameOver(), quit)
+
+            queue.put(queue.END, None, r = score, quit = quit)
+
+    ## The _fetchWeights method loads the weights published on the board if
+    #  they are newer than the ones loaded. When acting with numpy, they are
+    #  only loaded in the numpy network
+    #
+    #   @param board   : The Actors.WeightBoard where the weights are published
+    #   @param params  : The list of the network's shared variables
+    #   @param version : The version of the weights loaded
+    #
+    #   @return The version of the weights loaded
+    def _fetchWeights(self, board, params, version):
+        if board.version() == version:
+            return version
+
+        if self._params["P"].get("numpy", False):
+            values, version = board.arrays()
+            self._loadEngine(values)
+            return version
+        return board.fetch(params, version)
+
+    ## The _learn method trains the network over one minibatch drawn from the
+    #  replay memory
+    #
+    #   @return The cost of the minibatch
+    def _learn(self):
+        s_j ,\
+        s_j1,\
+        a_mj,\
+        r_j ,\
+        t_j ,\
+        g_j ,\
+        w_j ,\
+        id_j = self._minibatch()
+
+        it   = self._params["S"]["it"]
+        it_1 = it + 1
+
+        # Compute the cost for the given minibatch and train the network. With
+        # a prioritized replay memory, the cost is weighted and the TD errors
+        # update the priorities
+        cost_t, td_j = self._network["OUT"]["step"](s_j, s_j1, a_mj, r_j, t_j,
+                                                    g_j, w_j)
+        if self._replay.prioritized():
+            with self._lock:
+                self._replay.updatePriorities(id_j, td_j)
+        cost_t = float(cost_t)
+        self._params["S"]["cost"] = \
+             self._params["S"]["cost"] * (it / it_1) + (cost_t / it_1)
+
+        if not (self._startTime is None):
+            self._reportStartup()
+        if self._profileIt > 0:
+            self._profileIt = self._profileIt - 1
+            if self._profileIt == 0:
+                self._reportProfile()
+        return cost_t
+
+    ## The _reportStartup method displays and saves the time it took to get to
+    #  the first training step: the time spent building the network plus the
+    #  time between the start of the training and the end of the first step
+    def _reportStartup(self):
+        t               = time.time() - self._startTime
+        self._startTime = None
+        print("Startup: network built in {:.2f}s - first step after {:.2f}s" \
+              .format(self._buildTime, self._buildTime + t))
+        self._saver.saveStat(self.id, self._networkId, "Startup time",
+                             self._params["S"]["it"], self._buildTime + t)
+
+    ## The _reportProfile method displays and saves the time spent in the
+    #  compiled functions since they were built, per operation and per
+    #  category: a layer, the clipping of the gradient or the optimizer
+    def _reportProfile(self):
+        nP     = self._params["N"]
+        cats   = {}
+        for i, l in enumerate(nP["layers"]):
+            for k in ["W", "B"]:
+                cats["L{}_{}".format(i + 1, k)] = \
+                    "L{} {}".format(i + 1, l["type"])
+        for v in self._networkVariables().values():
+            if not (v.name in cats):
+                cats[v.name] = self._params["O"]["name"] + " updates"
+        for k in Opt.CLIP_NAMES:
+            cats[k] = "clipByNorm"
+        prio   = [self._params["O"]["name"] + " updates", "clipByNorm"]
+
+        rows   = []
+        for f in ["fwd", "step"]:
+            fn = self._network["OUT"][f]
+            n  = fn.profile.fct_callcount
+            if n == 0:
+                continue
+            ops, cs = Prof.profileTimes(fn, cats, prio)
+            total   = max(1e-12, sum(e[0] for e in cs.values()))
+            print("Profile of \"{}\" over {} calls ({:.2f} ms/call):" \
+                  .format(f, n, total / n * 1000))
+
+            # Every category and operation is saved, only the categories and
+            # the 10 slowest operations are displayed
+            for kind, d, shown in [("layer", cs, len(cs)), ("op", ops, 10)]:
+                d = sorted(d.items(), key = lambda i: -i[1][0])
+                for i, (k, e) in enumerate(d):
+                    rows.append((f, kind, k, e[0], e[1]))
+                    if i < shown:
+                        print("  {:<5} {:<60} {:6.1%} {:9.3f}s {:8d}" \
+                              .format(kind, k, e[0] / total, e[0], e[1]))
+
+        info = {"it"     : self._params["S"]["it"] + 1,
+                "steps"  : nP["profile"],
+                "batch"  : self._params["L"]["batch"],
+                "optim"  : self._params["O"]["name"],
+                "layers" : nP["layers"]}
+        self._saver.saveProfile(self.id, json.dumps(info), rows)
+
+    ## The _printProgress method displays a line of information in the
+    #  terminal every 100 iterations. "R" is the fill ratio of the replay
+    #  memory, followed by the share of its live frames spent on start frames
+    #
+    #   @param it         : The current iteration
+    #   @param cost_t     : The cost of the current iteration
+    #   @param start_time : The time when the training started
+    def _printProgress(self, it, cost_t, start_time):
+        if it % 100 != 0:
+            return
+
+        delta = datetime.timedelta(seconds = int(round(time.time() -
+                                                       start_time)))
+        rep   = self._replay.stats()
+        print(("{0} - {1:06d} - Sc: {2:5.1f} - e: {3:>6.4f} - " +
+               "Lm: {4:>6.4f} - L: {5:>6.4f} - {6:07} - " +
+               "R: {7:>5.1%} ({8:>4.1%} st.)") \
+              .format(delta, it, self._params["S"]["score"],
+                      self._epsilon(),
+                      self._params["S"]["cost"], cost_t,
+                      self._params["S"]["game"],
+                      rep["experiences"] / rep["capacity"],
+                      rep["startFrames"] / max(1, rep["liveFrames"])))
+        gc.collect()
+
+    ## The _endGame method updates the average score with the score of a game
+    #  which just ended
+    #
+    #   @param score : The score of the game
+    def _endGame(self, score):
+        g   = self._params["S"]["game"]
+        g_1 = g + 1
+        self._params["S"]["score"] = \
+                    self._params["S"]["score"] * (g / g_1) + (score / g_1)
+        self._params["S"]["game"]  = g_1
+
+    ## The _networkParams method returns the list of the network's shared
+    #  variables, the weights and biases of every layer
+    def _networkParams(self):
+        p = []
+        for l in sorted((k for k in self._network if k.startswith("L")),
+                        key = lambda k: int(k[1:])):
+            p = p + [self._network[l]["w"], self._network[l]["b"]]
+        return p
+
+    ## The _loadEngine method loads the given weights in the numpy network
+    #  used to act, creating it the first time. It does nothing if acting with
+    #  numpy is disabled. With the "int8" setting, the weights are quantized
+    #
+    #   @param values : A dictionary of the weights keyed by name. If None
+    #                   (default), the current weights of the network are used
+    def _loadEngine(self, values = None):
+        mode = self._params["P"].get("numpy", False)
+        if not mode:
+            return
+
+        if values is None:
+            values = {p.name : p.get_value(borrow = True)
+                      for p in self._networkParams()}
+        if mode == "int8":
+            values = NN.quantize(values)
+
+        if self._engine is None:
+            cls          = NN.QuantizedNetwork if mode == "int8" else \
+                           NN.NumpyNetwork
+            self._engine = cls(self._params["N"]["layers"],
+                               self._network["IN"]["s"], values)
+        else:
+            self._engine.load(values)
+
+    ## The _startPrefetch method starts the thread that builds the minibatches
+    #  in the background if it's enabled. Otherwise the minibatches are built
+    #  in pre-allocated arrays when they are needed
+    def _startPrefetch(self):
+        depth       = self._params["L"].get("prefetch", 0)
+        self._batch = self._replay.newBatch(self._params["L"]["batch"])
+        self._lock  = Thr.Lock()
+
+        if depth > 0:
+            self._prefetch = Pf.Prefetcher(self._replay,
+                                           self._params["L"]["batch"],
+                                           self._beta, depth)
+            self._lock     = self._prefetch.lock
+            self._prefetch.start()
+
+    ## The _stopPrefetch method stops the thread that builds the minibatches,
+    #  if any, and prints its statistics
+    def _stopPrefetch(self):
+        if self._prefetch is None:
+            return
+
+        self._prefetch.stop()
+        st = self._prefetch.stats()
+        print("Prefetch: {} minibatches - {} stalls - {:.1f}s waiting" \
+              .format(st["batches"], st["stalls"], st["wait"]))
+        self._prefetch = None
+
+    ## The _minibatch method returns the next training minibatch as returned
+    #  by ReplayMemory.minibatch
+    def _minibatch(self):
+        if self._prefetch is None:
+            return self._replay.minibatch(self._params["L"]["batch"],
+                                          self._beta(), self._batch)
+        return self._prefetch.get()
             
     ## The replay method makes the agent to replay the given epoch
     #
@@ -559,6 +812,7 @@ class DeepMindAgent(A.Agent):
     def replay(self, epoch, save = None):
       
       self.loadNetwork(self._saver.loadNetworkEpoch(self.id, epoch))
+      self._loadEngine()
       
       score  = 0
       reward = 0
@@ -566,8 +820,8 @@ class DeepMindAgent(A.Agent):
       
       self._newGame(0)
       while not self._env.gameOver() :
-        a_id   = self._getNextAction(self._input)
-        r_t    = self._performAction(act[a_id])
+        a_id   = self._getNextAction(self._input.view())
+        r_t    = self._step(act[a_id])
         
         score = score + r_t
                 
@@ -578,8 +832,6 @@ class DeepMindAgent(A.Agent):
         
         if not (save is None):
           self._env.saveFrame(save)
-        
-        self._updateInput()
       
       return (score, reward)
     
@@ -593,29 +845,44 @@ class DeepMindAgent(A.Agent):
     #          end up comparing these early results with the later ones computed
     #          over a small number of games.
     def _test(self):
-        print("Testing ... ", end = "", flush = True)
         epoch = self._params["S"]["it"] / self._params["T"]["epoch"]
-        
-        ## If it's the first epoch, initialize the plotter object
-        if epoch == 0:
-            style = [{"color":"#5b5bbb", "width" : 2}]
-            self._plotter.addGroup("Test")
-            self._plotter.addPlot ("Test", "Q Average"     , 1, style)
-            self._plotter.addPlot ("Test", "Q Max Average" , 1, style)
-            self._plotter.addPlot ("Test", "Average score" , 1, style)
-            self._plotter.addPlot ("Test", "Average reward", 1, style)
-        
-        i     = 0
+
+        if not (self._evaluator is None):
+            print("Testing epoch {:g} in the background".format(epoch))
+            self._evaluator.submit(epoch,
+                                   [p.get_value()
+                                    for p in self._networkParams()],
+                                   self._networkId)
+            return
+
+        print("Testing ... ", end = "", flush = True)
+        sums  = self._evaluate(0, len(self._testSet), self._params["T"]["it"])
+        delta = datetime.timedelta(seconds = int(round(sums["time"])))
+        print("done [{}]".format(delta))
+        self._reportTest(epoch, self._networkId, sums)
+
+    ## The _evaluate method computes the statistics of the current network
+    #  over a part of the test set and a number of test steps
+    #
+    #   @param lo    : The index of the first state of the test set to use
+    #   @param hi    : The index following the last state of the test set to
+    #                  use
+    #   @param steps : The number of steps to play
+    #
+    #   @return A dictionary holding the sums of the average Q values ("q"),
+    #           of the maximum Q values ("m"), the number of states ("states"),
+    #           the total score ("score") and reward ("reward"), the number of
+    #           games played ("games") and the time spent playing ("time")
+    def _evaluate(self, lo, hi, steps):
+        i     = lo
         chunk = 1000
         avg   = [0, 0]
-        while i < len(self._testSet):
-            tmp = self._network["OUT"]["avg"](self._testSet[i:i + chunk])
-            avg[0] = avg[0] + tmp[0] * len(self._testSet[i:i + chunk])
-            avg[1] = avg[1] + tmp[1] * len(self._testSet[i:i + chunk])
-            i = i + chunk
-            
-        avg[0] = avg[0] / len(self._testSet)
-        avg[1] = avg[1] / len(self._testSet)
+        while i < hi:
+            j      = min(i + chunk, hi)
+            tmp    = self._network["OUT"]["fwd"](self._testSet[i:j])
+            avg[0] = avg[0] + tmp[0].mean() * (j - i)
+            avg[1] = avg[1] + tmp[1].mean() * (j - i)
+            i      = j
         
         act    = self._params["N"]["act"]
         score  = 0.0
@@ -623,75 +890,194 @@ class DeepMindAgent(A.Agent):
         games  = 0
         it     = 0
         t1     = time.time()
+        self._loadEngine()
         
-        while it < self._params["T"]["it"]:
+        while it < steps:
             self._newGame(0)
-            while it < self._params["T"]["it"] and \
+            while it < steps and \
                   not self._env.gameOver() :
-                a_id   = self._getNextAction(self._input)
-                r_t    = self._performAction(act[a_id])
+                a_id   = self._getNextAction(self._input.view())
+                r_t    = self._step(act[a_id])
                 score  = score + r_t
                 
                 if r_t > 0 : r_t = self._params["L"]["maxR"]
                 if r_t < 0 : r_t = self._params["L"]["minR"]
                 reward = reward + r_t
-                self._updateInput()
                 it = it + 1
             games = games + 1
-            
-        t2     = time.time()
-        delta  = datetime.timedelta(seconds = int(round(t2 - t1)))
-        score  = score  / games
-        reward = reward / games
-        qAvg   = float(avg[0])
-        mAvg   = float(avg[1])
-        
-        print("done [{}]".format(delta))
+
+        # The training goes on with the network's weights, which change at
+        # every step
+        self._engine = None
+
+        return {"q"      : float(avg[0]),
+                "m"      : float(avg[1]),
+                "states" : hi - lo,
+                "score"  : float(score),
+                "reward" : float(reward),
+                "games"  : games,
+                "time"   : time.time() - t1}
+
+    ## The _reportTest method plots the results of a test and saves them in
+    #  the saver object
+    #
+    #   @param epoch     : The epoch tested
+    #   @param networkId : The id of the network tested
+    #   @param sums      : The sums returned by _evaluate, possibly added up
+    #                      over several processes
+    def _reportTest(self, epoch, networkId, sums):
+        ## If it's the first epoch, initialize the plotter object
+        if epoch == 0:
+            style = [{"color":"#5b5bbb", "width" : 2}]
+            self._plotter.addGroup("Test")
+            self._plotter.addPlot ("Test", "Q Average"     , 1, style)
+            self._plotter.addPlot ("Test", "Q Max Average" , 1, style)
+            self._plotter.addPlot ("Test", "Average score" , 1, style)
+            self._plotter.addPlot ("Test", "Average reward", 1, style)
+
+        games  = max(1, sums["games"])
+        score  = sums["score"]  / games
+        reward = sums["reward"] / games
+        qAvg   = sums["q"] / max(1, sums["states"])
+        mAvg   = sums["m"] / max(1, sums["states"])
                                    
         self._plotter.updatePlot("Test", "Q Average"     , epoch, [qAvg]  )
         self._plotter.updatePlot("Test", "Q Max Average" , epoch, [mAvg]  )
         self._plotter.updatePlot("Test", "Average score" , epoch, [score] )
         self._plotter.updatePlot("Test", "Average reward", epoch, [reward])
         
-        self._saver.saveStat(self.id, self._networkId, "Q Average"     , epoch,
+        self._saver.saveStat(self.id, networkId, "Q Average"     , epoch,
                              qAvg)
-        self._saver.saveStat(self.id, self._networkId, "Q Max Average" , epoch,
+        self._saver.saveStat(self.id, networkId, "Q Max Average" , epoch,
                              mAvg)
-        self._saver.saveStat(self.id, self._networkId, "Average score" , epoch,
+        self._saver.saveStat(self.id, networkId, "Average score" , epoch,
                              score)
-        self._saver.saveStat(self.id, self._networkId, "Average reward", epoch,
+        self._saver.saveStat(self.id, networkId, "Average reward", epoch,
                              reward)
 
+    ## The _startEvaluator method starts the test processes if the tests are
+    #  to be run in the background
+    def _startEvaluator(self):
+        n = self._params["T"].get("workers", 0)
+        if n > 0 and self._evaluator is None:
+            self._evaluator = Ev.Evaluator(n, self._evalLoop, int(time.time()))
+
+    ## The _stopEvaluator method waits for the background tests to finish,
+    #  reports them and stops the test processes
+    def _stopEvaluator(self):
+        if self._evaluator is None:
+            return
+
+        if self._evaluator.pending() > 0:
+            print("Waiting for {} test(s) ... ".format(
+                      self._evaluator.pending()), end = "", flush = True)
+            self._pollTest(True)
+            print("done")
+        self._evaluator.stop()
+        self._evaluator = None
+
+    ## The _pollTest method reports the background tests which are finished
+    #
+    #   @param block : If True, waits for all the tests to finish. Default
+    #                  False
+    def _pollTest(self, block = False):
+        if self._evaluator is None:
+            return
+
+        for epoch, networkId, sums in self._evaluator.poll(block):
+            if not block:
+                print("Test of epoch {:g} done".format(epoch))
+            self._reportTest(epoch, networkId, sums)
+
+    ## The _evalLoop method is the main loop of a test process. It tests the
+    #  weights it receives over its share of the test set and of the test
+    #  steps until it receives None
+    #
+    #   @param k    : The index of the process
+    #   @param n    : The number of test processes
+    #   @param conn : The end of the pipe connected to the agent
+    #   @param seed : The seed of the random generators
+    def _evalLoop(self, k, n, conn, seed):
+        self._forkSetup(seed)
+
+        params = self._networkParams()
+        size   = len(self._testSet)
+        steps  = self._params["T"]["it"]
+        lo, hi = size * k // n, size * (k + 1) // n
+        steps  = steps * (k + 1) // n - steps * k // n
+
+        while True:
+            task = conn.recv()
+            if task is None:
+                break
+
+            epoch, weights = task
+            for p, v in zip(params, weights):
+                p.set_value(v)
+            conn.send((epoch, self._evaluate(lo, hi, steps)))
+        conn.close()
+
     ## The _initializeReplay initializes the replay memory and fill it with
     #  random game experiences
+    #
+    #   If the "mmap" backend is selected and the agent's replay memory files
+    #   already exist, they are reopened. Otherwise, the last snapshot saved in
+    #   the saver object is restored, if any. The memory is then only filled if
+    #   it holds less experiences than required before training
     def _initializeReplay(self):
         print("Initializing replay memory ... ", end = "", flush = True)
-        self._replay = ReplayMemory(self._params["L"]["repSize"],
-                                    self._params["N"]["actCnt"],
-                                    self._params["N"]["inC"],
-                                    self._params["N"]["inH"],
-                                    self._params["N"]["inW"])
+        dims = [self._params["L"]["repSize"],
+                self._params["N"]["actCnt"],
+                self._params["N"]["inC"],
+                self._params["N"]["inH"],
+                self._params["N"]["inW"]]
+
+        alpha = self._params["L"].get("alpha"  , 0)
+        eps   = self._params["L"].get("prioEps", 1e-6)
+        nStep = self._params["L"].get("nStep"  , 1)
+        disc  = self._params["L"]["disc"]
+
+        # The agents saved before "repSlack" keep their frame count, so their
+        # replay memories can be reopened
+        frames = RM.ReplayMemory.frameCount(dims[0], dims[2],
+                                            self._params["L"].get("repSlack",
+                                                                  0))
+
+        if self._params["L"].get("repBackend", "memory") == "mmap":
+            path         = os.path.join(self._params["L"]["repPath"],
+                                        "agent_{}".format(self.id))
+            self._replay = RM.MappedReplayMemory(path, *dims, frames = frames,
+                                                 alpha = alpha, eps = eps,
+                                                 nStep = nStep, disc = disc)
+        else:
+            self._replay = RM.ReplayMemory(*dims, frames = frames,
+                                           alpha = alpha, eps = eps,
+                                           nStep = nStep, disc = disc)
+            if self._params["L"].get("repSave", False):
+                self._saver.loadReplay(self.id, self._replay)
         
         act    = self._params["N"]["act"]
         actCnt = self._params["N"]["actCnt"]
 
-        while len(self._replay) < self._params["P"]["obs"] :
+        # Without enough slack for the start frames, the replay memory is full
+        # before holding "repSize" experiences
+        obs = lambda: len(self._replay) < self._params["P"]["obs"] and \
+                      not self._replay.full()
+
+        while obs() :
             self._newGame()
-            self._replay.addImages(self._input)
-            while (not self._env.gameOver()) and \
-                  (len(self._replay) < self._params["P"]["obs"]) :
-                s_t        = np.array(self._input, dtype = np.float32)
+            self._replay.addImages(self._screens.view())
+            while (not self._env.gameOver()) and obs() :
                 a_id       = random.randrange(actCnt)
-                r_t        = self._performAction(act[a_id])
-                self._updateInput()
-                s_t1       = np.array(self._input, dtype = np.float32)
+                r_t        = self._step(act[a_id])
 
                 if r_t > 0 : r_t = self._params["L"]["maxR"]
                 if r_t < 0 : r_t = self._params["L"]["minR"]
 
-                self._replay.addExperience(self._input[-1], a_id, r_t,
+                self._replay.addExperience(self._screens.newest(), a_id, r_t,
                                            self._env.gameOver())
-        print("done")
+        self._replay.flush()
+        print("done [{} experiences]".format(len(self._replay)))
     
     ## The _initializeTest method initilize query the saver for a valid test
     #  set or initializes a new one with random states picked from the game
@@ -726,10 +1112,9 @@ class DeepMindAgent(A.Agent):
                   (i < self._params["T"]["setMin"]):
                 
                 if random.random() < 0.25 :
-                    self._testSet[i,:] = self._input
+                    self._testSet[i,:] = self._input.view()
                     i = i + 1
-                self._performAction(random.randrange(actCnt))
-                self._updateInput()
+                self._step(random.randrange(actCnt))
 
         self._params["T"]["setId"] = self._saver.newDataset(
                                                  self._params["T"]["setMin"],
@@ -740,20 +1125,36 @@ class DeepMindAgent(A.Agent):
     ## The _newGame method resets the game and perform a random number of random
     #  action. At the end, the input state is left in a non terminal state
     #
+    #   When the start library is enabled, games started with the default
+    #   waiting parameter are started from one of its states. Otherwise, the
+    #   reached state is saved in the library
+    #
     #   @param wait : The number of random action to perform after reseting the
     #                 game. If None (default), this number is set to the agent
     #                 waiting parameter
     def _newGame(self, wait = None):
         if self._input is None:
-            self._input = C.deque(maxlen = self._params["N"]["inC"])
+            dims          = [self._params["N"]["inC"],
+                             self._params["N"]["inH"],
+                             self._params["N"]["inW"]]
+            self._input   = RM.FrameStack(*dims)
+            self._screens = RM.FrameStack(*dims, dtype = np.uint8)
+
+            if self._params["P"].get("starts", 0) > 0:
+                self._starts = SL.StartLibrary(self._env,
+                                               self._params["P"]["starts"],
+                                               self._params["P"]["stUses"])
         
-        for i in range(self._input.maxlen):
-            self._input.append(np.zeros([self._params["N"]["inH"],
-                                         self._params["N"]["inW"]],
-                                         dtype = np.float32))
+        self._input.clear()
+        self._screens.clear()
         
         if wait is None:
-            wait = self._params["P"]["wait"]
+            wait   = self._params["P"]["wait"]
+            frames = None if self._starts is None else self._starts.draw()
+            if not (frames is None):
+                for f in frames:
+                    self._input.push(self._screens.push(f), 1 / 255.0)
+                return
         
         self._env.resetGame()
         actCnt = self._params["N"]["actCnt"]
@@ -771,24 +1172,28 @@ class DeepMindAgent(A.Agent):
         self._updateInput()
          
         while i < w:
-            self._performAction(random.randrange(actCnt))
-            self._updateInput()
+            self._step(random.randrange(actCnt))
             i = i + 1
             
             if self._env.gameOver():
                 print(("WARNING: Game over after {} actions. " + 
                        "Retry with 'wait' set to {}").format(i, wait - 5))
                 return self._newGame(wait - 5)
+
+        if not (self._starts is None) and wait > 0:
+            self._starts.add(self._screens.view())
     
     ## The _updateInput method query the game environment to get the current
-    #  screen scale it and push it into the input variable
+    #  screen scale it and push it into the input variable. The raw screen is
+    #  kept aside for the replay memory
     def _updateInput(self):
-        self._input.append(self._env.getScreen() / 255.0)
+        self._env.getScreen(out = self._screens.slot())
+        self._input.push(self._screens.push(), 1 / 255.0)
 
     ## The _getNextAction method returns the id of the next action to perform
     #  following an epsilon greedy strategy
     #
-    #   @param x       : The initial state
+    #   @param x       : The initial state, an array of shape [c, h, w]
     #   @param epsilon : The value to use for epsilon. If None (default), the
     #                    test value is used
     #
@@ -799,8 +1204,10 @@ class DeepMindAgent(A.Agent):
 
         if random.random() < epsilon:
             a_id = random.randrange(self._params["N"]["actCnt"])
+        elif not (self._engine is None):
+            a_id = self._engine.act(x)
         else:
-            a_id = self._network["OUT"]["max"]([x])[1][0]
+            a_id = self._network["OUT"]["fwd"](x[np.newaxis])[2][0]
 
         return a_id
 
@@ -817,6 +1224,19 @@ class DeepMindAgent(A.Agent):
             if self._env.gameOver(): break
         return r
 
+    ## The _step method performs the given action 'n' times against the game
+    #  environment and pushes the resulting screen into the input variable
+    #
+    #   @param a : The action to perform
+    #
+    #   @return The reward accumulated while performing the actions
+    def _step(self, a):
+        r, screen = self._env.step(a, self._params["P"]["rep"],
+                                   self._params["P"].get("maxPool", False),
+                                   self._screens.slot())
+        self._input.push(self._screens.push(), 1 / 255.0)
+        return r
+
     ## The _epsilon method return the value of epsilon related to the current
     #  iteration
     def _epsilon(self):
@@ -826,6 +1246,17 @@ class DeepMindAgent(A.Agent):
 
         return max(self._params["L"]["epsMin"], e)
 
+    ## The _beta method return the value of the importance-sampling exponent
+    #  related to the current iteration. It grows linearly to 1
+    def _beta(self):
+        if not ("beta" in self._params["L"]):
+            return 1
+
+        b = (( (1 - self._params["L"]["beta"]) / self._params["L"]["betaTS"]) \
+              * self._params["S"]["it"]) + self._params["L"]["beta"]
+
+        return min(1, b)
+
     ## The _displayImage method displays the given images
     #
     #   @param imgs : An array of images to display with matplotlib.pyplot
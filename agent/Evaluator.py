@@ -0,0 +1,104 @@
+import multiprocessing as MP
+
+################################################################################
+## The Evaluator class tests snapshots of the network in worker processes
+#  while the agent keeps training
+#
+# The workers are forked from the agent process, so they start with a copy of
+# its network, compiled functions and test set. Every test is split between
+# all the workers: each one loads the snapshot of the weights, computes its
+# share of the statistics and sends back sums. The agent polls the evaluator
+# and gets the aggregated statistics of the tests once all the workers
+# answered, in the order the tests were submitted.
+#
+################################################################################
+class Evaluator:
+
+    ## The Evaluator constructor. It starts the worker processes
+    #
+    #   @param n      : The number of workers
+    #   @param target : The function run by every worker. It's called with the
+    #                   parameters (k, n, conn, seed) where k is the worker
+    #                   index, conn its end of a multiprocessing.Pipe and seed
+    #                   the seed of its random generators. It receives
+    #                   (epoch, weights) tuples or None to stop, and answers
+    #                   (epoch, sums) tuples where sums is a dictionary of
+    #                   values to add up
+    #   @param seed   : The seed of the first worker, the k-th using 'seed + k'
+    def __init__(self, n, target, seed):
+        assert n > 0, "At least one worker is needed"
+
+        ctx           = MP.get_context("fork")
+        self._pipes   = []
+        self._procs   = []
+        self._pending = [] # Tests submitted: [epoch, info, answers, sums]
+        self._recv    = [0] * n # Number of answers received from every worker
+        self._done    = 0       # Number of tests returned by poll
+
+        for k in range(n):
+            parent, child = ctx.Pipe()
+            p             = ctx.Process(target = target,
+                                        args   = (k, n, child, seed + k))
+            p.daemon      = True
+            p.start()
+            child.close()
+            self._pipes.append(parent)
+            self._procs.append(p)
+
+    ## The pending method returns the number of tests not finished yet
+    def pending(self):
+        return len(self._pending)
+
+    ## The submit method starts the test of the given weights
+    #
+    #   @param epoch   : The epoch of the weights
+    #   @param weights : The list of the values of the network's parameters
+    #   @param info    : Any value returned along with the results. Default
+    #                    None
+    def submit(self, epoch, weights, info = None):
+        for p in self._pipes:
+            p.send((epoch, weights))
+        self._pending.append([epoch, info, 0, {}])
+
+    ## The poll method collects the answers of the workers and returns the
+    #  tests which are finished
+    #
+    #   @param block : If True, waits until all the submitted tests are
+    #                  finished. Default False
+    #
+    #   @return A list of tuples (epoch, info, sums) where sums holds, for
+    #           every value the workers answered, the sum over all of them
+    def poll(self, block = False):
+        # Every worker answers the tests in the order they were submitted
+        for k, p in enumerate(self._pipes):
+            while self._recv[k] - self._done < len(self._pending) and \
+                  (block or p.poll()):
+                epoch, sums   = p.recv()
+                t             = self._pending[self._recv[k] - self._done]
+                for key, v in sums.items():
+                    t[3][key] = t[3].get(key, 0) + v
+                t[2]          = t[2] + 1
+                self._recv[k] = self._recv[k] + 1
+
+        done = []
+        while len(self._pending) > 0 and \
+              self._pending[0][2] == len(self._pipes):
+            epoch, info, cnt, sums = self._pending.pop(0)
+            self._done             = self._done + 1
+            done.append((epoch, info, sums))
+        return done
+
+    ## The stop method stops the workers and waits for them to terminate. The
+    #  tests not finished are dropped
+    def stop(self):
+        for p, proc in zip(self._pipes, self._procs):
+            try:
+                p.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            proc.join()
+            p.close()
+
+        self._pipes   = []
+        self._procs   = []
+        self._pending = []
@@ -0,0 +1,103 @@
+import time
+import queue     as Q
+import threading as Thr
+
+################################################################################
+## The Prefetcher class builds minibatches from a replay memory in a background
+#  thread so they are ready when the training loop needs them
+#
+# The prefetcher owns 'depth + 1' sets of pre-allocated arrays as returned by
+# ReplayMemory.newBatch. The thread fills the free sets and queues them, at
+# most 'depth' minibatches being ready at the same time. The set handed out by
+# the get method is given back to the thread on the next call to get, so a
+# minibatch stays valid until then.
+#
+# The replay memory must not be modified while a minibatch is built. The owner
+# of the replay memory has to hold Prefetcher.lock while adding experiences or
+# updating priorities.
+#
+################################################################################
+class Prefetcher(Thr.Thread):
+
+    ## The Prefetcher constructor
+    #
+    #   @param replay : The replay memory to draw the minibatches from. It must
+    #                   already hold at least 'size' experiences
+    #   @param size   : The size of the minibatches
+    #   @param beta   : A function without parameter that returns the
+    #                   importance-sampling exponent to pass to
+    #                   ReplayMemory.minibatch
+    #   @param depth  : The maximum number of minibatches built ahead.
+    #                   Default 2
+    def __init__(self, replay, size, beta, depth = 2):
+        assert len(replay) >= size, \
+               "The replay memory holds less than {} experiences".format(size)
+
+        Thr.Thread.__init__(self)
+        self.daemon   = True
+
+        ## The lock to hold while modifying the replay memory
+        self.lock     = Thr.Lock()
+
+        self._replay  = replay
+        self._size    = size
+        self._beta    = beta
+        self._free    = Q.Queue()
+        self._ready   = Q.Queue()
+        self._last    = None  # The set of arrays handed out by get
+        self._quit    = False
+        self._batches = 0     # Number of minibatches handed out
+        self._stalls  = 0     # Number of times get had to wait
+        self._wait    = 0.0   # Time spent waiting in get
+
+        for i in range(depth + 1):
+            self._free.put(replay.newBatch(size))
+
+    ## The run method overrides the threading.Thread.run method. It fills the
+    #  free sets of arrays until stop is called
+    def run(self):
+        while True:
+            out = self._free.get()
+            if self._quit: break
+
+            with self.lock:
+                batch = self._replay.minibatch(self._size, self._beta(), out)
+            self._ready.put((out, batch))
+
+    ## The get method returns the next minibatch as returned by
+    #  ReplayMemory.minibatch. It blocks until a minibatch is ready
+    #
+    #   @return The next minibatch
+    def get(self):
+        if not (self._last is None):
+            self._free.put(self._last)
+
+        if self._ready.empty():
+            self._stalls = self._stalls + 1
+            t            = time.time()
+            self._last,\
+            batch        = self._ready.get()
+            self._wait   = self._wait + time.time() - t
+        else:
+            self._last,\
+            batch        = self._ready.get()
+
+        self._batches = self._batches + 1
+        return batch
+
+    ## The stop method stops the thread and waits for it to terminate
+    def stop(self):
+        self._quit = True
+        self._free.put(None)
+        self.join()
+
+    ## The stats method returns statistics about the prefetcher
+    #
+    #   @return A dictionary with the number of minibatches handed out
+    #           ("batches"), the number of times get had to wait for a
+    #           minibatch ("stalls") and the time spent waiting in seconds
+    #           ("wait")
+    def stats(self):
+        return {"batches" : self._batches,
+                "stalls"  : self._stalls,
+                "wait"    : self._wait}
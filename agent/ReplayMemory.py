@@ -0,0 +1,752 @@
+import os
+import json
+import math
+import zlib
+import struct
+import collections   as C
+import numpy         as np
+
+import agent.SumTree as ST
+
+################################################################################
+## The FrameStack class keeps the 'c' last frames of a game as one contiguous
+#  array of shape [c, h, w]
+#
+# Every frame is written twice in a buffer of shape [2 * c, h, w], at the
+# positions k and k + c where k cycles from 0 to c - 1. The 'c' last frames,
+# from the oldest to the newest, are then always the slice [k + 1, k + 1 + c]
+# of the buffer, so the stack is handed out as a view without moving nor
+# copying any frame.
+#
+################################################################################
+class FrameStack:
+
+    ## The FrameStack constructor
+    #
+    #   @param c     : The number of frames in the stack
+    #   @param h     : The frames' height
+    #   @param w     : The frames' width
+    #   @param dtype : The type of the frames. Default np.float32
+    def __init__(self, c, h, w, dtype = np.float32):
+        self._c   = c
+        self._buf = np.zeros([2 * c, h, w], dtype = dtype)
+        self._k   = c - 1 # Position of the newest frame
+
+    ## The clear method sets all the frames of the stack to 0
+    def clear(self):
+        self._buf.fill(0)
+        self._k = self._c - 1
+
+    ## The slot method returns the array the next frame will be written to.
+    #  The caller can fill it in place and then call push without parameter
+    #
+    #   @return A view of shape [h, w]
+    def slot(self):
+        return self._buf[(self._k + 1) % self._c]
+
+    ## The push method adds a frame to the stack, dropping the oldest one
+    #
+    #   @param img   : An array of shape [h, w]. If None (default), the frame
+    #                  is the one written in the array returned by slot
+    #   @param scale : If not None (default), the frame is multiplied by this
+    #                  factor
+    #
+    #   @return A view of shape [h, w] on the added frame
+    def push(self, img = None, scale = None):
+        k   = (self._k + 1) % self._c
+        dst = self._buf[k]
+        if not (scale is None):
+            np.multiply(dst if img is None else img, scale, out = dst)
+        elif not (img is None):
+            dst[...] = img
+
+        self._buf[k + self._c] = dst
+        self._k                = k
+        return dst
+
+    ## The newest method returns the last frame added to the stack
+    #
+    #   @return A view of shape [h, w]
+    def newest(self):
+        return self._buf[self._k]
+
+    ## The view method returns the frames of the stack from the oldest to the
+    #  newest. The view is only valid until the next call to push
+    #
+    #   @return A view of shape [c, h, w]
+    def view(self):
+        return self._buf[self._k + 1:self._k + 1 + self._c]
+
+################################################################################
+## The FrameStore class implements a circular store of raw frames
+#
+# The FrameStore class keeps the frames as np.uint8 arrays of shape [h, w] in
+# one array pre-allocated at construction. Frames are written one after the
+# other and, once the store is full, the newest frame overwrites the oldest
+# one.
+#
+# Every frame is identified by its absolute index, i.e. the number of frames
+# added to the store before it. A frame is available as long as less than
+# 'capacity' frames have been added after it.
+#
+################################################################################
+class FrameStore:
+
+    ## The FrameStore constructor
+    #
+    #   @param capacity : The number of frames the store is able to keep
+    #   @param h        : The frames' height
+    #   @param w        : The frames' width
+    #   @param frames   : An array of np.uint8 of shape [capacity, h, w] to use
+    #                     as storage. If None (default), a new one is allocated
+    def __init__(self, capacity, h, w, frames = None):
+        if frames is None:
+            frames = np.zeros([capacity, h, w], dtype = np.uint8)
+
+        self._cap    = capacity
+        self._h      = h
+        self._w      = w
+        self._frames = frames
+        self._cnt    = 0 # Number of frames added since the creation
+
+    ## The capacity method returns the number of frames the store can keep
+    def capacity(self):
+        return self._cap
+
+    ## The count method returns the number of frames added to the store since
+    #  its creation
+    def count(self):
+        return self._cnt
+
+    ## The seek method sets the number of frames added to the store. It's used
+    #  when the storage array already contains frames
+    #
+    #   @param cnt : The number of frames already added
+    def seek(self, cnt):
+        self._cnt = cnt
+
+    ## The addImage method copies the given frame into the store
+    #
+    #   @param img : An array of shape [h, w] which values are between 0 and
+    #                255
+    #
+    #   @return The absolute index of the stored frame
+    def addImage(self, img):
+        self._frames[self._cnt % self._cap] = img
+        self._cnt = self._cnt + 1
+        return self._cnt - 1
+
+    ## The image method returns the frame stored at the given absolute index
+    #
+    #   @param idx : The absolute index of the frame
+    #
+    #   @return A view on the requested np.uint8 frame
+    def image(self, idx):
+        return self._frames[idx % self._cap]
+
+    ## The images method gathers the frames stored at the given absolute
+    #  indexes
+    #
+    #   @param idx : An array of integers of any shape containing absolute
+    #                indexes
+    #   @param out : An array of np.uint8 of shape idx.shape + [h, w] where to
+    #                write the frames. If None (default), a new one is
+    #                allocated
+    #
+    #   @return An array of np.uint8 of shape idx.shape + [h, w]
+    def images(self, idx, out = None):
+        return np.take(self._frames, idx, axis = 0, out = out, mode = "wrap")
+
+    ## The stats method returns the occupancy of the store
+    #
+    #   @return A dictionary with the entries "capacity", "count" : the number
+    #           of frames added and "used" : the number of slots holding a frame
+    def stats(self):
+        return {"capacity" : self._cap,
+                "count"    : self._cnt,
+                "used"     : min(self._cnt, self._cap)}
+
+###############################################################################
+## The ReplayMemory class is a list of past experiences as defined in the paper
+#  <a href="https://www.cs.toronto.edu/~vmnih/docs/dqn.pdf"> Playing Atari with
+#  Deep Reinforcement Learning</a>
+#
+#   The replay memory is made of a FrameStore that keeps the raw frames as
+#   np.uint8. If 'c' is the number of images a state is made of, the replay
+#   memory keeps the ids of the 'c' last inserted images. Then when a new
+#   experience is inserted into the replay memory, only one image has to be
+#   given. The replay memory assumes that the initial state related to this
+#   experience is made of the 'c' last images and that the terminal state of
+#   this experience is made of the 'c-1' last inserted images plus the new
+#   given image.
+#
+#   The frames of a state being stored one after the other, an experience only
+#   needs to remember the index of its newest frame. The experiences are kept in
+#   flat arrays (frame index, action, reward, terminal) used as a circular
+#   buffer, so a minibatch is gathered with a few fancy-index operations. The
+#   frames are converted to np.float32 when a minibatch is built.
+#
+#   With a prioritization exponent 'alpha' greater than 0, the experiences are
+#   drawn proportionally to their priority as described in
+#   <a href="https://arxiv.org/abs/1511.05952">Prioritized Experience
+#   Replay</a>. The priorities are kept in a SumTree, new experiences get the
+#   highest priority seen so far and the priorities of the sampled experiences
+#   are refreshed from their TD errors with updatePriorities.
+#
+#   With 'nStep' greater than 1, the minibatches hold n-step discounted returns
+#   and the state reached after n steps. The sum stops at the end of an
+#   episode, detected either by a terminal experience or by a gap between the
+#   frames of two consecutive experiences (a new game), and at the newest
+#   experience. The discount to apply to the value of the reached state is
+#   returned with every experience.
+#
+#   The replay memory can be written to a file with save and restored with
+#   load. The file starts with ReplayMemory.MAGIC and the length of a JSON
+#   header describing the dimensions, the counters and the arrays. Then comes
+#   every array, split in chunks of at most ReplayMemory.CHUNK bytes. Every
+#   chunk is compressed with zlib and preceded by its compressed length.
+#
+###############################################################################
+class ReplayMemory:
+
+    ## The first bytes of a replay memory file
+    MAGIC = b"DQNRPL01"
+    ## The size of the uncompressed chunks of a replay memory file
+    CHUNK = 1 << 24
+
+    ## The ReplayMemory constructor initializes a ReplayMemory of the given
+    #  capacity
+    #
+    #   @param capacity : The number of elements the replay memory is able to
+    #                     store before erasing its oldest inserted element to
+    #                     insert new ones. The frames of the oldest
+    #                     experiences are dropped with them, so the memory
+    #                     holds 'capacity' experiences only if 'frames' leaves
+    #                     room for the 'c' start frames of every game they
+    #                     belong to. See frameCount and full
+    #   @param c        : The number of channels (i.e. images) per sequence
+    #   @param h        : The heights of an images
+    #   @param w        : The width of an image
+    #   @param actCnt   : The number of possible actions
+    #   @param frames   : The number of frames the replay memory keeps. Every
+    #                     game adds 'c' start frames of its own so, when the
+    #                     frames of its oldest experiences are overwritten,
+    #                     the replay memory drops them. If None (default), it's
+    #                     set to frameCount(capacity, c), which leaves no room
+    #                     for the start frames
+    #   @param scale    : The factor applied to the frames' values when a
+    #                     minibatch is built. Default 1 / 255
+    #   @param alpha    : The prioritization exponent. If 0 (default), the
+    #                     experiences are drawn uniformly
+    #   @param eps      : The small value added to the TD errors so no
+    #                     experience gets a priority of 0. Default 1e-6
+    #   @param nStep    : The number of rewards summed in the returns of the
+    #                     minibatches. Default 1
+    #   @param disc     : The discount factor of the returns. Default 1
+    def __init__(self, capacity, actCnt, c, h, w, frames = None,
+                 scale = 1 / 255.0, alpha = 0, eps = 1e-6, nStep = 1,
+                 disc = 1):
+        if frames is None:
+            frames = ReplayMemory.frameCount(capacity, c)
+
+        self._dims   = ReplayMemory.dimensions(capacity, actCnt, c, h, w,
+                                               frames, alpha)
+        self._arrays = C.OrderedDict() # The arrays used as storage
+        self._actCnt = actCnt
+        self._c      = c
+        self._h      = h
+        self._w      = w
+        self._scale  = np.float32(scale)
+        self._f      = FrameStore(frames, h, w,
+                                  self._allocate("frames", [frames, h, w],
+                                                 np.uint8))
+        self._cap    = capacity
+        self._head   = 0 # Position where to write the next experience
+        self._len    = 0 # Number of experiences stored
+        self._idx    = self._allocate("idx", [capacity], np.int64) # Frame
+        self._a      = self._allocate("a"  , [capacity], np.int32) # Action
+        self._r      = self._allocate("r"  , [capacity], np.float32)
+        self._t      = self._allocate("t"  , [capacity], np.float32)
+        self._offset = np.arange(-c, 1)
+        self._n      = nStep
+        self._disc   = np.float32(disc) ** np.arange(nStep + 1)
+        self._alpha  = alpha
+        self._eps    = eps
+        self._maxP   = 1.0  # Highest priority, new experiences get this one
+        self._prio   = None # Priorities of the experiences
+
+        if alpha > 0:
+            self._prio = ST.SumTree(capacity,
+                                    self._allocate("prio",
+                                                   [ST.SumTree.size(capacity)],
+                                                   np.float64))
+
+    ## The _allocate method returns a new array of zeros used as storage by the
+    #  replay memory
+    #
+    #   @param name  : The name of the array
+    #   @param shape : The shape of the array
+    #   @param dtype : The type of the array's elements
+    #
+    #   @return The allocated array
+    def _allocate(self, name, shape, dtype):
+        self._arrays[name] = np.zeros(shape, dtype = dtype)
+        return self._arrays[name]
+
+    ## The frameCount static method returns the number of frames a replay
+    #  memory needs to hold 'capacity' experiences
+    #
+    #   @param capacity : The number of experiences
+    #   @param c        : The number of frames per state
+    #   @param slack    : The number of frames kept per experience for the start
+    #                     frames of the games. With games of 'n' experiences in
+    #                     average, 'c / n' frames per experience are needed.
+    #                     Default 0
+    #
+    #   @return The number of frames
+    def frameCount(capacity, c, slack = 0):
+        return capacity + c + int(math.ceil(slack * capacity))
+
+    ## The dimensions static method returns a dictionary describing a replay
+    #  memory built with the given parameters. Two replay memories with the
+    #  same dimensions store the same arrays
+    #
+    #   @see ReplayMemory.__init__ for the parameters
+    def dimensions(capacity, actCnt, c, h, w, frames, alpha):
+        return {"capacity" : capacity, "frames" : frames,
+                "actCnt"   : actCnt  , "c"      : c,
+                "h"        : h       , "w"      : w,
+                "prio"     : alpha > 0}
+
+    ## The state method returns a dictionary holding the dimensions and the
+    #  counters of the replay memory
+    def state(self):
+        return {"dims"  : self._dims,
+                "head"  : self._head,
+                "len"   : self._len,
+                "maxP"  : self._maxP,
+                "count" : self._f.count()}
+
+    ## The _restore method sets the counters of the replay memory
+    #
+    #   @param state : A dictionary as returned by the state method
+    def _restore(self, state):
+        self._head = state["head"]
+        self._len  = state["len"]
+        self._maxP = state["maxP"]
+        self._f.seek(state["count"])
+
+    ## The save method writes the replay memory to the given file
+    #
+    #   @param path : The path of the file to create
+    def save(self, path):
+        header         = self.state()
+        header["arrs"] = [[n, a.dtype.str, list(a.shape)]
+                          for n, a in self._arrays.items()]
+        header         = json.dumps(header).encode()
+
+        with open(path, "wb") as f:
+            f.write(ReplayMemory.MAGIC)
+            f.write(struct.pack("<I", len(header)))
+            f.write(header)
+
+            for a in self._arrays.values():
+                flat = a.reshape(-1)
+                step = ReplayMemory.CHUNK // a.itemsize
+                for i in range(0, flat.size, step):
+                    z = zlib.compress(memoryview(flat[i:i + step]), 1)
+                    f.write(struct.pack("<I", len(z)))
+                    f.write(z)
+
+    ## The load method replaces the content of the replay memory with the one
+    #  of the given file. A file saved by a replay memory with other
+    #  dimensions, e.g. after a change of "repSize", is skipped
+    #
+    #   @param path : The path of the file to read
+    #
+    #   @return True if the file has been loaded, False if it has been skipped
+    def load(self, path):
+        with open(path, "rb") as f:
+            assert f.read(len(ReplayMemory.MAGIC)) == ReplayMemory.MAGIC, \
+                   "'{}' is not a replay memory file".format(path)
+
+            size   = struct.unpack("<I", f.read(4))[0]
+            header = json.loads(f.read(size).decode())
+            if header["dims"] != self._dims:
+                print("The replay memory saved in '{}' has other dimensions,"
+                      " it's skipped ... ".format(path), end = "", flush = True)
+                return False
+
+            for n, dtype, shape in header["arrs"]:
+                flat = self._arrays[n].reshape(-1)
+                step = ReplayMemory.CHUNK // flat.itemsize
+                for i in range(0, flat.size, step):
+                    size = struct.unpack("<I", f.read(4))[0]
+                    flat[i:i + step] = np.frombuffer(zlib.decompress(
+                                                         f.read(size)),
+                                                     dtype = dtype)
+
+        self._restore(header)
+        return True
+
+    ## The flush method makes sure the stored experiences are persisted. The
+    #  in-memory replay memory has nothing to persist
+    def flush(self):
+        pass
+       
+    ## The __len__ method returns the number of experiences stored in the replay
+    #  memory
+    def __len__(self):
+        return self._len
+
+    ## The full method returns whether the replay memory has reached its size,
+    #  i.e. whether adding an experience drops the oldest one. It's the case
+    #  once 'capacity' experiences are stored or, if the frames leave too
+    #  little room for the start frames of the games, once the frame store is
+    #  full with less than 'capacity' experiences
+    def full(self):
+        return self._len == self._cap or \
+               self._f.count() >= self._f.capacity()
+
+    ## The stats method returns the occupancy of the replay memory
+    #
+    #   The live frames go from the first frame of the oldest experience to the
+    #   newest frame. Every experience adds one of them, the others are the
+    #   start frames of the games, 'c' per game
+    #
+    #   @return A dictionary with the entries "experiences", "capacity" : the
+    #           maximum number of experiences, "frames" : the number of frames
+    #           the replay memory keeps, "framesUsed", "liveFrames" and
+    #           "startFrames"
+    def stats(self):
+        f = self._f.stats()
+        if self._len > 0:
+            live = f["count"] - int(self._idx[(self._head - self._len) %
+                                              self._cap]) + self._c
+        else:
+            live = f["used"]
+        return {"experiences" : self._len,
+                "capacity"    : self._cap,
+                "frames"      : f["capacity"],
+                "framesUsed"  : f["used"],
+                "liveFrames"  : live,
+                "startFrames" : live - self._len}
+
+    ## The prioritized method returns whether the experiences are drawn
+    #  proportionally to their priority or not
+    def prioritized(self):
+        return not (self._prio is None)
+        
+    ## The addImages method adds the given images to the frame store
+    #
+    #   @param imgs : A list of the raw images to add to the store
+    def addImages(self, imgs):
+        for img in imgs:
+            self._addImage(img)
+        
+    ## Adds the given experience to the replay memory
+    #
+    #   @param img : The new raw image to add to the frame store
+    #   @param a   : The id of the last action taken
+    #   @param r   : The last reward perceived
+    #   @param t   : Wheter the reached state is a terminal state or not
+    def addExperience(self, img, a, r, t):
+        i            = self._head
+        self._idx[i] = self._addImage(img)
+        self._a  [i] = a
+        self._r  [i] = r
+        self._t  [i] = t
+        self._head   = (i + 1) % self._cap
+        self._len    = min(self._len + 1, self._cap)
+
+        if not (self._prio is None):
+            self._prio.update(i, self._maxP)
+
+    ## The _addImage method adds the given image to the frame store after
+    #  dropping the experiences which frames are about to be overwritten
+    #
+    #   @param img : The raw image to add
+    #
+    #   @return The absolute index of the added image
+    def _addImage(self, img):
+        lost = self._f.count() - self._f.capacity()
+        while self._len > 0 and \
+              self._idx[(self._head - self._len) % self._cap] - self._c <= lost:
+            if not (self._prio is None):
+                self._prio.update((self._head - self._len) % self._cap, 0)
+            self._len = self._len - 1
+
+        return self._f.addImage(img)
+        
+    ## The minibatch method returns a random minibatch which size is the minimum
+    #  between the given size and the size of the replay memory. If the replay
+    #  memory is empty, the method returns None. The experiences are drawn
+    #  with replacement, uniformly or, if the replay memory is prioritized, by
+    #  stratified sampling of the priorities
+    #
+    #   @param size : The size of the minibatch to return
+    #   @param beta : The importance-sampling exponent used to compute the
+    #                 weights of a prioritized minibatch. Default 1
+    #   @param out  : A list of arrays as returned by newBatch where to write
+    #                 the minibatch. It's ignored if its size doesn't match the
+    #                 size of the minibatch. If None (default), new arrays are
+    #                 allocated
+    #
+    #   @return This method returns None if the replay memory is empty.
+    #           Otherwise it returns a minibatch made of n sample drawn from the
+    #           set of stored experiences, where 'n' is the minimum between
+    #           the length of the replay memory and the given size.
+    #           The returned minibatch is a tuple which elements are the
+    #           following:
+    #               - s_t  : an array of shape [n, c, h, w] which contains the n
+    #                        initial states of the minibatch
+    #               - s_t1 : an array of the shape [n, c, h, w] which contains
+    #                        the n states reached from respectively the n states
+    #                        stored in s_t
+    #               - a_t  : an array of shape [n, actCnt] where every row is
+    #                        full of 0 except for the value at the id
+    #                        corresponding to the action take in the respective
+    #                        n states s_t, which is then 1
+    #               - r_t  : an array of shape [n] which entries are the
+    #                        discounted sums of the rewards perceived while
+    #                        going from the n respective states s_t to the n
+    #                        respective states s_t1
+    #               - t    : an array of shape [n] which entries indicate if
+    #                        the n respective states s_t1 are terminals or not
+    #               - g_t  : an array of shape [n] which entries are the
+    #                        discounts to apply to the values of the n
+    #                        respective states s_t1, i.e. disc ** k where k
+    #                        is the number of rewards summed in r_t
+    #               - w_t  : an array of shape [n] which entries are the
+    #                        importance-sampling weights of the experiences,
+    #                        normalized by their maximum. They are all 1 if the
+    #                        replay memory isn't prioritized
+    #               - ids  : an array of shape [n] which entries identify the
+    #                        experiences for updatePriorities
+    def minibatch(self, size, beta = 1, out = None):
+        if len(self) <= 0:
+            return None
+        
+        size = min(len(self), size)
+        c    = self._c
+
+        if (out is None) or (len(out[0]) != size):
+            out = self.newBatch(size)
+
+        if self._prio is None:
+            pos = (self._head - self._len + \
+                   np.random.randint(self._len, size = size)) % self._cap
+            out[6].fill(1)
+        else:
+            total = self._prio.total()
+            pos   = self._prio.find((np.arange(size) + \
+                                     np.random.random_sample(size)) * \
+                                    (total / size))
+            w_t   = (self._len * self._prio.get(pos) / total) ** -beta
+            out[6][:] = w_t / w_t.max()
+        
+        out[2].fill(0)
+        out[2][np.arange(size), self._a[pos]] = 1
+        out[7][:] = pos
+
+        if self._n == 1:
+            # Frames [n, c + 1, h, w] of the initial and the reached states
+            imgs = self._f.images(self._idx[pos][:, None] + self._offset,
+                                  out[8])
+            np.multiply(imgs[:, :c], self._scale, out = out[0])
+            np.multiply(imgs[:, 1:], self._scale, out = out[1])
+            np.take(self._r, pos, out = out[3], mode = "clip")
+            np.take(self._t, pos, out = out[4], mode = "clip")
+            out[5].fill(self._disc[1])
+            return tuple(out[:8])
+
+        # Positions [n, nStep] of the experiences following the sampled ones.
+        # An experience is summed if the previous one is summed and isn't
+        # terminal, if it's stored and if its frame follows the previous one
+        k     = np.arange(self._n)
+        p     = (pos[:, None] + k) % self._cap
+        idx   = self._idx[p]
+        t     = self._t[p]
+        alive = ((pos - self._head + self._len) % self._cap)[:, None] + k \
+                < self._len
+        alive = alive & (idx == idx[:, :1] + k)
+        alive[:, 1:] = alive[:, 1:] & (t[:, :-1] == 0)
+        alive = np.logical_and.accumulate(alive, axis = 1)
+        last  = alive.sum(axis = 1) - 1
+        row   = np.arange(size)
+
+        np.sum(alive * self._r[p] * self._disc[:-1], axis = 1, out = out[3])
+        out[4][:] = t[row, last]
+        out[5][:] = self._disc[last + 1]
+
+        # Frames [n, 2 * c, h, w] of the initial and the reached states
+        imgs = self._f.images(np.concatenate(
+                                  [idx[:, :1]         + self._offset[:-1],
+                                   idx[row, last, None] + self._offset[1:]],
+                                  axis = 1),
+                              out[8])
+        np.multiply(imgs[:, :c], self._scale, out = out[0])
+        np.multiply(imgs[:, c:], self._scale, out = out[1])
+            
+        return tuple(out[:8])
+
+    ## The newBatch method allocates the arrays of a minibatch of the given
+    #  size
+    #
+    #   @param size : The size of the minibatch
+    #
+    #   @return A list of arrays [s_t, s_t1, a_t, r_t, t, g_t, w_t, ids, imgs]
+    #           where the first eight elements are described in the minibatch
+    #           method and imgs is an array of np.uint8 of shape
+    #           [n, c + 1, h, w], or [n, 2 * c, h, w] if 'nStep' is greater
+    #           than 1, used to gather the frames
+    def newBatch(self, size):
+        c = self._c
+        h = self._h
+        w = self._w
+        f = c + 1 if self._n == 1 else 2 * c
+        return [np.empty([size, c, h, w]      , dtype = np.float32),
+                np.empty([size, c, h, w]      , dtype = np.float32),
+                np.empty([size, self._actCnt] , dtype = np.float32),
+                np.empty([size]               , dtype = np.float32),
+                np.empty([size]               , dtype = np.float32),
+                np.empty([size]               , dtype = np.float32),
+                np.empty([size]               , dtype = np.float32),
+                np.empty([size]               , dtype = np.int64),
+                np.empty([size, f, h, w]      , dtype = np.uint8)]
+
+    ## The updatePriorities method sets the priorities of the given experiences
+    #  from their TD errors. It does nothing if the replay memory isn't
+    #  prioritized
+    #
+    #   @param ids : The identifiers of the experiences as returned by minibatch
+    #   @param err : An array of the TD errors of the experiences
+    def updatePriorities(self, ids, err):
+        if self._prio is None:
+            return
+
+        # Ignore the experiences dropped since they were sampled
+        live = (ids - self._head + self._len) % self._cap < self._len
+        p    = (np.abs(err[live]) + self._eps) ** self._alpha
+
+        if len(p) > 0:
+            self._prio.update(ids[live], p)
+            self._maxP = max(self._maxP, float(p.max()))
+
+###############################################################################
+## The MappedReplayMemory class is a ReplayMemory which frames and experiences
+#  are kept in np.memmap files
+#
+#   The files are created in the given directory, along with a JSON file
+#   describing the replay memory and its counters. The capacity is then only
+#   limited by the disk, the OS page cache holding the part of the files that
+#   is accessed the most.
+#
+#   If the directory already contains a replay memory with the same
+#   dimensions, it's reopened with its experiences instead of being created.
+#
+#   The JSON file is only valid while the files match the counters it holds:
+#   it's written by flush and deleted by the first change that follows. A
+#   replay memory which process stopped before flushing its changes has no
+#   JSON file, so it's reopened empty rather than with counters that don't
+#   match its experiences.
+#
+###############################################################################
+class MappedReplayMemory(ReplayMemory):
+    ## The MappedReplayMemory constructor opens or creates the replay memory
+    #  stored in the given directory
+    #
+    #   @param path : The directory where the files are stored
+    #
+    #   @see ReplayMemory.__init__ for the other parameters
+    def __init__(self, path, capacity, actCnt, c, h, w, frames = None,
+                 scale = 1 / 255.0, alpha = 0, eps = 1e-6, nStep = 1,
+                 disc = 1):
+        if frames is None:
+            frames = ReplayMemory.frameCount(capacity, c)
+
+        os.makedirs(path, exist_ok = True)
+
+        self._path  = path
+        self._state = None
+        self._saved = False # Whether the JSON file matches the files
+
+        if os.path.exists(self._stateFile()):
+            with open(self._stateFile()) as f:
+                state = json.load(f)
+            if state["dims"] == ReplayMemory.dimensions(capacity, actCnt, c,
+                                                        h, w, frames, alpha):
+                self._state = state
+            else:
+                print("The replay memory stored in '{}' has other dimensions,"
+                      " it's replaced ... ".format(path), end = "",
+                      flush = True)
+                os.remove(self._stateFile())
+
+        ReplayMemory.__init__(self, capacity, actCnt, c, h, w, frames, scale,
+                              alpha, eps, nStep, disc)
+
+        if not (self._state is None):
+            self._restore(self._state)
+            self._saved = True
+
+    ## The reopened method returns whether the replay memory has been reopened
+    #  from existing files or not
+    def reopened(self):
+        return not (self._state is None)
+
+    ## The _allocate method maps the given array to a file of the replay
+    #  memory's directory
+    #
+    #   @see ReplayMemory._allocate
+    def _allocate(self, name, shape, dtype):
+        mode = "w+" if self._state is None else "r+"
+        self._arrays[name] = np.memmap(os.path.join(self._path,
+                                                    name + ".dat"),
+                                       dtype = dtype, mode = mode,
+                                       shape = tuple(shape))
+        return self._arrays[name]
+
+    ## The _addImage method deletes the JSON file before the first change
+    #  following a flush, then adds the image
+    #
+    #   @see ReplayMemory._addImage
+    def _addImage(self, img):
+        self._invalidate()
+        return ReplayMemory._addImage(self, img)
+
+    ## The updatePriorities method deletes the JSON file before the first
+    #  change following a flush, then updates the priorities
+    #
+    #   @see ReplayMemory.updatePriorities
+    def updatePriorities(self, ids, err):
+        self._invalidate()
+        ReplayMemory.updatePriorities(self, ids, err)
+
+    ## The _invalidate method deletes the JSON file if it matches the files,
+    #  since they are about to change
+    def _invalidate(self):
+        if self._saved:
+            os.remove(self._stateFile())
+            self._saved = False
+
+    ## The flush method writes the mapped arrays and the counters of the
+    #  replay memory to the disk
+    #
+    #   The JSON file is written to a temporary file renamed once complete,
+    #   so it's never partially written
+    def flush(self):
+        for a in self._arrays.values():
+            a.flush()
+
+        self._state = self.state()
+        tmp         = self._stateFile() + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(self._state, f)
+        os.replace(tmp, self._stateFile())
+        self._saved = True
+
+    ## The _stateFile method returns the path to the JSON file describing the
+    #  replay memory
+    def _stateFile(self):
+        return os.path.join(self._path, "replay.json")
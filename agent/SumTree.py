@@ -0,0 +1,100 @@
+import numpy as np
+
+################################################################################
+## The SumTree class implements a binary tree which leaves hold priorities and
+#  which nodes hold the sum of their children
+#
+# The tree is stored in a flat array of 2 * n elements where n is the capacity
+# rounded up to the next power of two. The root is at index 1, the children of
+# the node i are at indexes 2 * i and 2 * i + 1 and the leaves are stored from
+# the index n. Updating a priority and drawing a leaf proportionally to its
+# priority both cost O(log n).
+#
+# The methods update and find accept arrays of indexes or values, in which case
+# the tree is walked one level at a time for all of them.
+#
+################################################################################
+class SumTree:
+
+    ## The SumTree constructor
+    #
+    #   @param capacity : The number of leaves
+    #   @param tree     : An array of np.float64 of shape
+    #                     [SumTree.size(capacity)] to use as storage. If None
+    #                     (default), a new one filled with zeros is allocated
+    def __init__(self, capacity, tree = None):
+        n = 1
+        d = 0
+        while n < capacity:
+            n = n * 2
+            d = d + 1
+
+        if tree is None:
+            tree = np.zeros([2 * n], dtype = np.float64)
+
+        self._cap   = capacity
+        self._n     = n
+        self._depth = d
+        self._tree  = tree
+
+    ## The size static method returns the number of elements of the array
+    #  storing a tree of the given capacity
+    #
+    #   @param capacity : The number of leaves
+    def size(capacity):
+        n = 1
+        while n < capacity:
+            n = n * 2
+        return 2 * n
+
+    ## The total method returns the sum of all the priorities
+    def total(self):
+        return self._tree[1]
+
+    ## The get method returns the priorities of the given leaves
+    #
+    #   @param idx : An index or an array of indexes
+    def get(self, idx):
+        return self._tree[np.asarray(idx) + self._n]
+
+    ## The update method sets the priorities of the given leaves and updates
+    #  their ancestors
+    #
+    #   @param idx : An index or an array of indexes
+    #   @param p   : The new priorities
+    def update(self, idx, p):
+        if np.isscalar(idx):
+            i             = idx + self._n
+            self._tree[i] = p
+            for d in range(self._depth):
+                i             = i // 2
+                self._tree[i] = self._tree[2 * i] + self._tree[2 * i + 1]
+            return
+
+        i             = np.asarray(idx) + self._n
+        self._tree[i] = p
+        for d in range(self._depth):
+            i             = np.unique(i // 2)
+            self._tree[i] = self._tree[2 * i] + self._tree[2 * i + 1]
+
+    ## The find method returns, for every given value v, the leaf i such that
+    #  the sum of the priorities of the leaves before i is lower or equal to v
+    #  and the sum including i is greater than v
+    #
+    #   Subtrees which sum is 0 are never entered, so a leaf with a priority of
+    #   0 is never returned
+    #
+    #   @param values : An array of values between 0 and SumTree.total()
+    #
+    #   @return An array of leaf indexes
+    def find(self, values):
+        v = np.array(values, dtype = np.float64)
+        i = np.ones(v.shape, dtype = np.int64)
+
+        for d in range(self._depth):
+            left  = self._tree[2 * i]
+            right = (v >= left) & (self._tree[2 * i + 1] > 0)
+            v     = v - left * right
+            i     = 2 * i + right
+
+        return i - self._n
@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import time
+import functools
+import numpy    as np
+
+scriptDir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(scriptDir, ".."))
+
+import SyntheticEnv as SE
+import VecGameEnv   as V
+
+################################################################################
+## CONFIGURATION
+################################################################################
+output  = "./env_bench.json"   # File where to write the results
+rom     = None                 # Path to a rom, None to use the SyntheticEnv
+outSize = [84, 84]             # Size of the screens
+steps   = 2000                 # Decisions per measure
+repeat  = 4                    # Frames per decision
+maxPool = True                 # Max of the last two frames
+cost    = 0.0002               # SyntheticEnv time per frame in seconds
+workers = [1, 2, 4, 8]         # Number of environments of the VecGameEnv
+seed    = 0                    # Seed of the first environment
+################################################################################
+
+if rom is None:
+    envClass = functools.partial(SE.SyntheticEnv, cost = cost)
+else:
+    import GameEnv as GE
+    envClass = GE.GameEnv
+
+## The benchSingle function measures a single environment stepped from the
+#  current process
+#
+#   @return The number of frames per second
+def benchSingle():
+    env = envClass(rom, outSize, seed)
+    act = env.minActions()
+    out = np.empty(outSize, dtype = np.uint8)
+    t   = time.perf_counter()
+    for i in range(steps):
+        env.step(act[i % len(act)], repeat, maxPool, out)
+        if env.gameOver():
+            env.resetGame()
+    return steps * repeat / (time.perf_counter() - t)
+
+## The benchVec function measures a VecGameEnv of n environments
+#
+#   @param n : The number of environments
+#
+#   @return The number of frames per second, all environments included
+def benchVec(n):
+    env = V.VecGameEnv(rom, outSize, n, seed, envClass)
+    act = env.minActions()
+    t   = time.perf_counter()
+    for i in range(steps):
+        env.step(act[(np.arange(n) + i) % len(act)], repeat, maxPool)
+        over = env.gameOver()
+        if over.any():
+            env.resetGame(over)
+    fps = n * steps * repeat / (time.perf_counter() - t)
+    env.close()
+    return fps
+
+results = {"time"    : time.strftime("%Y-%m-%d %H:%M:%S"),
+           "rom"     : rom,
+           "repeat"  : repeat,
+           "maxPool" : maxPool,
+           "cost"    : cost if rom is None else None,
+           "single"  : None,
+           "vec"     : {}}
+
+print("{:>8} ... ".format("single"), end = "", flush = True)
+results["single"] = benchSingle()
+print("{:>10.0f} frames/s".format(results["single"]))
+
+for n in workers:
+    print("{:>8} ... ".format("vec " + str(n)), end = "", flush = True)
+    results["vec"][str(n)] = benchVec(n)
+    print("{:>10.0f} frames/s".format(results["vec"][str(n)]))
+
+with open(output, "w") as f:
+    json.dump(results, f, indent = 2)
+print("Results written to {}".format(output))
@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import time
+import numpy    as np
+
+scriptDir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(scriptDir, ".."))
+
+import dqn.Architecture as Arch
+import dqn.NumpyNet     as NN
+
+################################################################################
+## CONFIGURATION
+################################################################################
+output  = "./inference_bench.json" # File where to write the results
+dbPath  = None                     # Database of the agent, None for random
+agentId = 1                        # Id of the agent if dbPath is given
+inShape = [4, 84, 84]              # Shape of the states
+actCnt  = 3                        # Number of actions
+calls   = 2000                     # Calls per latency measure
+batch   = 256                      # States compared with Theano
+tol     = 1e-4                     # Tolerance relative to the largest output
+seed    = 0                        # Seed of the random generator
+################################################################################
+
+rng = np.random.RandomState(seed)
+
+if dbPath is None:
+    layers = Arch.deepmindLayers(actCnt)
+    net    = NN.NumpyNetwork(layers, inShape)
+    arrays = {}
+    for i, e in enumerate(net._layers):
+        l = layers[i]
+        if l["type"] == "conv":
+            shape = [l["filters"], e["in"][2]] + l["size"]
+            fanIn = int(np.prod(shape[1:]))
+        else:
+            shape = [int(np.prod(e["in"])), l["filters"]]
+            fanIn = shape[0]
+        arrays[e["name"] + "_W"] = rng.normal(0, np.sqrt(2 / fanIn),
+                                              shape).astype(np.float32)
+        arrays[e["name"] + "_B"] = np.zeros(l["filters"], dtype = np.float32)
+    net.load(arrays)
+else:
+    import Saver as S
+    saver       = S.Saver(dbPath)
+    net, params = NN.NumpyNetwork.fromSaver(saver, agentId)
+    layers      = params["N"].get("layers",
+                                  Arch.deepmindLayers(params["N"]["actCnt"]))
+    inShape     = [params["N"]["inC"], params["N"]["inH"], params["N"]["inW"]]
+    arrays      = saver.loadNetwork(agentId)
+
+states = rng.uniform(0, 1, [batch] + inShape).astype(np.float32)
+
+## The latency function returns the average time of a call in microseconds
+#
+#   @param f : The function to call with a state
+def latency(f):
+    f(states[0])
+    t = time.perf_counter()
+    for i in range(calls):
+        f(states[i % batch])
+    return (time.perf_counter() - t) / calls * 1e6
+
+results = {"time"   : time.strftime("%Y-%m-%d %H:%M:%S"),
+           "layers" : layers,
+           "numpy"  : {},
+           "theano" : None}
+
+print("{:>8} ... ".format("numpy"), end = "", flush = True)
+results["numpy"]["act"] = latency(net.act)
+t = time.perf_counter()
+q = net.forward(states)
+results["numpy"]["batch"] = (time.perf_counter() - t) / batch * 1e6
+print("{:>10.1f} us/action - {:>8.1f} us/state in batches" \
+      .format(results["numpy"]["act"], results["numpy"]["batch"]))
+
+try:
+    import theano        as Th
+    import theano.tensor as T
+    import dqn.ConvNet   as Net
+except ImportError:
+    print("Theano isn't available, the outputs aren't compared")
+else:
+    x   = T.tensor4("Input", dtype = "float32")
+    net = Net.Network(x, [None] + inShape, layers)
+    for name, w, b, y, shape in net:
+        w.set_value(arrays[name + "_W"])
+        b.set_value(arrays[name + "_B"])
+    fwd = Th.function(inputs  = [x],
+                      outputs = [y, y.max(axis = 1), y.argmax(axis = 1)])
+
+    print("{:>8} ... ".format("theano"), end = "", flush = True)
+    ref  = fwd(states)[0]
+    err  = float(np.abs(q - ref).max() / max(1e-12, np.abs(ref).max()))
+    same = float((q.argmax(axis = 1) == ref.argmax(axis = 1)).mean())
+    results["theano"] = {"act"       : latency(lambda s:
+                                               fwd(s[np.newaxis])[2][0]),
+                         "error"     : err,
+                         "agreement" : same}
+    print("{:>10.1f} us/action - error {:.2e} - agreement {:.1%}" \
+          .format(results["theano"]["act"], err, same))
+    assert err < tol, "The numpy network doesn't match Theano"
+
+with open(output, "w") as f:
+    json.dump(results, f, indent = 2)
+print("Results written to {}".format(output))
@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import time
+
+scriptDir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(scriptDir, ".."))
+
+import dqn.Architecture as Arch
+
+################################################################################
+## CONFIGURATION
+################################################################################
+output  = "./network_cost.json"   # File where to write the results
+inShape = [4, 84, 84]             # Shape of the states
+actCnt  = 3                       # Number of actions
+batch   = 32                      # Size of the minibatch
+archs   = [                       # Architectures compared
+    {"label" : "deepmind full" , "layers" : Arch.deepmindLayers(actCnt)},
+    {"label" : "deepmind valid", "layers" : Arch.deepmindLayers(actCnt,
+                                                                "valid")},
+    {"label" : "deepmind half" , "layers" : Arch.deepmindLayers(actCnt,
+                                                                "half")}]
+################################################################################
+
+results = {"time"    : time.strftime("%Y-%m-%d %H:%M:%S"),
+           "inShape" : inShape,
+           "batch"   : batch,
+           "archs"   : []}
+
+for a in archs:
+    costs = Arch.costs(inShape, a["layers"], batch)
+    total = {k : sum(c[k] for c in costs) for k in ["flops", "params",
+                                                    "bytes"]}
+    results["archs"].append({"label"  : a["label"],
+                             "layers" : a["layers"],
+                             "costs"  : costs,
+                             "total"  : total})
+
+    print("{} - batch of {}".format(a["label"], batch))
+    print("  {:<5} {:<18} {:>10} {:>10} {:>10}" \
+          .format("layer", "output", "MFLOPs", "params", "act. KB"))
+    for c in costs:
+        print("  {:<5} {:<18} {:>10.1f} {:>10d} {:>10.1f}" \
+              .format(c["name"], "x".join(str(d) for d in c["shape"][1:]),
+                      c["flops"] / 1e6, c["params"], c["bytes"] / 2 ** 10))
+    print("  {:<5} {:<18} {:>10.1f} {:>10d} {:>10.1f}" \
+          .format("total", "", total["flops"] / 1e6, total["params"],
+                  total["bytes"] / 2 ** 10))
+
+with open(output, "w") as f:
+    json.dump(results, f, indent = 2)
+print("Results written to {}".format(output))
@@ -0,0 +1,102 @@
+import os
+import sys
+import json
+import time
+import random
+import numpy    as np
+
+scriptDir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(scriptDir, ".."))
+
+import agent.DeepMindAgent as DM
+import Message             as M
+import Saver               as S
+import SyntheticEnv        as SE
+
+################################################################################
+## CONFIGURATION
+################################################################################
+output  = "./opt_bench.json"   # File where to write the results
+dump    = "./opt_bench.rpl"    # Replay memory dump, created if it's missing
+rom     = None                 # Path to a rom, None to use the SyntheticEnv
+size    = 20000                # Experiences in the dump
+target  = 0.01                 # Target of the average loss
+window  = 500                  # Iterations averaged
+maxIt   = 50000                # Maximum number of iterations per optimizer
+maxTime = 600                  # Maximum time per optimizer in seconds
+seed    = 0                    # Seed of the network initialization
+optims  = [                    # Optimizers' parameters, added to the default
+    {"label" : "RMSProp"         , "name" : "RMSProp"},
+    {"label" : "RMSProp momentum", "name" : "RMSProp", "mom" : 1e-6},
+    {"label" : "Centered RMSProp", "name" : "CenteredRMSProp",
+     "dec"   : 0.95, "eps" : 0.01},
+    {"label" : "Adam"            , "name" : "Adam", "lr" : 0.0001,
+     "eps"   : 1e-8}]
+################################################################################
+
+if rom is None:
+    env = SE.SyntheticEnv(rom, [84, 84], seed)
+else:
+    import GameEnv as GE
+    env = GE.GameEnv(rom, [84, 84], seed)
+
+agent = DM.DeepMindAgent(M.Message(), S.Saver(":memory:"), None, env, -1)
+agent._newAgent("Optimizer benchmark")
+agent._params["L"]["repSize"]  = size
+agent._params["L"]["repSave"]  = False
+agent._params["L"]["prefetch"] = 0
+agent._params["P"]["obs"]      = 0 if os.path.exists(dump) else size
+agent._initializeReplay()
+
+if os.path.exists(dump):
+    assert agent._replay.load(dump), \
+           "The dump '{}' doesn't match the configuration, remove it" \
+           .format(dump)
+else:
+    agent._replay.save(dump)
+agent._startPrefetch()
+
+base    = dict(agent._params["O"])
+results = {"time"   : time.strftime("%Y-%m-%d %H:%M:%S"),
+           "dump"   : dump,
+           "target" : target,
+           "window" : window,
+           "optims" : []}
+
+for o in optims:
+    print("{:>18} ... ".format(o["label"]), end = "", flush = True)
+    random.seed(seed)
+    np.random.seed(seed)
+    agent._params["O"] = dict(base, **{k : v for k, v in o.items()
+                                       if k != "label"})
+    agent._params["S"]["it"]   = 0
+    agent._params["S"]["cost"] = 0
+    agent._buildNetwork()
+
+    losses = np.zeros(window)
+    reach  = None
+    t      = time.perf_counter()
+    it     = 0
+    while it < maxIt and time.perf_counter() - t < maxTime:
+        losses[it % window]      = agent._learn()
+        agent._params["S"]["it"] = it + 1
+        it                       = it + 1
+        if it >= window and losses.mean() <= target:
+            reach = time.perf_counter() - t
+            break
+
+    spent = time.perf_counter() - t
+    res   = {"optim" : o,
+             "reach" : reach,
+             "it"    : it,
+             "loss"  : float(losses[:min(it, window)].mean()),
+             "step"  : spent / max(1, it) * 1000}
+    results["optims"].append(res)
+    print("{} - {:6d} it - loss {:.4f} - {:.2f} ms/step" \
+          .format("{:7.1f}s".format(reach) if not (reach is None)
+                  else "not reached", it, res["loss"], res["step"]))
+
+agent._stopPrefetch()
+with open(output, "w") as f:
+    json.dump(results, f, indent = 2)
+print("Results written to {}".format(output))
@@ -0,0 +1,151 @@
+import os
+import sys
+import gc
+import json
+import time
+import random
+import resource
+import numpy    as np
+
+scriptDir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(scriptDir, ".."))
+
+import agent.ReplayMemory as RM
+
+################################################################################
+## CONFIGURATION
+################################################################################
+output     = "./replay_bench.json"        # File where to write the results
+capacities = [10000, 100000, 1000000]     # Replay memory capacities to test
+batches    = [32, 64, 256]                # Minibatch sizes to test
+samples    = 200                          # Minibatches drawn per size
+shape      = [4, 84, 84]                  # Channels, height, width
+actCnt     = 4                            # Number of actions
+gameLen    = [100, 2000]                  # Min. and max. experiences per game
+modes      = {"uniform"     : {},         # ReplayMemory keyword arguments
+              "prioritized" : {"alpha" : 0.6},
+              "nStep3"      : {"nStep" : 3, "disc" : 0.95}}
+################################################################################
+
+## The rss function returns the resident memory of the process in bytes
+def rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (IOError, OSError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+## The frames function returns a list of synthetic np.uint8 frames made of
+#  random blocks, which compress and vary like game screens
+#
+#   @param cnt : The number of frames
+def frames(cnt):
+    h, w = shape[1], shape[2]
+    ret  = []
+    for i in range(cnt):
+        f = np.zeros([h, w], dtype = np.uint8)
+        for j in range(8):
+            y, x    = random.randrange(h - 8), random.randrange(w - 8)
+            f[y:y + 8, x:x + 8] = random.randrange(256)
+        ret.append(f)
+    return ret
+
+## The fill function fills the given replay memory with games of random
+#  lengths as the agent does
+#
+#   @param replay : The replay memory to fill
+#   @param cnt    : The number of experiences to add
+#   @param pool   : The frames to use
+#
+#   @return The time spent in addExperience and addImages in seconds
+def fill(replay, cnt, pool):
+    spent = 0.0
+    added = 0
+    k     = 0
+    while added < cnt:
+        L = min(random.randint(gameLen[0], gameLen[1]), cnt - added)
+        t = time.perf_counter()
+        replay.addImages(pool[k:k + shape[0]])
+        for i in range(L):
+            replay.addExperience(pool[(k + i) % len(pool)], i % actCnt,
+                                 float(i % 3 == 0), i == L - 1)
+        spent = spent + time.perf_counter() - t
+        added = added + L
+        k     = (k + L) % (len(pool) - shape[0])
+    return spent
+
+## The latency function returns statistics about the time spent drawing
+#  minibatches of the given size from the given replay memory
+#
+#   @param replay : The replay memory
+#   @param size   : The size of the minibatches
+#
+#   @return A dictionary with the mean, median, 99th percentile and minimum
+#           latency in milliseconds
+def latency(replay, size):
+    out = replay.newBatch(size)
+    replay.minibatch(size, 0.4, out)
+    t   = []
+    for i in range(samples):
+        t1 = time.perf_counter()
+        replay.minibatch(size, 0.4, out)
+        t.append((time.perf_counter() - t1) * 1000)
+    t = np.array(t)
+    return {"mean" : float(t.mean()),
+            "p50"  : float(np.percentile(t, 50)),
+            "p99"  : float(np.percentile(t, 99)),
+            "min"  : float(t.min())}
+
+## The benchReplay function measures a replay memory of the given capacity
+#
+#   @param capacity : The capacity of the replay memory
+#   @param kwargs   : The keyword arguments passed to the ReplayMemory
+#   @param pool     : The frames to use
+#
+#   @return A dictionary with the results
+def benchReplay(capacity, kwargs, pool):
+    gc.collect()
+    m0     = rss()
+    replay = RM.ReplayMemory(capacity, actCnt, *shape, **kwargs)
+    m1     = rss()
+    spent  = fill(replay, capacity, pool)
+    m2     = rss()
+    res    = {"capacity"    : capacity,
+              "experiences" : len(replay),
+              "occupancy"   : replay.stats(),
+              "addPerSec"   : capacity / spent,
+              "rssEmpty"    : m1 - m0,
+              "rssFull"     : m2 - m0,
+              "minibatchMs" : {}}
+
+    for b in batches:
+        res["minibatchMs"][str(b)] = latency(replay, b)
+
+    del replay
+    return res
+
+pool    = frames(4096)
+results = {"time"   : time.strftime("%Y-%m-%d %H:%M:%S"),
+           "numpy"  : np.__version__,
+           "shape"  : shape,
+           "replay" : {}}
+
+for name, kwargs in modes.items():
+    results["replay"][name] = []
+    for cap in capacities:
+        print("{:>12} - {:>8} ... ".format(name, cap), end = "", flush = True)
+        r = benchReplay(cap, kwargs, pool)
+        results["replay"][name].append(r)
+        o = r["occupancy"]
+        print("{:>9.0f} add/s - {} ms - {:>7.1f} MB - {:>5.1%} full, "
+              "{:>4.1%} start frames".format(
+                  r["addPerSec"],
+                  " / ".join("{:.3f}".format(r["minibatchMs"][str(b)]["p50"])
+                             for b in batches),
+                  r["rssFull"] / 2 ** 20,
+                  o["experiences"] / o["capacity"],
+                  o["startFrames"] / max(1, o["liveFrames"])))
+
+with open(output, "w") as f:
+    json.dump(results, f, indent = 2)
+print("Results written to {}".format(output))
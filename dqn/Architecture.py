@@ -0,0 +1,111 @@
+import numpy as np
+
+###############################################################################
+## The deepmindLayers function returns the description of the layers of the
+#  network used by deepmind in their paper of 2013, the network of the agents
+#  saved before the layers were part of their parameters. See
+#  ConvNet.Network
+#
+#   @param actCnt : The number of actions
+#   @param pad    : The padding of the convolutional layers. Default "full",
+#                   as in the agents saved before the layers were part of
+#                   their parameters
+#
+#   @return A list describing the layers of the network
+###############################################################################
+def deepmindLayers(actCnt, pad = "full"):
+    return [{"type"   : "conv", "filters" : 16, "size" : [8, 8],
+             "stride" : [4, 4], "pad"     : pad , "act" : "relu"},
+            {"type"   : "conv", "filters" : 32, "size" : [4, 4],
+             "stride" : [2, 2], "pad"     : pad , "act" : "relu"},
+            {"type"   : "fc"  , "filters" : 256   , "act" : "relu"},
+            {"type"   : "fc"  , "filters" : actCnt, "act" : "NONE"}]
+
+###############################################################################
+## The padding function returns the number of rows and columns added on every
+#  side of the input of a convolutional layer
+#
+#   @param p  : The padding as described in ConvNet.Network
+#   @param fH : The height of the filters
+#   @param fW : The width of the filters
+#
+#   @return A tuple (vertical padding, horizontal padding)
+###############################################################################
+def padding(p, fH, fW):
+    if   p == "valid"       : return (0, 0)
+    elif p == "full"        : return (fH - 1, fW - 1)
+    elif p == "half"        : return (fH // 2, fW // 2)
+    elif isinstance(p, int) : return (p, p)
+    else                    : return (p[0], p[1])
+
+###############################################################################
+## The outputShape function computes the shape of the output of a
+#  convolutional layer set up with the given attributes
+#
+#   @param inputShape : The shape of the input, [batch, c, h, w]
+#   @param filters    : The number of filters
+#   @param fH         : The height of the filters
+#   @param fW         : The width of the filters
+#   @param vS         : The vertical stride
+#   @param hS         : The horizontal stride
+#   @param p          : The padding as described in ConvNet.Network
+#
+#   @return A list [batch, filters, height, width]
+###############################################################################
+def outputShape(inputShape, filters, fH, fW, vS, hS, p):
+    vP, hP = padding(p, fH, fW)
+    return [inputShape[0],
+            filters,
+            ((inputShape[2] + 2 * vP - fH) // vS) + 1,
+            ((inputShape[3] + 2 * hP - fW) // hS) + 1]
+
+###############################################################################
+## The costs function returns the cost of every layer of a network described
+#  as in ConvNet.Network, for a given batch, without building it
+#
+#   The floating point operations are those of a forward pass, a multiply and
+#   an add counting as two operations. The bias and the activation are
+#   counted as one operation per output each. Training costs roughly three
+#   times the forward pass: one pass forward and two backward, for the
+#   gradient of the input and of the weights
+#
+#   @param inputShape : The shape of the input of the network, with or without
+#                       the batch dimension
+#   @param layers     : The list of the layers' descriptions
+#   @param batch      : The number of states. Default 32
+#   @param itemSize   : The size in bytes of an element. Default 4 (float32)
+#   @param prefix     : The prefix of the layers' names. Default "L"
+#
+#   @returns A list containing, for every layer, a dictionary with the entries
+#            "name", "type", "shape" : the shape of the output, "flops",
+#            "params" : the number of weights and biases and "bytes" : the
+#            size of the output
+###############################################################################
+def costs(inputShape, layers, batch = 32, itemSize = 4, prefix = "L"):
+    ret = []
+    s   = [batch] + list(inputShape[-3:])
+
+    for i, l in enumerate(layers):
+        if l["type"] == "conv":
+            fH, fW = l["size"]
+            o      = outputShape(s, l["filters"], fH, fW,
+                                 l["stride"][0], l["stride"][1], l["pad"])
+            fanIn  = s[1] * fH * fW
+        elif l["type"] == "fc":
+            o      = [batch, l["filters"]]
+            fanIn  = int(np.prod(s[1:]))
+        else:
+            assert False, "Unknown layer type '{}'".format(l["type"])
+
+        outputs = int(np.prod(o[1:]))
+        ret.append({"name"   : prefix + str(i + 1),
+                    "type"   : l["type"],
+                    "shape"  : o,
+                    "flops"  : batch * outputs * (2 * fanIn +
+                                                  (1 if l["act"] == "NONE"
+                                                   else 2)),
+                    "params" : l["filters"] * (fanIn + 1),
+                    "bytes"  : batch * outputs * itemSize})
+        s = o
+
+    return ret
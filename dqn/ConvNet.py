@@ -5,6 +5,13 @@ import numpy              as np
 import theano             as Th
 import theano.tensor      as T
 import theano.tensor.nnet as Net
+import dqn.Architecture   as Arch
+
+###############################################################################
+## The costs function returns the cost of every layer of a network described
+#  as in Network, without building it. See Architecture.costs
+###############################################################################
+costs = Arch.costs
 
 ###############################################################################
 ## The InitMethod inner is an enumeration of valid initialization for the
@@ -96,32 +103,16 @@ class Paddings(E.Enum):
     #                       the convolution
     #
     #   @return A four entries list representing the computed shape
+    #
+    #   @see Architecture.outputShape, which computes it without Theano
     def outputShape(inputShape, filters, fH, fW, vS, hS, p):
         assert Paddings.isValid(p), \
                "The padding '{}' is invalid".format(p)
         
-        vP = 0
-        hP = 0
-        
-        if   p == Paddings.valid : vP = 0      ; hP = 0
-        elif p == Paddings.full  : vP = fH - 1 ; hP = fW - 1
-        elif p == Paddings.half  : vP = fH // 2; hP = fW // 2
-        elif isinstance(p, int)  : vP = e      ; hP = e
-        else                     : vP = e[0]   ; hP = e[1]
-        
-        d = []
-        d.append(inputShape[0])
-        d.append(filters)
-        d.append(((inputShape[2] + 2 * vP - fH) // vS) + 1)
-        d.append(((inputShape[3] + 2 * hP - fW) // hS) + 1)
-        
-        ## DEBUG
-        #print("{0} "                                            + \
-        #      "[{1} | {2} - {3} | {4} - {5} | {6} : {7} - {8}]" + \
-        #      "\t=> {9}"\
-        #      .format(inputShape, filters, fH, fW, vS, hS, p, vP, hP, p))
-        
-        return d
+        if isinstance(p, Paddings):
+            p = p.value
+
+        return Arch.outputShape(inputShape, filters, fH, fW, vS, hS, p)
 
 
 ###############################################################################
@@ -305,11 +296,16 @@ def ConvLayer(layerIn, inputShape, filters, fHeight, fWidth,
         w_c = w
         b_c = b
         
+    # Theano takes the explicit paddings as an int or a tuple
+    if   isinstance(inPad, Paddings) : mode = inPad.value
+    elif isinstance(inPad, int)      : mode = inPad
+    else                             : mode = (inPad[0], inPad[1])
+
     z = Net.conv2d(input        = layerIn,
                    filters      = w_c,
                    input_shape  = inputShape,
                    filter_shape = wShape,
-                   border_mode  = inPad.value,
+                   border_mode  = mode,
                    subsample    = (vStride, hStride)) + \
         b_c.dimshuffle('x', 0, 'x', 'x')
     
@@ -324,3 +320,64 @@ def ConvLayer(layerIn, inputShape, filters, fHeight, fWidth,
     
     return w, b, y, outputShape
 
+
+
+###############################################################################
+## The Network function builds a stack of layers described by a list of
+#  dictionaries, so the architecture of a network can be saved along with the
+#  parameters of an agent and rebuilt later
+#
+#   Every dictionary describes a layer. Its "type" entry is either "conv" or
+#   "fc" and its "act" entry is the name of one of the values enumerated in
+#   ActivationFunctions. The other entries are:
+#   <table>
+#   <tr>
+#       <th>type</th>
+#       <th>entries</th></tr>
+#   <tr>
+#       <td>"conv"</td>
+#       <td>"filters", "size" : [fHeight, fWidth], "stride" : [vStride,
+#           hStride] and "pad" : the name of one of the values enumerated in
+#           Paddings, an int or a pair of int</td>
+#   </tr>
+#   <tr>
+#       <td>"fc"</td>
+#       <td>"filters"</td>
+#   </tr>
+#   </table>
+#
+#   @param layerIn    : The input of the network
+#   @param inputShape : The shape of the input of the network
+#   @param layers     : The list of the layers' descriptions
+#   @param prefix     : The prefix of the layers' names, the i-th layer being
+#                       named prefix + str(i + 1). Default "L"
+#
+#   @returns A list containing, for every layer, a tuple (name, w, b, y,
+#            shape) as returned by ConvLayer or FCLayer preceded by the name
+#            of the layer
+###############################################################################
+def Network(layerIn, inputShape, layers, prefix = "L"):
+    ret = []
+    y   = layerIn
+    s   = inputShape
+
+    for i, l in enumerate(layers):
+        name = prefix + str(i + 1)
+        act  = getattr(ActivationFunctions, l["act"])
+
+        if l["type"] == "conv":
+            pad = l["pad"]
+            if isinstance(pad, str):
+                pad = Paddings(pad)
+            w, b, y, s = ConvLayer(y, s, l["filters"],
+                                   l["size"][0]  , l["size"][1],
+                                   l["stride"][0], l["stride"][1],
+                                   pad, act, name)
+        elif l["type"] == "fc":
+            w, b, y, s = FCLayer(y, s, l["filters"], act, name)
+        else:
+            assert False, "Unknown layer type '{}'".format(l["type"])
+
+        ret.append((name, w, b, y, s))
+
+    return ret
@@ -0,0 +1,331 @@
+import numpy as np
+
+from numpy.lib.stride_tricks import as_strided
+
+import dqn.Architecture as Arch
+
+################################################################################
+## The NumpyNetwork class computes the output of a network described as in
+#  ConvNet.Network with numpy only, for the processes which only need to act
+#
+# The activations are kept in the [batch, height, width, channels] layout. A
+# convolution gathers the patches of its padded input in a matrix (im2col)
+# and multiplies it by the matrix of the filters. Theano's conv2d flips the
+# filters, so they are flipped when loaded, and the weights of a fully
+# connected layer following a convolution are reordered to the layout of its
+# input. The buffers are allocated once per batch size, and large batches are
+# computed by parts of at most 'maxBatch' states so they stay small.
+#
+################################################################################
+class NumpyNetwork:
+
+    ## The NumpyNetwork constructor
+    #
+    #   @param layers     : The list of the layers' descriptions
+    #   @param inputShape : The shape of the input states, [c, h, w] or
+    #                       [batch, c, h, w]
+    #   @param arrays     : A dictionary of the values of the parameters keyed
+    #                       by name, as returned by Saver.loadNetwork. If None
+    #                       (default), they must be loaded with the method load
+    #   @param prefix     : The prefix of the layers' names. Default "L"
+    #   @param maxBatch   : The maximum number of states computed at once.
+    #                       Default 32
+    def __init__(self, layers, inputShape, arrays = None, prefix = "L",
+                 maxBatch = 32):
+        c, h, w        = inputShape[-3:]
+        self._inShape  = (c, h, w)
+        self._maxBatch = maxBatch
+        self._layers   = []
+        self._bufs     = {} # Buffers of every layer per batch size
+        shape          = (h, w, c)
+
+        for i, l in enumerate(layers):
+            e = {"name" : prefix + str(i + 1),
+                 "type" : l["type"],
+                 "act"  : l["act"],
+                 "in"   : shape}
+            if l["type"] == "conv":
+                fH, fW  = l["size"]
+                vS, hS  = l["stride"]
+                vP, hP  = Arch.padding(l["pad"], fH, fW)
+                e["f"]  = (fH, fW, vS, hS, vP, hP)
+                o       = Arch.outputShape([1, shape[2], shape[0], shape[1]],
+                                           l["filters"], fH, fW, vS, hS,
+                                           l["pad"])
+                shape   = (o[2], o[3], o[1])
+            elif l["type"] == "fc":
+                shape   = (l["filters"],)
+            else:
+                assert False, "Unknown layer type '{}'".format(l["type"])
+            e["out"] = shape
+            self._layers.append(e)
+
+        if not (arrays is None):
+            self.load(arrays)
+
+    ## The fromSaver static method returns the network of an agent saved in a
+    #  Saver object, without needing Theano
+    #
+    #   @param saver     : The Saver object
+    #   @param agentId   : The id of the agent
+    #   @param networkId : The id of the network to load. If None (default), the
+    #                      last saved network is loaded
+    #
+    #   @return A tuple (network, params) where params are the agent's
+    #           parameters
+    def fromSaver(saver, agentId, networkId = None):
+        params = saver.loadAgent(agentId)
+        nP     = params["N"]
+        layers = nP.get("layers", Arch.deepmindLayers(nP["actCnt"]))
+        net    = NumpyNetwork(layers, [nP["inC"], nP["inH"], nP["inW"]],
+                              saver.loadNetwork(agentId, networkId))
+        return (net, params)
+
+    ## The load method loads the values of the parameters
+    #
+    #   @param arrays : A dictionary of the values of the parameters keyed by
+    #                   name. The weights of the layer "L1" are "L1_W" and its
+    #                   biases "L1_B"
+    def load(self, arrays):
+        for e in self._layers:
+            w = np.asarray(arrays[e["name"] + "_W"], dtype = np.float32)
+            b = np.asarray(arrays[e["name"] + "_B"], dtype = np.float32)
+            e["w"] = self._layout(e, w)
+            e["b"] = b.copy()
+
+    ## The _layout method returns the weights of a layer as the matrix its
+    #  input is multiplied by
+    #
+    #   @param e : The layer
+    #   @param w : The weights as saved, [f, c, fH, fW] for a convolutional
+    #              layer and [inputs, f] for a fully connected one
+    #
+    #   @return A C-contiguous array of shape [inputs, f]
+    def _layout(self, e, w):
+        if e["type"] == "conv":
+            # [f, c, fH, fW] flipped -> [fH * fW * c, f]
+            w = w[:, :, ::-1, ::-1].transpose(0, 2, 3, 1)
+            w = w.reshape(w.shape[0], -1).T
+        elif len(e["in"]) == 3:
+            # Rows in the order of the input [h, w, c] instead of [c, h, w]
+            h, wd, c = e["in"]
+            w = w.reshape(c, h, wd, -1).transpose(1, 2, 0, 3)
+            w = w.reshape(h * wd * c, -1)
+        return np.ascontiguousarray(w)
+
+    ## The _matmul method multiplies the input of a layer by its weights
+    #
+    #   @param e   : The layer
+    #   @param a   : The input, a matrix of shape [rows, inputs]
+    #   @param out : The matrix of shape [rows, f] where to write the result
+    def _matmul(self, e, a, out):
+        np.dot(a, e["w"], out = out)
+
+    ## The forward method computes the output of the network
+    #
+    #   @param x   : An array of shape [batch, c, h, w] holding the states
+    #   @param out : An array of shape [batch, outputs] where to write the
+    #                output. If None (default), a new array is returned
+    #
+    #   @return The output of the network for every state
+    def forward(self, x, out = None):
+        n = x.shape[0]
+        if out is None:
+            out = np.empty([n] + list(self._layers[-1]["out"]),
+                           dtype = np.float32)
+
+        for i in range(0, n, self._maxBatch):
+            j      = min(n, i + self._maxBatch)
+            out[i:j] = self._forward(x[i:j])
+        return out
+
+    ## The act method returns the action maximizing the output of the network
+    #  for the given state
+    #
+    #   @param x : An array of shape [c, h, w] holding the state
+    #
+    #   @return The index of the greatest output
+    def act(self, x):
+        return int(self._forward(x[np.newaxis])[0].argmax())
+
+    ## The _forward method computes the output of the network for a batch of at
+    #  most 'maxBatch' states
+    #
+    #   @param x : An array of shape [batch, c, h, w] holding the states
+    #
+    #   @return A view on the buffer holding the output of the network
+    def _forward(self, x):
+        n    = x.shape[0]
+        bufs = self._buffers(n)
+        y    = x.transpose(0, 2, 3, 1)
+
+        for e, (pad, cols, z) in zip(self._layers, bufs):
+            if e["type"] == "conv":
+                fH, fW, vS, hS, vP, hP = e["f"]
+                h, w, c                = e["in"]
+                oH, oW, f              = e["out"]
+
+                pad[:, vP:vP + h, hP:hP + w, :] = y
+                s = pad.strides
+                np.copyto(cols.reshape(n, oH, oW, fH, fW, c),
+                          as_strided(pad,
+                                     shape   = (n, oH, oW, fH, fW, c),
+                                     strides = (s[0], s[1] * vS, s[2] * hS,
+                                                s[1], s[2], s[3])))
+                self._matmul(e, cols, z.reshape(n * oH * oW, f))
+            else:
+                self._matmul(e, y.reshape(n, -1), z)
+
+            z += e["b"]
+            if e["act"] == "relu":
+                np.maximum(z, 0, out = z)
+            elif e["act"] == "softmax":
+                z -= z.max(axis = 1, keepdims = True)
+                np.exp(z, out = z)
+                z /= z.sum(axis = 1, keepdims = True)
+            y = z
+        return y
+
+    ## The _buffers method returns the buffers used to compute a batch of the
+    #  given size, allocating them the first time
+    #
+    #   @param n : The size of the batch
+    #
+    #   @return A list holding, for every layer, a tuple (padded input,
+    #           patches, output). The first two are None for the fully
+    #           connected layers
+    def _buffers(self, n):
+        if n in self._bufs:
+            return self._bufs[n]
+
+        bufs = []
+        for e in self._layers:
+            pad  = None
+            cols = None
+            if e["type"] == "conv":
+                fH, fW, vS, hS, vP, hP = e["f"]
+                h, w, c                = e["in"]
+                oH, oW, f              = e["out"]
+                pad  = np.zeros([n, h + 2 * vP, w + 2 * hP, c],
+                                dtype = np.float32)
+                cols = np.empty([n * oH * oW, fH * fW * c],
+                                dtype = np.float32)
+            bufs.append((pad, cols, np.empty([n] + list(e["out"]),
+                                             dtype = np.float32)))
+
+        self._bufs[n] = bufs
+        return bufs
+
+###############################################################################
+## The quantize function returns the weights of the layers of a network
+#  quantized to int8 with one scale per output channel
+#
+#   The weights w of the output channel f become round(w / s[f]) where
+#   s[f] = max(|w|) / 127. The scales are saved as "L1_S" for the weights
+#   "L1_W" and the biases are kept as they are. The other arrays, such as the
+#   optimizer's accumulators, are dropped
+#
+#   @param arrays : A dictionary of the values of the parameters keyed by name
+#   @param prefix : The prefix of the layers' names. Default "L"
+#
+#   @return A dictionary of the quantized weights, their scales and the biases
+###############################################################################
+def quantize(arrays, prefix = "L"):
+    q = {}
+    for k, v in arrays.items():
+        if not (k.startswith(prefix) and k[len(prefix):-2].isdigit()):
+            continue
+
+        if k.endswith("_W"):
+            v      = np.asarray(v, dtype = np.float32)
+            axes   = tuple(range(1, v.ndim)) if v.ndim == 4 else (0,)
+            s      = np.abs(v).max(axis = axes, keepdims = True) / 127
+            s[s == 0] = 1
+            q[k]   = np.rint(v / s).astype(np.int8)
+            q[k[:-2] + "_S"] = s.ravel().astype(np.float32)
+        elif k.endswith("_B"):
+            q[k]   = np.asarray(v, dtype = np.float32)
+    return q
+
+################################################################################
+## The QuantizedNetwork class is a NumpyNetwork which weights are kept in int8
+#
+# The weights are quantized per output channel by the quantize function. The
+# input of every layer is quantized to int8 too, with one scale per state, so
+# the products of the integers are summed then multiplied by both scales.
+# numpy has no fast integer matrix product, so the products are computed by
+# BLAS on floats: the int8 weights are converted by blocks of 'block' rows in
+# a small buffer, except for the layers fitting in one block which are
+# converted once. The weights take about four times less memory than with the
+# NumpyNetwork, which matters when many actors run on one machine, but the
+# computation is slower.
+#
+################################################################################
+class QuantizedNetwork(NumpyNetwork):
+
+    ## The QuantizedNetwork constructor. See NumpyNetwork
+    #
+    #   @param arrays : A dictionary of quantized weights, their scales and the
+    #                   biases, as returned by quantize. If None (default),
+    #                   they must be loaded with the method load
+    #   @param block  : The number of rows of weights converted at once.
+    #                   Default 512
+    def __init__(self, layers, inputShape, arrays = None, prefix = "L",
+                 maxBatch = 32, block = 512):
+        self._block = block
+        NumpyNetwork.__init__(self, layers, inputShape, arrays, prefix,
+                              maxBatch)
+
+    ## The load method loads the quantized weights
+    #
+    #   @param arrays : A dictionary of quantized weights, their scales and the
+    #                   biases, as returned by quantize
+    def load(self, arrays):
+        for e in self._layers:
+            w = np.asarray(arrays[e["name"] + "_W"])
+            assert w.dtype == np.int8, \
+                   "The weights of '{}' aren't quantized".format(e["name"])
+
+            e["w"]   = self._layout(e, w)
+            e["s"]   = np.asarray(arrays[e["name"] + "_S"], dtype = np.float32)
+            e["b"]   = np.asarray(arrays[e["name"] + "_B"], dtype = np.float32)
+            e["buf"] = np.empty([min(self._block, e["w"].shape[0]),
+                                 e["w"].shape[1]], dtype = np.float32)
+            e["aq"]  = {} # Quantized inputs per number of rows
+
+            # The weights fitting in one block are converted once
+            if e["w"].shape[0] <= self._block:
+                np.copyto(e["buf"], e["w"])
+
+    ## The _matmul method multiplies the quantized input of a layer by its
+    #  quantized weights. See NumpyNetwork._matmul
+    def _matmul(self, e, a, out):
+        rows = a.shape[0]
+        if not (rows in e["aq"]):
+            e["aq"][rows] = np.empty(a.shape, dtype = np.float32)
+        aq   = e["aq"][rows]
+
+        # One scale per state, whose input is a block of rows for a
+        # convolution
+        per  = e["out"][0] * e["out"][1] if e["type"] == "conv" else 1
+        n    = rows // per
+        g    = a.reshape(n, -1)
+        s    = np.maximum(g.max(axis = 1), -g.min(axis = 1)) / 127
+        s[s == 0] = 1
+        np.multiply(g, (1 / s)[:, np.newaxis], out = aq.reshape(n, -1))
+        np.rint(aq, out = aq)
+
+        w    = e["w"]
+        buf  = e["buf"]
+        if w.shape[0] <= self._block:
+            np.dot(aq, buf, out = out)
+        else:
+            out.fill(0)
+            for i in range(0, w.shape[0], self._block):
+                j = min(w.shape[0], i + self._block)
+                b = buf[:j - i]
+                np.copyto(b, w[i:j])
+                out += np.dot(aq[:, i:j], b)
+
+        out.reshape(n, -1)[:] *= s[:, np.newaxis]
+        out *= e["s"]
@@ -2,6 +2,16 @@ import numpy         as np
 import theano        as Th
 import theano.tensor as T
 
+## The _zeros function returns a shared variable of the shape of the given
+#  parameter filled with zeros
+#
+#   @param p    : The parameter
+#   @param name : The name of the variable
+def _zeros(p, name):
+    return Th.shared(value = np.zeros(shape = p.get_value().shape,
+                                      dtype = np.float32),
+                     name  = name)
+
 ###############################################################################
 ## The RMSProp function implements the RMSProp algorithm
 #
@@ -33,6 +43,8 @@ import theano.tensor as T
 #       4. \f$\boldsymbol{\theta}_t = \boldsymbol{\theta}_{t-1} + 
 #                                     \boldsymbol{u}_t\f$
 #   
+#   When the momentum is 0, \f$\boldsymbol{u}_t\f$ isn't kept between
+#   iterations and the parameters are updated directly
 #
 #   @param grads         : A list of the component of the gradient of the
 #                          function to minimize derived with respect to the
@@ -67,24 +79,134 @@ def RMSProp(grads, params, learning_rate = 0.1, momentum = 0.5,
     i       = 0
         
     for g,p in zip(grads, params):
-        m_t  = Th.shared(value = np.zeros(shape = p.get_value().shape,
-                                          dtype = np.float32),
-                         name  = "m_t[{}]".format(i))
-        u_t  = Th.shared(value = np.zeros(shape = p.get_value().shape,
-                                          dtype = np.float32),
-                         name  = "u_t[{}]".format(i))
-
+        m_t  = _zeros(p, "m_t[{}]".format(i))
         m_t1 = d * m_t + (1.0 - d) * (g ** 2)
-        u_t1 = m * u_t + lr * (g / T.sqrt(m_t1 + e))
-
         updades.append((m_t, m_t1))
-        updades.append((u_t, u_t1))
-        updades.append((p  , p - u_t1))
+
+        if m == 0:
+            updades.append((p, p - lr * (g / T.sqrt(m_t1 + e))))
+        else:
+            u_t  = _zeros(p, "u_t[{}]".format(i))
+            u_t1 = m * u_t + lr * (g / T.sqrt(m_t1 + e))
+            updades.append((u_t, u_t1))
+            updades.append((p  , p - u_t1))
 
         i = i + 1
 
     return updades
 
+###############################################################################
+## The CenteredRMSProp function implements the centered RMSProp algorithm used
+#  by deepmind in their paper of 2015
+#
+#   It keeps, along with the average of the squared gradient
+#   \f$\boldsymbol{m}_t\f$, the average of the gradient \f$\boldsymbol{a}_t\f$
+#   and divides the gradient by an estimate of its standard deviation
+#   instead of its root mean square
+#       1. \f$a_{t,i} = \delta\,a_{t-1,i} + (1-\delta) g_{t,i}\f$
+#       2. \f$m_{t,i} = \delta\,m_{t-1,i} + (1-\delta) g_{t,i}^2\f$
+#       3. \f$u_{t,i} = \mu\,u_{t-1, i} + \lambda \frac{g_{t,i}}
+#                       {\sqrt{m_{t,i} - a_{t,i}^2 + \epsilon}}\f$
+#       4. \f$\boldsymbol{\theta}_t = \boldsymbol{\theta}_{t-1} -
+#                                     \boldsymbol{u}_t\f$
+#
+#   As with RMSProp, \f$\boldsymbol{u}_t\f$ is only kept when the momentum
+#   isn't 0. See RMSProp for the parameters
+#
+#   @return A list of updates operation to pass to a theano function
+#
+#   @see <a href="https://www.nature.com/articles/nature14236">Human-level
+#        control through deep reinforcement learning</a>
+###############################################################################
+def CenteredRMSProp(grads, params, learning_rate = 0.00025, momentum = 0,
+                    decay = 0.95, epsilon = 0.01):
+
+    assert hasattr(grads , "__iter__") and hasattr(grads , "__len__"),   \
+           "The parameter 'grads' must be a list of partial derivatives"
+    assert hasattr(params, "__iter__") and hasattr(params, "__len__"),   \
+           "The parameter 'params' must be a list of parameters"
+    assert len(grads) == len(params), \
+           "'grads' and 'params' must have the same length"
+
+    lr = learning_rate
+    m  = momentum
+    d  = decay
+    e  = epsilon
+
+    updates = []
+    for i, (g, p) in enumerate(zip(grads, params)):
+        a_t  = _zeros(p, "a_t[{}]".format(i))
+        m_t  = _zeros(p, "m_t[{}]".format(i))
+        a_t1 = d * a_t + (1.0 - d) * g
+        m_t1 = d * m_t + (1.0 - d) * (g ** 2)
+        step = lr * (g / T.sqrt(m_t1 - a_t1 ** 2 + e))
+        updates.append((a_t, a_t1))
+        updates.append((m_t, m_t1))
+
+        if m == 0:
+            updates.append((p, p - step))
+        else:
+            u_t  = _zeros(p, "u_t[{}]".format(i))
+            u_t1 = m * u_t + step
+            updates.append((u_t, u_t1))
+            updates.append((p  , p - u_t1))
+
+    return updates
+
+###############################################################################
+## The Adam function implements the Adam algorithm
+#
+#   With \f$t\f$ the number of iterations performed:
+#       1. \f$f_{t,i} = \beta_1 f_{t-1,i} + (1-\beta_1) g_{t,i}\f$
+#       2. \f$v_{t,i} = \beta_2 v_{t-1,i} + (1-\beta_2) g_{t,i}^2\f$
+#       3. \f$\theta_{t,i} = \theta_{t-1,i} - \lambda
+#                            \frac{\sqrt{1-\beta_2^t}}{1-\beta_1^t}
+#                            \frac{f_{t,i}}{\sqrt{v_{t,i}} + \epsilon}\f$
+#
+#   @param grads         : A list of the component of the gradient of the
+#                          function to minimize derived with respect to the
+#                          parameters to modify
+#   @param params        : A list of parameters to update
+#   @param learning_rate : The learning rate
+#   @param beta1         : The decay of the average of the gradient
+#   @param beta2         : The decay of the average of the squared gradient
+#   @param epsilon       : A small value to avoid dividing by zero
+#
+#   @return A list of updates operation to pass to a theano function
+#
+#   @see <a href="https://arxiv.org/abs/1412.6980">Adam: A Method for
+#        Stochastic Optimization</a>
+###############################################################################
+def Adam(grads, params, learning_rate = 0.0001, beta1 = 0.9, beta2 = 0.999,
+         epsilon = 1e-8):
+
+    assert hasattr(grads , "__iter__") and hasattr(grads , "__len__"),   \
+           "The parameter 'grads' must be a list of partial derivatives"
+    assert hasattr(params, "__iter__") and hasattr(params, "__len__"),   \
+           "The parameter 'params' must be a list of parameters"
+    assert len(grads) == len(params), \
+           "'grads' and 'params' must have the same length"
+
+    t   = Th.shared(value = np.float32(0), name = "adam_t")
+    t1  = t + 1
+    lr  = learning_rate * T.sqrt(1 - beta2 ** t1) / (1 - beta1 ** t1)
+
+    updates = [(t, t1)]
+    for i, (g, p) in enumerate(zip(grads, params)):
+        f_t  = _zeros(p, "adam_f[{}]".format(i))
+        v_t  = _zeros(p, "adam_v[{}]".format(i))
+        f_t1 = beta1 * f_t + (1.0 - beta1) * g
+        v_t1 = beta2 * v_t + (1.0 - beta2) * (g ** 2)
+        updates.append((f_t, f_t1))
+        updates.append((v_t, v_t1))
+        updates.append((p  , p - lr * f_t1 / (T.sqrt(v_t1) + epsilon)))
+
+    return updates
+
+## The names of the shared variables created by clipByNorm, which let a profile
+#  tell the operations of the clipping apart
+CLIP_NAMES = ["clip_ts", "clip_right", "clip_n"]
+
 ###############################################################################
 ## The clipByNorm function implements a gradient norm clipping
 #
@@ -98,9 +220,12 @@ def clipByNorm(grads, ts):
     assert hasattr(grads , "__iter__") and hasattr(grads , "__len__"),   \
            "The parameter 'grads' must be a list of partial derivatives"
        
-    clip  = Th.shared(np.array([ts, 0], dtype = np.float32))
-    right = Th.shared(np.array([0 , 1], dtype = np.float32))
-    n     = Th.shared(np.array(0      , dtype = np.float32))
+    clip  = Th.shared(np.array([ts, 0], dtype = np.float32),
+                      name = CLIP_NAMES[0])
+    right = Th.shared(np.array([0 , 1], dtype = np.float32),
+                      name = CLIP_NAMES[1])
+    n     = Th.shared(np.array(0      , dtype = np.float32),
+                      name = CLIP_NAMES[2])
     
     for g in grads:
         n = n + (g ** 2).sum()
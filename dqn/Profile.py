@@ -0,0 +1,66 @@
+###############################################################################
+## The profileTimes function aggregates the time spent in the operations of a
+#  Theano function compiled with profiling on
+#
+#   Every operation of the compiled graph gets a category. An operation reading
+#   one of the named inputs of 'categories' gets the category of this input,
+#   the ones listed first in 'priority' winning when it reads several of them.
+#   The other operations get the category of their inputs in the same way, or
+#   "other" if none has a category. Since Theano merges operations while
+#   optimizing the graph, this is an approximation: an operation computing
+#   both the gradient of a layer and the update of the optimizer is counted
+#   once, in the category with the highest priority.
+#
+#   @param f          : The Theano function. It must have been compiled with
+#                       the parameter 'profile' set
+#   @param categories : A dictionary of categories keyed by the names of the
+#                       shared variables and inputs of the function
+#   @param priority   : The list of the categories from the highest to the
+#                       lowest priority. The categories not listed have the
+#                       lowest priority, in alphabetical order. Default None,
+#                       no category listed
+#
+#   @return A tuple (ops, cats) of dictionaries holding [time, calls] lists
+#           keyed by operation and by category. The time is in seconds
+###############################################################################
+def profileTimes(f, categories, priority = None):
+    if priority is None:
+        priority = []
+
+    ps    = f.profile
+    fg    = f.maker.fgraph
+    rank  = {c : i for i, c in enumerate(priority)}
+    best  = lambda cs: min(cs, key = lambda c: (rank.get(c, len(rank)), c))
+    cat   = {}
+    ops   = {}
+    cats  = {}
+
+    for v in fg.inputs:
+        if v.name in categories:
+            cat[v] = categories[v.name]
+
+    for node in fg.toposort():
+        direct = [cat[v] for v in node.inputs
+                  if v.owner is None and v in cat]
+        other  = [cat[v] for v in node.inputs
+                  if not (v.owner is None) and v in cat]
+        c      = best(direct) if len(direct) > 0 else \
+                 best(other)  if len(other)  > 0 else "other"
+        for v in node.outputs:
+            cat[v] = c
+
+        # Older versions of Theano key the statistics by node, newer ones by
+        # (graph, node)
+        t = ps.apply_time.get(node, ps.apply_time.get((fg, node), 0))
+        n = ps.apply_callcount.get(node,
+                                   ps.apply_callcount.get((fg, node), 0))
+
+        op = str(node.op)
+        if len(op) > 60:
+            op = op[:57] + "..."
+        for d, k in [(ops, op), (cats, c)]:
+            e    = d.setdefault(k, [0, 0])
+            e[0] = e[0] + t
+            e[1] = e[1] + n
+
+    return (ops, cats)
@@ -0,0 +1,29 @@
+import os
+import sys
+import time
+
+scriptDir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(scriptDir, ".."))
+
+import Saver as S
+
+################################################################################
+## CONFIGURATION
+################################################################################
+dbPath   = "../data.db" # Database that stores the agents
+agentId  = None         # Id of the agent to convert, None for all the agents
+compress = True         # Whether the arrays are compressed
+################################################################################
+
+saver = S.Saver(dbPath)
+size1 = os.path.getsize(dbPath)
+
+print("Converting the networks ... ", end = "", flush = True)
+t1    = time.time()
+cnt   = saver.convertNetworks(agentId, compress)
+t2    = time.time()
+print("done [{:.1f}s]".format(t2 - t1))
+
+size2 = os.path.getsize(dbPath)
+print("{} network(s) converted - database: {:.1f} MB -> {:.1f} MB" \
+      .format(cnt, size1 / 2 ** 20, size2 / 2 ** 20))
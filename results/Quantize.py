@@ -0,0 +1,86 @@
+import os
+import sys
+import json
+import time
+import numpy as np
+
+scriptDir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(scriptDir, ".."))
+
+import Saver            as S
+import dqn.Architecture as Arch
+import dqn.NumpyNet     as NN
+
+################################################################################
+## CONFIGURATION
+################################################################################
+dbPath    = "../data.db"             # Database that stores the agents
+agentId   = 1                        # Id of the agent to quantize
+networkId = None                     # Id of the network, None for the last one
+output    = "./agent_int8.npz"       # File where to write the int8 weights
+report    = "./agent_int8.json"      # File where to write the report
+calls     = 1000                     # Calls per latency measure
+################################################################################
+
+saver       = S.Saver(dbPath)
+net, params = NN.NumpyNetwork.fromSaver(saver, agentId, networkId)
+layers      = params["N"].get("layers",
+                              Arch.deepmindLayers(params["N"]["actCnt"]))
+inShape     = [params["N"]["inC"], params["N"]["inH"], params["N"]["inW"]]
+
+assert params["T"]["setId"] > 0, "The agent has no test set"
+
+print("Quantizing ... ", end = "", flush = True)
+arrays = NN.quantize(saver.loadNetwork(agentId, networkId))
+np.savez(output, **arrays)
+qnet   = NN.QuantizedNetwork(layers, inShape, arrays)
+print("done")
+
+print("Loading the test set ... ", end = "", flush = True)
+states = saver.loadDataset(params["T"]["setId"])
+print("done [{} states]".format(len(states)))
+
+## The latency function returns the average time of the choice of an action in
+#  microseconds
+#
+#   @param n : The network
+def latency(n):
+    n.act(states[0])
+    t = time.perf_counter()
+    for i in range(calls):
+        n.act(states[i % len(states)])
+    return (time.perf_counter() - t) / calls * 1e6
+
+## The weights function returns the number of bytes of the weights of a
+#  network, including the blocks of converted weights of a QuantizedNetwork
+#
+#   @param n : The network
+def weights(n):
+    return int(sum(e["w"].nbytes + (e["buf"].nbytes if "buf" in e else 0)
+                   for e in n._layers))
+
+q     = net.forward(states)
+q8    = qnet.forward(states)
+scale = max(1e-12, float(np.abs(q).max()))
+
+results = {"time"      : time.strftime("%Y-%m-%d %H:%M:%S"),
+           "agent"     : agentId,
+           "network"   : networkId,
+           "states"    : len(states),
+           "agreement" : float((q.argmax(axis = 1) == q8.argmax(axis = 1))
+                               .mean()),
+           "maxError"  : float(np.abs(q - q8).max()) / scale,
+           "meanError" : float(np.abs(q - q8).mean()) / scale,
+           "float"     : {"act" : latency(net) , "bytes" : weights(net)},
+           "int8"      : {"act" : latency(qnet), "bytes" : weights(qnet)}}
+
+print("Action agreement : {:.2%}".format(results["agreement"]))
+print("Q error          : {:.2e} max - {:.2e} mean (relative to max |Q|)" \
+      .format(results["maxError"], results["meanError"]))
+for k in ["float", "int8"]:
+    print("{:<17}: {:>8.1f} us/action - {:>6.2f} MB of weights" \
+          .format(k, results[k]["act"], results[k]["bytes"] / 2 ** 20))
+
+with open(report, "w") as f:
+    json.dump(results, f, indent = 2)
+print("Weights written to {} - report written to {}".format(output, report))
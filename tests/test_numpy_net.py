@@ -0,0 +1,195 @@
+import os
+import sys
+import unittest
+import numpy    as np
+
+testDir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(testDir, ".."))
+
+import dqn.Architecture as Arch
+import dqn.NumpyNet     as NN
+
+## The reference function computes the output of a network described as in
+#  ConvNet.Network the way Theano does, one output position at a time
+#
+#   The convolutions flip their filters and the fully connected layers
+#   flatten their input in the [c, h, w] order
+#
+#   @param layers : The list of the layers' descriptions
+#   @param arrays : A dictionary of the values of the parameters keyed by name
+#   @param x      : An array of shape [batch, c, h, w] holding the states
+def reference(layers, arrays, x):
+    y = x.astype(np.float64)
+    for i, l in enumerate(layers):
+        w = arrays["L" + str(i + 1) + "_W"].astype(np.float64)
+        b = arrays["L" + str(i + 1) + "_B"].astype(np.float64)
+        if l["type"] == "conv":
+            fH, fW = l["size"]
+            vS, hS = l["stride"]
+            vP, hP = Arch.padding(l["pad"], fH, fW)
+            p      = np.pad(y, [(0, 0), (0, 0), (vP, vP), (hP, hP)],
+                            mode = "constant")
+            oH     = (p.shape[2] - fH) // vS + 1
+            oW     = (p.shape[3] - fW) // hS + 1
+            f      = w[:, :, ::-1, ::-1]
+            z      = np.zeros([y.shape[0], w.shape[0], oH, oW])
+            for r in range(oH):
+                for c in range(oW):
+                    patch         = p[:, :, r * vS:r * vS + fH,
+                                      c * hS:c * hS + fW]
+                    z[:, :, r, c] = np.einsum("nchw,fchw->nf", patch, f)
+            z = z + b[np.newaxis, :, np.newaxis, np.newaxis]
+        else:
+            z = y.reshape(y.shape[0], -1).dot(w) + b
+
+        if l["act"] == "relu":
+            z = np.maximum(z, 0)
+        elif l["act"] == "softmax":
+            z = np.exp(z - z.max(axis = 1, keepdims = True))
+            z = z / z.sum(axis = 1, keepdims = True)
+        y = z
+    return y
+
+## The randomArrays function returns random parameters for a network
+#
+#   @param layers     : The list of the layers' descriptions
+#   @param inputShape : The shape of the input states, [c, h, w]
+#   @param rng        : The random number generator
+def randomArrays(layers, inputShape, rng):
+    arrays = {}
+    s      = [1] + list(inputShape)
+    for l, c in zip(layers, Arch.costs(inputShape, layers, 1)):
+        f = l["filters"]
+        if l["type"] == "conv":
+            w = rng.normal(size = [f, s[1]] + list(l["size"]))
+        else:
+            w = rng.normal(size = [int(np.prod(s[1:])), f])
+        arrays[c["name"] + "_W"] = (w / np.sqrt(w.size // f)) \
+                                   .astype(np.float32)
+        arrays[c["name"] + "_B"] = rng.normal(scale = 0.1, size = [f]) \
+                                      .astype(np.float32)
+        s = c["shape"]
+    return arrays
+
+################################################################################
+## The NumpyNetworkTest class compares the NumpyNetwork with a naive
+#  computation of the network for every kind of padding
+################################################################################
+class NumpyNetworkTest(unittest.TestCase):
+
+    def setUp(self):
+        self._rng = np.random.RandomState(0)
+
+    ## The _compare method checks the NumpyNetwork against the reference on a
+    #  random batch of states
+    def _compare(self, layers, inShape, n = 5, maxBatch = 32):
+        arrays = randomArrays(layers, inShape, self._rng)
+        x      = self._rng.random_sample([n] + inShape).astype(np.float32)
+        net    = NN.NumpyNetwork(layers, inShape, arrays,
+                                 maxBatch = maxBatch)
+        y      = net.forward(x)
+        np.testing.assert_allclose(y, reference(layers, arrays, x),
+                                   rtol = 1e-4, atol = 1e-4)
+        return net, x, y
+
+    def testPaddings(self):
+        for pad in ["valid", "full", "half", 2, [1, 3]]:
+            for stride in [[1, 1], [2, 3]]:
+                layers = [{"type"   : "conv", "filters" : 4, "size" : [3, 4],
+                           "stride" : stride, "pad"     : pad, "act" : "relu"},
+                          {"type"   : "fc"  , "filters" : 3, "act" : "NONE"}]
+                net = self._compare(layers, [2, 11, 10])[0]
+                o   = Arch.costs([2, 11, 10], layers)[0]["shape"]
+                self.assertEqual(list(net._layers[0]["out"]), o[2:] + [4])
+
+    def testDeepmind(self):
+        for pad in ["full", "valid", "half"]:
+            self._compare(Arch.deepmindLayers(3, pad), [4, 84, 84], 3)
+
+    def testLayers(self):
+        layers = [{"type"   : "conv", "filters" : 5, "size" : [3, 3],
+                   "stride" : [1, 2], "pad"     : "half", "act" : "relu"},
+                  {"type"   : "conv", "filters" : 3, "size" : [2, 2],
+                   "stride" : [1, 1], "pad"     : "valid", "act" : "NONE"},
+                  {"type"   : "fc"  , "filters" : 8, "act" : "relu"},
+                  {"type"   : "fc"  , "filters" : 4, "act" : "softmax"}]
+        self._compare(layers, [3, 9, 12])
+
+    def testBatches(self):
+        layers = Arch.deepmindLayers(4, "valid")
+        net, x, y = self._compare(layers, [4, 36, 36], 11, maxBatch = 4)
+
+        # The output doesn't depend on how the batch is split
+        np.testing.assert_allclose(net.forward(x[3:5]), y[3:5], rtol = 1e-5)
+        out = np.zeros_like(y)
+        self.assertIs(net.forward(x, out), out)
+        np.testing.assert_array_equal(out, y)
+        for i in range(len(x)):
+            self.assertEqual(net.act(x[i]), int(y[i].argmax()))
+
+################################################################################
+## The QuantizedNetworkTest class checks the int8 weights and that the
+#  QuantizedNetwork picks the same actions as the float network
+################################################################################
+class QuantizedNetworkTest(unittest.TestCase):
+
+    def setUp(self):
+        self._rng    = np.random.RandomState(0)
+        self._layers = Arch.deepmindLayers(4, "valid")
+        self._arrays = randomArrays(self._layers, [4, 36, 36], self._rng)
+
+    def testQuantize(self):
+        arrays             = dict(self._arrays)
+        arrays["L1_W"]     = arrays["L1_W"].copy()
+        arrays["L1_W"][2]  = 0
+        arrays["L3_W_rms"] = arrays["L3_W"]
+        arrays["Opt_L1_W"] = arrays["L1_W"]
+        q                  = NN.quantize(arrays)
+
+        self.assertEqual(sorted(q), sorted(["L" + str(i) + k
+                                            for i in range(1, 5)
+                                            for k in ["_W", "_S", "_B"]]))
+        for i in range(1, 5):
+            name = "L" + str(i)
+            w    = arrays[name + "_W"]
+            s    = q[name + "_S"]
+            self.assertEqual(q[name + "_W"].dtype, np.int8)
+            self.assertEqual(s.shape, (w.shape[0] if w.ndim == 4
+                                       else w.shape[1],))
+            np.testing.assert_array_equal(q[name + "_B"], arrays[name + "_B"])
+
+            # Every channel uses the full range and is rounded to the nearest
+            # step
+            s = s.reshape([-1, 1, 1, 1] if w.ndim == 4 else [1, -1])
+            d = q[name + "_W"] * s
+            self.assertTrue((np.abs(d - w) <= s / 2 + 1e-6).all())
+            a = (1, 2, 3) if w.ndim == 4 else 0
+            m = np.abs(q[name + "_W"]).max(axis = a)
+            np.testing.assert_array_equal(m[np.abs(w).max(axis = a) > 0], 127)
+
+        np.testing.assert_array_equal(q["L1_W"][2], 0)
+        self.assertEqual(q["L1_S"][2], 1)
+
+    def testAgreement(self):
+        x    = self._rng.random_sample([200, 4, 36, 36]).astype(np.float32)
+        y    = NN.NumpyNetwork(self._layers, [4, 36, 36],
+                               self._arrays).forward(x)
+        q    = NN.quantize(self._arrays)
+
+        # Weights converted in one block or by blocks of rows
+        yq   = NN.QuantizedNetwork(self._layers, [4, 36, 36], q,
+                                   block = 4096).forward(x)
+        yb   = NN.QuantizedNetwork(self._layers, [4, 36, 36], q,
+                                   block = 64).forward(x)
+        np.testing.assert_allclose(yb, yq, rtol = 1e-4, atol = 1e-5)
+
+        self.assertLess(np.abs(yq - y).max(), 0.05 * np.abs(y).max())
+        self.assertGreaterEqual((yq.argmax(axis = 1) ==
+                                 y.argmax(axis = 1)).mean(), 0.95)
+
+    def testUnquantized(self):
+        with self.assertRaises(AssertionError):
+            NN.QuantizedNetwork(self._layers, [4, 36, 36], self._arrays)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,319 @@
+import os
+import sys
+import shutil
+import tempfile
+import unittest
+import numpy    as np
+
+testDir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(testDir, ".."))
+
+import agent.ReplayMemory as RM
+
+## The fill function adds games of 'n' experiences to a replay memory until
+#  'cnt' experiences have been added
+#
+#   @param replay : The replay memory
+#   @param n      : The number of experiences per game
+#   @param cnt    : The number of experiences to add
+def fill(replay, n, cnt):
+    img = np.zeros([replay._h, replay._w], dtype = np.uint8)
+    for i in range(cnt):
+        if i % n == 0:
+            replay.addImages([img] * replay._c)
+        replay.addExperience(img, i % replay._actCnt, 0, i % n == n - 1)
+
+################################################################################
+## The OccupancyTest class checks that a replay memory with enough frames for
+#  the start frames of its games holds 'capacity' experiences, and its stats
+################################################################################
+class OccupancyTest(unittest.TestCase):
+
+    def testSlack(self):
+        cap    = 200
+        frames = RM.ReplayMemory.frameCount(cap, 4, 4 / 10)
+        replay = RM.ReplayMemory(cap, 3, 4, 8, 8, frames = frames)
+        fill(replay, 10, 3 * cap)
+        self.assertTrue(replay.full())
+        self.assertEqual(len(replay), cap)
+
+    def testNoSlack(self):
+        replay = RM.ReplayMemory(200, 3, 4, 8, 8)
+        fill(replay, 10, 600)
+        self.assertTrue(replay.full())
+        self.assertLess(len(replay), 200)
+
+    def testStats(self):
+        replay = RM.ReplayMemory(50, 3, 4, 8, 8)
+        fill(replay, 5, 7)
+        st     = replay.stats()
+        self.assertEqual(st["experiences"], 7)
+        self.assertEqual(st["capacity"]   , 50)
+        self.assertEqual(st["frames"]     , 54)
+        self.assertEqual(st["framesUsed"] , 15)
+        self.assertEqual(st["liveFrames"] , 15)
+        self.assertEqual(st["startFrames"], 8)
+
+        fill(replay, 5, 200)
+        st     = replay.stats()
+        self.assertEqual(st["framesUsed"] , 54)
+        self.assertEqual(st["liveFrames"] ,
+                         st["experiences"] + st["startFrames"])
+        self.assertEqual(st["startFrames"] % 4, 0)
+
+################################################################################
+## The PrioritizedTest class checks that a prioritized replay memory never
+#  draws the experiences it dropped and normalizes its weights
+################################################################################
+class PrioritizedTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+
+    ## The _live method returns whether the given ids are stored experiences
+    def _live(self, replay, ids):
+        return (ids - replay._head + replay._len) % replay._cap < replay._len
+
+    def testDroppedIds(self):
+        # Without slack, games of 5 experiences make the replay memory drop
+        # its oldest experiences before they're overwritten
+        replay = RM.ReplayMemory(100, 3, 4, 8, 8, alpha = 0.6)
+        for k in range(20):
+            fill(replay, 5, 23)
+            batch = replay.minibatch(32, 0.4)
+            ids   = batch[7]
+            self.assertTrue(self._live(replay, ids).all())
+            replay.updatePriorities(ids, np.random.normal(size = len(ids)))
+
+            dead = np.where(~self._live(replay, np.arange(100)))[0]
+            self.assertTrue(len(dead) > 0)
+            np.testing.assert_array_equal(replay._prio.get(dead), 0)
+
+        # The priorities of experiences dropped since they were drawn are
+        # ignored
+        ids = replay.minibatch(32, 0.4)[7]
+        fill(replay, 5, 60)
+        replay.updatePriorities(ids, np.full(len(ids), 10.0))
+        dead = np.where(~self._live(replay, np.arange(100)))[0]
+        np.testing.assert_array_equal(replay._prio.get(dead), 0)
+
+    def testWeights(self):
+        replay = RM.ReplayMemory(200, 3, 4, 8, 8,
+                                 frames = RM.ReplayMemory.frameCount(200, 4,
+                                                                     0.5),
+                                 alpha  = 0.6)
+        fill(replay, 10, 150)
+        for beta in [0, 0.4, 1]:
+            for k in range(10):
+                batch = replay.minibatch(32, beta)
+                w     = batch[6]
+                self.assertTrue((w <= 1).all())
+                self.assertAlmostEqual(float(w.max()), 1, places = 6)
+                replay.updatePriorities(batch[7],
+                                        np.random.normal(size = len(w)))
+
+        self.assertTrue((replay.minibatch(32, 0)[6] == 1).all())
+
+################################################################################
+## The SaveTest class checks that a replay memory is restored exactly from the
+#  file written by save, and that a file of other dimensions is skipped
+################################################################################
+class SaveTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir   = tempfile.mkdtemp()
+        self._path  = os.path.join(self._dir, "replay.rpl")
+        self._chunk = RM.ReplayMemory.CHUNK
+
+    def tearDown(self):
+        RM.ReplayMemory.CHUNK = self._chunk
+        shutil.rmtree(self._dir, ignore_errors = True)
+
+    ## The _replay method returns a filled prioritized replay memory
+    def _replay(self, capacity = 100):
+        np.random.seed(0)
+        replay = RM.ReplayMemory(capacity, 3, 4, 8, 8, alpha = 0.6)
+        rng    = np.random.RandomState(1)
+        for i in range(40):
+            replay.addImages(rng.randint(256, size = [4, 8, 8])
+                                .astype(np.uint8))
+            for k in range(rng.randint(1, 10)):
+                replay.addExperience(rng.randint(256, size = [8, 8])
+                                        .astype(np.uint8),
+                                     rng.randint(3), rng.normal(),
+                                     rng.random_sample() < 0.2)
+            ids = replay.minibatch(16)[7]
+            replay.updatePriorities(ids, rng.normal(size = len(ids)))
+        return replay
+
+    def testRoundTrip(self):
+        # Small chunks so the arrays are split
+        RM.ReplayMemory.CHUNK = 1000
+
+        replay = self._replay()
+        replay.save(self._path)
+        other  = RM.ReplayMemory(100, 3, 4, 8, 8, alpha = 0.6)
+        self.assertTrue(other.load(self._path))
+
+        self.assertEqual(other.state(), replay.state())
+        self.assertEqual(len(other), len(replay))
+        self.assertEqual(list(other._arrays), list(replay._arrays))
+        for n, a in replay._arrays.items():
+            np.testing.assert_array_equal(other._arrays[n], a, err_msg = n)
+        self.assertEqual(other._prio.total(), replay._prio.total())
+
+        np.random.seed(2)
+        b0 = replay.minibatch(32, 0.4)
+        np.random.seed(2)
+        b1 = other.minibatch(32, 0.4)
+        for x, y in zip(b0, b1):
+            np.testing.assert_array_equal(x, y)
+
+    def testOtherDimensions(self):
+        self._replay().save(self._path)
+        for replay in [RM.ReplayMemory(120, 3, 4, 8, 8, alpha = 0.6),
+                       RM.ReplayMemory(100, 3, 4, 8, 8),
+                       RM.ReplayMemory(100, 3, 2, 8, 8, alpha = 0.6)]:
+            self.assertFalse(replay.load(self._path))
+            self.assertEqual(len(replay), 0)
+
+################################################################################
+## The MappedReplayMemoryTest class checks that a MappedReplayMemory is only
+#  reopened with its experiences when they match its counters
+################################################################################
+class MappedReplayMemoryTest(unittest.TestCase):
+
+    def setUp(self):
+        self._dir = tempfile.mkdtemp()
+        self._img = np.ones([8, 8], dtype = np.uint8)
+
+    def tearDown(self):
+        shutil.rmtree(self._dir, ignore_errors = True)
+
+    ## The _open method opens the replay memory of the test directory
+    def _open(self):
+        return RM.MappedReplayMemory(self._dir, 100, 3, 4, 8, 8, alpha = 0.6)
+
+    ## The _fill method adds a game of 'n' experiences to the replay memory
+    def _fill(self, replay, n):
+        replay.addImages([self._img] * 4)
+        for i in range(n):
+            replay.addExperience(self._img, i % 3, 0, i == n - 1)
+
+    def testReopenFlushed(self):
+        replay = self._open()
+        self._fill(replay, 10)
+        replay.flush()
+        del replay
+
+        replay = self._open()
+        self.assertTrue(replay.reopened())
+        self.assertEqual(len(replay), 10)
+
+    def testReopenWithoutFlush(self):
+        replay = self._open()
+        self._fill(replay, 10)
+        del replay
+
+        replay = self._open()
+        self.assertFalse(replay.reopened())
+        self.assertEqual(len(replay), 0)
+
+    def testReopenChangedAfterFlush(self):
+        replay = self._open()
+        self._fill(replay, 10)
+        replay.flush()
+        self._fill(replay, 5)
+        replay.updatePriorities(np.arange(3), np.ones(3))
+        del replay
+
+        replay = self._open()
+        self.assertFalse(replay.reopened())
+        self.assertEqual(len(replay), 0)
+
+################################################################################
+## The NStepTest class compares the n-step minibatches with returns computed
+#  by walking the experiences one by one
+#
+# Every frame holds its absolute index so the frames of a state can be
+# checked. The games have random lengths and end on a terminal experience or
+# not, and some terminal experiences are followed by others without start
+# frames, so the sums stop on a terminal experience, on the start frames of
+# the next game and on the newest experience. Without slack for the start frames,
+# the replay memory also drops experiences as it's filled.
+################################################################################
+class NStepTest(unittest.TestCase):
+
+    def setUp(self):
+        np.random.seed(0)
+        self._rng = np.random.RandomState(1)
+
+    ## The _frame method returns a frame holding the given index
+    def _frame(self, i):
+        img       = np.zeros([8, 8], dtype = np.uint8)
+        img[0, 0] = i % 256
+        img[0, 1] = i // 256
+        return img
+
+    ## The _index method returns the indexes held by the frames of states
+    def _index(self, s):
+        s = np.rint(s * 255).astype(np.int64)
+        return s[:, :, 0, 0] + 256 * s[:, :, 0, 1]
+
+    ## The _play method adds random games to the replay memory and records
+    #  every experience as a tuple (frame, action, reward, terminal, game)
+    def _play(self, replay, games, exps):
+        frame = len(exps) and exps[-1][0] + 1
+        for i in range(games):
+            replay.addImages([self._frame(frame + k) for k in range(4)])
+            frame = frame + 4
+            n     = self._rng.randint(1, 9)
+            end   = self._rng.random_sample() < 0.5
+            game  = len(exps)
+            for k in range(n):
+                a = self._rng.randint(3)
+                r = float(self._rng.randint(-1, 2))
+                t = (end and k == n - 1) or self._rng.random_sample() < 0.1
+                replay.addExperience(self._frame(frame), a, r, t)
+                exps.append((frame, a, r, t, game))
+                frame = frame + 1
+
+    ## The _check method compares a minibatch with the experiences
+    def _check(self, replay, exps, nStep, disc):
+        s, s1, a, r, t, g, w, ids = replay.minibatch(64)
+        K  = len(exps)
+        ks = K - 1 - (replay._head - 1 - ids) % replay._cap
+        for b, k in enumerate(ks):
+            f0, a0, r0, t0, g0 = exps[k]
+            ret  = 0
+            last = 0
+            for j in range(nStep):
+                if j > 0 and (k + j >= K or exps[k + j][4] != g0 or
+                              exps[k + j - 1][3]):
+                    break
+                ret  = ret + disc ** j * exps[k + j][2]
+                last = j
+
+            fl = exps[k + last][0]
+            self.assertEqual(a[b].argmax(), a0)
+            self.assertAlmostEqual(float(r[b]), ret, places = 5)
+            self.assertEqual(bool(t[b]), exps[k + last][3])
+            self.assertAlmostEqual(float(g[b]), disc ** (last + 1),
+                                   places = 5)
+            np.testing.assert_array_equal(self._index(s[b:b + 1])[0],
+                                          np.arange(f0 - 4, f0))
+            np.testing.assert_array_equal(self._index(s1[b:b + 1])[0],
+                                          np.arange(fl - 3, fl + 1))
+
+    def testReturns(self):
+        for nStep in [1, 3, 5]:
+            replay = RM.ReplayMemory(60, 3, 4, 8, 8, nStep = nStep,
+                                     disc = 0.9)
+            exps   = []
+            for k in range(30):
+                self._play(replay, 3, exps)
+                self._check(replay, exps, nStep, 0.9)
+            self.assertLess(len(replay), 60)
+
+if __name__ == "__main__":
+    unittest.main()
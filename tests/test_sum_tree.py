@@ -0,0 +1,72 @@
+import os
+import sys
+import unittest
+import numpy    as np
+
+testDir = os.path.dirname(os.path.realpath(__file__))
+sys.path.append(os.path.join(testDir, ".."))
+
+import agent.SumTree as ST
+
+################################################################################
+## The SumTreeTest class checks the sums kept by a SumTree and that the leaves
+#  are drawn proportionally to their priorities
+################################################################################
+class SumTreeTest(unittest.TestCase):
+
+    def setUp(self):
+        self._rng = np.random.RandomState(0)
+
+    def testUpdate(self):
+        t = ST.SumTree(13)
+        u = ST.SumTree(13)
+        p = self._rng.random_sample(13)
+        t.update(np.arange(13), p)
+        for i in range(13):
+            u.update(i, p[i])
+
+        self.assertAlmostEqual(t.total(), p.sum())
+        self.assertAlmostEqual(u.total(), p.sum())
+        np.testing.assert_allclose(t.get(np.arange(13)), p)
+
+        t.update(np.array([2, 7, 7]), np.array([0.5, 3, 3]))
+        p[2] = 0.5
+        p[7] = 3
+        self.assertAlmostEqual(t.total(), p.sum())
+
+    def testFind(self):
+        t = ST.SumTree(13)
+        p = self._rng.random_sample(13)
+        t.update(np.arange(13), p)
+        c = np.concatenate([[0], np.cumsum(p)])
+
+        v = self._rng.random_sample(1000) * t.total()
+        np.testing.assert_array_equal(t.find(v),
+                                      np.searchsorted(c, v, side = "right")
+                                      - 1)
+
+    def testDistribution(self):
+        t = ST.SumTree(13)
+        p = self._rng.random_sample(13) ** 2
+        p[[3, 11]] = 0
+        t.update(np.arange(13), p)
+
+        n    = 200000
+        leaf = t.find(self._rng.random_sample(n) * t.total())
+        freq = np.bincount(leaf, minlength = 13) / n
+
+        self.assertEqual(freq[3] , 0)
+        self.assertEqual(freq[11], 0)
+        self.assertTrue(leaf.max() < 13)
+        np.testing.assert_allclose(freq, p / p.sum(), atol = 0.005)
+
+    def testZeroSubtrees(self):
+        t = ST.SumTree(8)
+        t.update(np.arange(8), np.array([0, 0, 0, 1, 0, 0, 0, 0]))
+        np.testing.assert_array_equal(t.find(np.linspace(0, 0.999, 50)), 3)
+
+        # A value at the total is counted in the last non empty leaf
+        self.assertEqual(t.find([1.0])[0], 3)
+
+if __name__ == "__main__":
+    unittest.main()